@@ -1,11 +1,31 @@
-from flask import Flask, request, jsonify, render_template
-from services.google_sheets_service import get_sheets_service, fetch_form_responses, process_candidates, update_sheet_with_result
-from services.google_drive_service import download_cv, get_drive_service, upload_to_drive
-from utils.pdf_parser import parse_pdf
-from utils.scoring_algorithm import score_candidate
+from flask import Flask, Request, Response, request, jsonify, render_template, stream_with_context
+from services.google_sheets_service import get_sheets_service, iter_form_responses, process_candidates, SheetResultWriter
+from services.google_drive_service import download_cv, get_drive_service, upload_to_drive, extract_file_id, get_files_metadata
+from services.pipeline import IO, CPU, ASYNC, iter_async_pipeline, iter_pipeline
+from services import checkpoint, results_store, shortlist
+from services.batch_jobs import BatchJobManager, is_finished
+from services.google_api import api_metrics
+from utils.parse_cache import file_sha256, parse_pdf_cached, source_sha256, stream_pdf_text
+from utils import search_index
+from utils import metrics
+from utils.metrics import CANDIDATES, time_stage
+from utils.profiling import profiled
+from models.candidate import Candidate
+from models.job import Job, get_job
+from models.result import CandidateResult
 from config.settings import Config
+from contextlib import closing, nullcontext
+from collections import deque
+from itertools import chain, islice
+from functools import partial
+from werkzeug.utils import secure_filename
+import io
+import json
 import os
-import shutil
+import tempfile
+import time
+import uuid
+import zipfile
 from dotenv import load_dotenv
 
 # Load .env file
@@ -15,159 +35,1024 @@ load_dotenv()
 app = Flask(__name__)
 
 
-def fetch_candidates():
+def fetch_candidates(incremental=False):
     """
     Fetches candidates from Google Sheet.
-    Returns a list of candidates with their name, job_id and CV Drive URLs.
+    Yields Candidate objects with their name, job_id and CV Drive URLs.
+
+    Rows are read a page at a time, so the sheet is never held in memory
+    at once. In incremental mode only rows from the checkpoint onwards are
+    fetched, and rows already processed with the same content are dropped.
     """
     sheet_id = os.getenv("GOOGLE_SHEET_ID")
+    first_row = checkpoint.resume_row(sheet_id) if incremental else 1
 
     # Fetch data from Form Responses sheet
-    form_responses = fetch_form_responses(sheet_id, "Form Responses 1")
-
-    # Process candidates from the responses
-    candidates = process_candidates(form_responses)
+    form_responses = iter_form_responses(sheet_id, "Form Responses 1", first_row)
+    candidates = process_candidates(form_responses, first_row=first_row)
 
-    return candidates
+    if not incremental:
+        return candidates
+    return (candidate for candidate in candidates
+            if not checkpoint.is_row_done(sheet_id, candidate))
 
 
-def process_cv(cv_path, job_id):
+def process_cv(cv_path, job_id, early_exit=None, name=None, sha256=None):
     """
     Process a candidate's CV:
     1. Parse the PDF
     2. Score against required skills for the job
     
     Args:
-        cv_path: Path to the CV file
+        cv_path: Path to the CV file, or its bytes for an upload parsed
+            in memory
         job_id: Job ID to match against required skills
+        early_exit: Stop parsing once the shortlist decision is settled,
+            defaults to Config.SCORING_MODE == "early_exit". The score and
+            matched skills are then a lower bound.
+        name: Search index key for a CV parsed from memory
+        sha256: The CV's digest, if the caller already has it
         
     Returns:
         Score of the CV
     """
-    # Parse PDF text
-    cv_text = parse_pdf(cv_path)
+    job = get_job(job_id)
+    if early_exit is None:
+        early_exit = Config.SCORING_MODE == 'early_exit'
 
-    # Get required skills for this job_id
-    required_skills = Config.REQUIRED_SKILLS.get(job_id, [])
+    if early_exit:
+        # Stream pages into the matcher and stop once more pages can't
+        # change the decision
+        match = job.start_match()
+        if not match.settled:
+            # Matching is interleaved with parsing, so it is timed as parse
+            with time_stage('parse'), closing(stream_pdf_text(cv_path, name, sha256)) as pages:
+                for page_text in pages:
+                    match.feed(page_text)
+                    if match.settled:
+                        break
+        return match.score, match.matched_skills
 
-    # Score the CV against required skills
-    score, matched_skills = score_candidate(cv_text, required_skills)
+    # Parse PDF text, reusing text already extracted from the same file
+    with time_stage('parse'):
+        cv_text = parse_pdf_cached(cv_path, name, sha256)
+
+    # Score the CV with the job's precomputed weighted skill index
+    with time_stage('score'):
+        score, matched_skills = job.score_text(cv_text)
 
     return score, matched_skills
 
 
+def cv_filename(name, cv_path):
+    """Shortlisted file name for a candidate, unique to their CV file"""
+    stem = os.path.splitext(os.path.basename(cv_path))[0]
+    return f"{name.replace(' ', '_')}_{stem}.pdf"
+
+
+def shortlist_result(result, cv_path, cv_key, filename, job=None):
+    """
+    Decide whether a scored candidate is shortlisted and offer them to
+    their job's top-N index, keyed by ``cv_key`` and name.
+
+    ``job`` is the Job the result was scored against, when it isn't the
+    jobs-file entry for ``result.job_id`` (a job posted to backfill).
+
+    Shortlisted CVs are hardlinked into the shortlisted folder as
+    ``<job_id>_<filename>`` rather than copied; an upload parsed in memory
+    (``cv_path`` is its bytes) is written there once.
+    """
+    job = job or get_job(result.job_id)
+    result.shortlisted = job.is_shortlisted(
+        result.score, result.matched_skills)
+    shortlist_path = os.path.join(Config.SHORTLISTED_CVS_FOLDER,
+                                  f"{result.job_id}_{filename}")
+    if isinstance(cv_path, bytes):
+        cv_path = (shortlist.write_cv(cv_path, shortlist_path)
+                   if result.shortlisted else None)
+    elif result.shortlisted:
+        cv_path = shortlist.link_cv(cv_path, shortlist_path)
+    shortlist.record(result, cv_key, cv_path)
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
 
 
+class UploadSpool(tempfile.SpooledTemporaryFile):
+    """A spooled upload that counts the bytes it holds in memory"""
+
+    def __init__(self, max_size):
+        super().__init__(max_size=max_size, mode='rb+')
+        self.memory_bytes = 0
+        self.on_disk = False
+
+    def write(self, data):
+        written = super().write(data)
+        if not self.on_disk:
+            self.memory_bytes += written
+        return written
+
+    def rollover(self):
+        super().rollover()
+        self.on_disk = True
+        self.memory_bytes = 0
+
+
+class UploadRequest(Request):
+    """
+    Keeps uploaded files in memory up to Config.UPLOAD_SPOOL_BYTES each,
+    and Config.UPLOAD_MEMORY_BYTES for all of a request's files together;
+    the rest spill to disk.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type,
+                         filename=None, content_length=None):
+        # Werkzeug spills anything over 500KB to disk by default. Files are
+        # read one after another, so the earlier ones are complete here.
+        spools = self.__dict__.setdefault('_upload_spools', [])
+        budget = Config.UPLOAD_MEMORY_BYTES - sum(
+            spool.memory_bytes for spool in spools)
+        spool = UploadSpool(min(Config.UPLOAD_SPOOL_BYTES, budget))
+        if budget <= 0:
+            # A max_size of 0 would never roll over
+            spool.rollover()
+        spools.append(spool)
+        return spool
+
+
+app.request_class = UploadRequest
+# Larger requests are refused with 413 before any of the body is read
+app.config['MAX_CONTENT_LENGTH'] = Config.UPLOAD_MAX_REQUEST_BYTES or None
+
+
+def is_zip_upload(upload):
+    return (upload.filename or '').lower().endswith('.zip') or upload.mimetype in (
+        'application/zip', 'application/x-zip-compressed')
+
+
+def detach_uploads(cv_files):
+    """
+    Take the spooled streams of uploaded files from the request.
+
+    The request closes its files as soon as the view returns, before a
+    streamed response has read them; iter_uploads closes these instead.
+
+    Returns:
+        List of (filename, is_zip, stream)
+    """
+    uploads = []
+    for cv_file in cv_files:
+        uploads.append((cv_file.filename, is_zip_upload(cv_file), cv_file.stream))
+        cv_file.stream = io.BytesIO()
+    return uploads
+
+
+def read_upload(stream, filename, size):
+    """
+    Return an upload's source for process_cv: its bytes when it fits in
+    Config.UPLOAD_SPOOL_BYTES, otherwise a copy on disk under its unique
+    stored name, so two uploads with the same filename never collide.
+    """
+    if size <= Config.UPLOAD_SPOOL_BYTES:
+        return stream.read(size)
+    os.makedirs("temp_cvs/uploads", exist_ok=True)
+    cv_path = f"temp_cvs/uploads/{filename}"
+    # Copy no more than the declared size, so a zip member can't inflate
+    with open(cv_path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = stream.read(min(remaining, 1024 * 1024))
+            if not chunk:
+                break
+            f.write(chunk)
+            remaining -= len(chunk)
+    return cv_path
+
+
+def iter_uploads(files, job_id):
+    """
+    Yield a work item for every CV in the uploaded files, expanding zip
+    archives into their PDF members. Each file's stream is closed once its
+    CVs have been read.
+
+    Args:
+        files: (filename, is_zip, stream) tuples from detach_uploads
+        job_id: Job to score against
+
+    Each item is a dict with the display ``name``, the ``filename`` it was
+    uploaded as, a sanitized ``stored_name`` and the ``source`` for
+    process_cv. Files that can't be scored carry a ``skipped`` reason
+    instead of a source.
+    """
+    count = 0
+
+    def item(filename, stream=None, size=0, skipped=None):
+        nonlocal count
+        count += 1
+        upload_id = uuid.uuid4().hex[:12]
+        stored_name = f"{upload_id}_{secure_filename(os.path.basename(filename)) or 'cv.pdf'}"
+        if skipped is None and count > Config.UPLOAD_MAX_FILES:
+            skipped = f"more than {Config.UPLOAD_MAX_FILES} files in one request"
+        if skipped is None and size > Config.MAX_CV_BYTES:
+            skipped = f"{size} bytes, limit is {Config.MAX_CV_BYTES}"
+        upload = {
+            "name": os.path.splitext(os.path.basename(filename))[0],
+            "filename": filename,
+            "job_id": job_id,
+            "stored_name": stored_name,
+            # Links the search index entry of a CV parsed from memory
+            "key": f"upload:{stored_name}",
+        }
+        if skipped is not None:
+            upload['skipped'] = skipped
+        else:
+            upload['source'] = read_upload(stream, stored_name, size)
+            if not isinstance(upload['source'], bytes):
+                upload['key'] = upload['source']
+        return upload
+
+    for filename, is_zip, stream in files:
+        with stream:
+            if not is_zip:
+                size = stream.seek(0, os.SEEK_END)
+                stream.seek(0)
+                yield item(filename, stream, size)
+                continue
+            try:
+                archive = zipfile.ZipFile(stream)
+            except zipfile.BadZipFile as e:
+                yield item(filename, skipped=f"not a valid zip archive: {str(e)}")
+                continue
+            with archive:
+                for info in archive.infolist():
+                    member = info.filename
+                    if (info.is_dir() or member.startswith('__MACOSX/')
+                            or not member.lower().endswith('.pdf')):
+                        continue
+                    if info.file_size > Config.MAX_CV_BYTES:
+                        yield item(member, size=info.file_size)
+                        continue
+                    with archive.open(info) as member_stream:
+                        yield item(member, member_stream, info.file_size)
+
+
+def score_upload(upload, _):
+    """
+    Pipeline stage: parse and score an uploaded CV (runs in a worker process)
+
+    Returns:
+        (score, matched_skills, details) with the sha256 and
+        process_seconds for the results store, or None if skipped
+    """
+    if 'skipped' in upload:
+        return None
+    start = time.perf_counter()
+    sha256 = source_sha256(upload['source'])
+    score, matched_skills = process_cv(upload['source'], upload['job_id'],
+                                       name=upload['key'], sha256=sha256)
+    details = {'process_seconds': time.perf_counter() - start,
+               'sha256': sha256}
+    return score, matched_skills, details
+
+
+def record_upload(upload, scored, sheet_writer):
+    """Pipeline stage: shortlist an uploaded CV and queue its sheet row"""
+    if scored is None:
+        result = CandidateResult(upload['name'], upload['job_id'],
+                                 skipped=upload['skipped'])
+        results_store.record(result, 'upload')
+        return upload['filename'], result
+    score, matched_skills, details = scored
+    result = CandidateResult(upload['name'], upload['job_id'], score,
+                             matched_skills)
+    shortlist_result(result, upload['source'], upload['key'],
+                     upload['stored_name'])
+    search_index.add_candidate(upload['key'], result.name, result.job_id)
+    sheet_writer.add(result)
+    results_store.record(result, 'upload', details['sha256'], details)
+    return upload['filename'], result
+
+
+def failed_upload(upload, error):
+    print(f"Error processing {upload['filename']}: {str(error)}")
+    result = CandidateResult(upload['name'], upload['job_id'], error=str(error))
+    results_store.record(result, 'upload')
+    return upload['filename'], result
+
+
+def iter_upload_results(uploads, inline=False):
+    """
+    Parse and score uploaded CVs in parallel, yielding (filename, result)
+    pairs as each one finishes.
+
+    Uploads are parsed from memory where they fit, on the process pool
+    unless ``inline`` is set (worth it for a single small file).
+    """
+    with SheetResultWriter() as sheet_writer:
+        stages = [
+            (CPU, score_upload),
+            (IO, partial(record_upload, sheet_writer=sheet_writer)),
+        ]
+        workers = {'io_workers': 0, 'cpu_workers': 0} if inline else {}
+        # Uploads are read lazily, so at most PIPELINE_QUEUE_SIZE are held
+        for _, pair in iter_pipeline(uploads, stages, failed_upload,
+                                     ordered=False, **workers):
+            yield pair
+
+
+def upload_result_to_dict(pair):
+    filename, result = pair
+    return dict(result.to_dict(), file=filename)
+
+
+def wants_ndjson():
+    """True if the client asked for newline-delimited JSON"""
+    return (request.args.get('format') == 'ndjson'
+            or request.accept_mimetypes.best_match(
+                ['application/json', 'application/x-ndjson']) == 'application/x-ndjson')
+
+
 @app.route('/process', methods=['POST'])
 def process():
-    """Handle single CV upload from the form"""
+    """
+    Score uploaded CVs against a job.
+
+    Accepts one or more ``cv_file`` (or ``cv_files``) PDFs and zip archives
+    of PDFs. Files up to UPLOAD_SPOOL_BYTES are parsed from memory without
+    being written to disk, and files are processed in parallel. Results
+    stream back as NDJSON, one line per file (with its ``file`` name) as
+    each finishes. A single PDF without ``?format=ndjson`` gets a plain
+    JSON result, as the upload form expects.
+    """
     job_id = request.form.get('job_id')
-    cv_file = request.files.get('cv_file')
+    cv_files = [cv_file for field in ('cv_file', 'cv_files')
+                for cv_file in request.files.getlist(field) if cv_file.filename]
 
-    if not cv_file or not job_id:
+    if not cv_files or not job_id:
         return jsonify({"status": "error", "message": "Missing job ID or CV file"}), 400
 
-    # Create directories if they don't exist
+    uploads = iter_uploads(detach_uploads(cv_files), job_id)
+    if len(cv_files) == 1 and not is_zip_upload(cv_files[0]) and not wants_ndjson():
+        # One CV: parse it inline rather than starting a process pool
+        (_, result), = iter_upload_results(uploads, inline=True)
+        if result.error is not None:
+            return jsonify({"status": "error", "message": result.error}), 500
+        if result.skipped is not None:
+            return jsonify({"status": "error", "message": result.skipped}), 413
+        return jsonify(result.to_dict())
+
+    results = iter_upload_results(uploads)
+    return Response(
+        stream_with_context(stream_results(results, ndjson=True,
+                                           to_dict=upload_result_to_dict)),
+        mimetype='application/x-ndjson')
+
+
+def plan_batch(members):
+    """
+    Group candidates by Drive file ID so each CV is fetched and parsed once.
+
+    A candidate applying to several jobs with the same CV link, or several
+    rows sharing a file, end up in one group.
+
+    Args:
+        members: (position, candidate) pairs
+
+    Returns:
+        List of groups in order of first appearance, each a dict with the
+        file_id, cv_link and (position, candidate) members
+    """
+    groups = {}
+    for position, candidate in members:
+        try:
+            file_id = extract_file_id(candidate.cv_link)
+        except IndexError:
+            # Not a Drive URL; keep it on its own so its download fails alone
+            file_id = candidate.cv_link
+        group = groups.get(file_id)
+        if group is None:
+            group = groups[file_id] = {
+                "file_id": file_id,
+                "cv_link": candidate.cv_link,
+                "members": []
+            }
+        group['members'].append((position, candidate))
+    return list(groups.values())
+
+
+def prefetch_metadata(groups):
+    """
+    Fetch Drive metadata for every file in a batch and drop wasted downloads.
+
+    Metadata comes from batched Drive requests. Groups whose file isn't a
+    PDF or exceeds Config.MAX_CV_BYTES are set aside, and groups whose
+    md5Checksum matches another file in the batch are merged into it, so
+    identical CVs uploaded twice are downloaded and parsed once.
+
+    Returns:
+        (groups, skipped): groups to process, each with the file's md5 when
+        known, and (group, reason) pairs for files not worth downloading
+    """
+    try:
+        metadata = get_files_metadata([group['file_id'] for group in groups])
+    except Exception as e:
+        # Fall back to downloading everything
+        print(f"Error prefetching Drive metadata: {str(e)}")
+        metadata = {}
+
+    kept = []
+    skipped = []
+    by_md5 = {}
+    for group in groups:
+        info = metadata.get(group['file_id'])
+        if info is None:
+            kept.append(group)
+            continue
+        if info.get('mimeType') != 'application/pdf':
+            skipped.append((group, f"{info.get('mimeType')} is not a PDF"))
+            continue
+        size = int(info.get('size', 0))
+        if size > Config.MAX_CV_BYTES:
+            skipped.append(
+                (group, f"{size} bytes, limit is {Config.MAX_CV_BYTES}"))
+            continue
+
+        md5 = info.get('md5Checksum')
+        same = by_md5.get(md5) if md5 else None
+        if same is not None:
+            same['members'].extend(group['members'])
+            continue
+        group['md5'] = md5
+        if md5:
+            by_md5[md5] = group
+        kept.append(group)
+
+    return kept, skipped
+
+
+def download_cv_file(group, _):
+    """
+    Pipeline stage: download a CV file once and return its local path.
+
+    The local path is keyed by Drive file ID, so candidates with the same
+    name never overwrite each other's CVs. A local copy of a file with the
+    same Drive md5Checksum, downloaded in an earlier run, is reused instead.
+    The download time is kept on the group for the results store.
+    """
+    file_id = group['file_id']
+    cv_path = f"temp_cvs/{file_id}.pdf"
     os.makedirs("temp_cvs", exist_ok=True)
-    os.makedirs("shortlisted_cvs", exist_ok=True)
-
-    # Save the uploaded file
-    cv_path = f"temp_cvs/{cv_file.filename}"
-    cv_file.save(cv_path)
-
-    # Process the CV
-    score, matched_skills = process_cv(cv_path, job_id)
-
-    # Move to shortlisted folder if score is good enough
-    result = {
-        "name": cv_file.filename.replace('.pdf', ''),
-        "job_id": job_id,
-        "score": score,
-        "matched_skills": matched_skills
-    }
-
-    if score >= 3:  # Threshold based on number of matched skills
-        shortlist_path = f"shortlisted_cvs/{job_id}_{cv_file.filename}"
-        shutil.copy(cv_path, shortlist_path)
-        result["shortlisted"] = True
+
+    md5 = group.get('md5')
+    if md5:
+        local_copy = checkpoint.find_file_copy(md5)
+        if local_copy is not None:
+            return local_copy
+
+    start = time.perf_counter()
+    download_cv(group['cv_link'], cv_path, md5=md5)
+    group['download_seconds'] = time.perf_counter() - start
+    if md5:
+        checkpoint.record_file(file_id, md5, cv_path)
+    return cv_path
+
+
+async def download_cv_file_async(group, _, client):
+    """
+    Pipeline stage: download_cv_file as a coroutine on an
+    AsyncGoogleClient's event loop.
+    """
+    file_id = group['file_id']
+    cv_path = f"temp_cvs/{file_id}.pdf"
+
+    md5 = group.get('md5')
+    if md5:
+        local_copy = checkpoint.find_file_copy(md5)
+        if local_copy is not None:
+            return local_copy
+
+    start = time.perf_counter()
+    await client.download_cv(group['cv_link'], cv_path, md5=md5)
+    group['download_seconds'] = time.perf_counter() - start
+    if md5:
+        checkpoint.record_file(file_id, md5, cv_path)
+    return cv_path
+
+
+def batch_client(inline=False):
+    """
+    The AsyncGoogleClient for a batch when Config.BATCH_TRANSPORT is
+    "asyncio", otherwise None (the threaded googleapiclient clients).
+    """
+    if inline or Config.BATCH_TRANSPORT != 'asyncio':
+        return None
+    # Imported here so the app starts without asyncio and aiohttp
+    from services.google_async import AsyncGoogleClient
+    return AsyncGoogleClient()
+
+
+def score_cv_file(group, cv_path):
+    """
+    Pipeline stage: score a downloaded CV against every job it was submitted
+    for (runs in a worker process).
+
+    Returns:
+        (cv_path, job_id -> (score, matched_skills), details) where details
+        has the CV's sha256 and process_seconds for the results store
+    """
+    start = time.perf_counter()
+    # Hashed once here; the parse cache and search index reuse the digest
+    sha256 = file_sha256(cv_path)
+    job_ids = list(dict.fromkeys(
+        candidate.job_id for _, candidate in group['members']))
+    if len(job_ids) == 1:
+        scores = {job_ids[0]: process_cv(cv_path, job_ids[0], sha256=sha256)}
     else:
-        result["shortlisted"] = False
+        # Parse once and score every requested job against the same text
+        with time_stage('parse'):
+            cv_text = parse_pdf_cached(cv_path, sha256=sha256)
+        with time_stage('score'):
+            scores = {job_id: get_job(job_id).score_text(cv_text)
+                      for job_id in job_ids}
+    details = {'process_seconds': time.perf_counter() - start,
+               'sha256': sha256}
+    return cv_path, scores, details
+
+
+def record_file_results(group, scored, sheet_writer):
+    """Pipeline stage: record the result of every candidate sharing the CV"""
+    cv_path, scores, details = scored
+    details = dict(details, download_seconds=group.get('download_seconds'))
+    results = []
+    for position, candidate in group['members']:
+        score, matched_skills = scores[candidate.job_id]
+        results.append((position, record_candidate_result(
+            candidate, (cv_path, score, matched_skills), sheet_writer, details)))
+    return results
+
+
+def failed_file_results(group, error):
+    """Build the results for every candidate sharing a CV that failed"""
+    return [(position, failed_candidate_result(candidate, error))
+            for position, candidate in group['members']]
+
+
+def record_candidate_result(candidate, scored, sheet_writer, details=None):
+    """
+    Shortlist a candidate's CV and queue the result for the sheet and the
+    results store (with the sha256 and timings in details).
+    """
+    cv_path, score, matched_skills = scored
+
+    result = CandidateResult(candidate.name, candidate.job_id, score,
+                             matched_skills)
+
+    # Link into the shortlisted folder if score is good enough
+    shortlist_result(result, cv_path, cv_path,
+                     cv_filename(candidate.name, cv_path))
+    search_index.add_candidate(cv_path, candidate.name, candidate.job_id)
+
+    # Failed until the buffered row reaches the sheet, so an incremental
+    # run retries it if the process dies or the final flush fails first
+    sheet_id = os.getenv("GOOGLE_SHEET_ID")
+    checkpoint.mark_row(sheet_id, candidate, checkpoint.ROW_FAILED)
+    sheet_writer.add(result, on_written=partial(
+        checkpoint.mark_row, sheet_id, candidate, checkpoint.ROW_DONE))
+    details = details or {}
+    results_store.record(result, 'sheet', details.get('sha256'), details)
+    CANDIDATES.inc(outcome='scored')
+
+    return result
+
+
+def skipped_file_results(group, reason):
+    """Build the results for every candidate sharing a CV not worth scoring"""
+    results = []
+    for position, candidate in group['members']:
+        print(f"Skipping CV of {candidate.name}: {reason}")
+        checkpoint.mark_row(os.getenv("GOOGLE_SHEET_ID"), candidate,
+                            checkpoint.ROW_SKIPPED)
+        CANDIDATES.inc(outcome='skipped')
+        result = CandidateResult(candidate.name, candidate.job_id, skipped=reason)
+        results_store.record(result, 'sheet')
+        results.append((position, result))
+    return results
+
+
+def failed_candidate_result(candidate, error):
+    """Build the result for a candidate whose download or scoring failed"""
+    print(f"Error processing {candidate.name}: {str(error)}")
+    checkpoint.mark_row(os.getenv("GOOGLE_SHEET_ID"), candidate,
+                        checkpoint.ROW_FAILED)
+    CANDIDATES.inc(outcome='failed')
+    result = CandidateResult(candidate.name, candidate.job_id, error=str(error))
+    results_store.record(result, 'sheet')
+    return result
+
+
+def plan_windows(candidates, skipped):
+    """
+    Yield the groups to process, planning Config.BATCH_PLAN_WINDOW
+    candidates at a time so the whole sheet is never grouped in memory.
+
+    Groups set aside by prefetch_metadata are appended to ``skipped``.
+    A CV repeated in a later window is still not downloaded twice: its
+    md5Checksum matches the copy recorded in the checkpoint.
+    """
+    members = enumerate(candidates)
+    while True:
+        window = list(islice(members, Config.BATCH_PLAN_WINDOW))
+        if not window:
+            return
+        groups, window_skipped = prefetch_metadata(plan_batch(window))
+        skipped.extend(window_skipped)
+        yield from groups
+
+
+def iter_candidate_results(candidates, ordered=True, inline=False):
+    """
+    Download, score and record candidates through the batch pipeline.
+
+    Candidates are grouped by Drive file so each CV is downloaded and parsed
+    once, then scored against every job it was submitted for. Drive metadata
+    is prefetched for each window of candidates so files that aren't PDFs,
+    are too large or duplicate another file are never downloaded. Downloads,
+    parsing and sheet writes overlap across files, and candidates are
+    consumed lazily. Leaving the writer block flushes buffered rows even if
+    the batch fails part-way. With Config.BATCH_TRANSPORT "asyncio",
+    downloads and sheet writes run on one event loop instead of threads.
+
+    Args:
+        candidates: Iterable of Candidates, e.g. from fetch_candidates
+        ordered: Yield in candidate order rather than as each finishes
+        inline: Run every stage in the calling thread, e.g. for profiling
+
+    Yields:
+        CandidateResults in candidate order, or (index, result) pairs as
+        each candidate finishes when ordered is False
+    """
+    client = batch_client(inline)
+    # The writer is closed first, while the client can still send its rows
+    with client or nullcontext(), SheetResultWriter(
+            append=client and client.append_rows_blocking) as sheet_writer:
+        skipped = deque()
+        stages = [
+            (IO, download_cv_file),
+            (CPU, score_cv_file),
+            (IO, partial(record_file_results, sheet_writer=sheet_writer)),
+        ]
+        groups = plan_windows(candidates, skipped)
+        # Ordered output takes groups in order from the pipeline, whose
+        # window then stops admitting work behind a slow file at the head
+        if client is not None:
+            os.makedirs("temp_cvs", exist_ok=True)
+            stages[0] = (ASYNC, partial(download_cv_file_async, client=client))
+            finished = iter_async_pipeline(groups, stages, failed_file_results,
+                                           client.loop, ordered=ordered)
+        else:
+            workers = {'io_workers': 0, 'cpu_workers': 0} if inline else {}
+            finished = iter_pipeline(groups, stages, failed_file_results,
+                                     ordered=ordered, **workers)
+        if not ordered:
+            finished = (file_results for _, file_results in finished)
+
+        def with_skipped_groups():
+            for file_results in finished:
+                # Skipped groups are set aside as each window is planned
+                while skipped:
+                    yield skipped_file_results(*skipped.popleft())
+                yield file_results
+            while skipped:
+                yield skipped_file_results(*skipped.popleft())
+
+        buffered = {}
+        next_position = 0
+        for file_results in with_skipped_groups():
+            if not ordered:
+                yield from file_results
+                continue
+            # A group's later candidates and skipped groups run ahead of
+            # the next position, by at most about a plan window
+            buffered.update(file_results)
+            while next_position in buffered:
+                yield buffered.pop(next_position)
+                next_position += 1
+
+    # Written now so other processes can query the finished batch
+    results_store.flush()
+
+
+batch_jobs = BatchJobManager(
+    fetch_candidates, partial(iter_candidate_results, ordered=False),
+    encode=Candidate.to_row, decode=Candidate.from_row)
+
+
+@app.before_request
+def start_batch_jobs():
+    # Started by the first request rather than at import, so CLI tools and
+    # worker processes that import this module don't run jobs
+    batch_jobs.start()
+
+
+def stream_results(results, ndjson=False, to_dict=CandidateResult.to_dict):
+    """
+    Serialize results one at a time, as NDJSON lines or a JSON array.
 
-    # Update Google Sheet with result
+    The status line has gone out by the time a batch can fail, so a
+    failure is reported as a final {"status": "error"} entry.
+    """
+    if not ndjson:
+        yield '['
+    separator = ''
     try:
-        update_sheet_with_result(result)
+        for result in results:
+            yield separator + json.dumps(to_dict(result))
+            separator = '\n' if ndjson else ','
     except Exception as e:
-        print(f"Error updating sheet: {str(e)}")
-
-    return jsonify(result)
+        print(f"Error processing candidates: {str(e)}")
+        yield separator + json.dumps({"status": "error", "message": str(e)})
+    yield '\n' if ndjson else ']'
 
 
 @app.route('/process_cvs', methods=['POST'])
 def process_cvs():
-    """Process all candidates from the Google Sheet"""
+    """
+    Process all candidates from the Google Sheet.
+
+    Results are streamed in sheet order as each is ready, so memory stays
+    flat however large the sheet is. The response is a JSON array, or
+    newline-delimited JSON with ``?format=ndjson`` or an
+    ``Accept: application/x-ndjson`` header.
+
+    Pass ``?incremental=1`` (or set PROCESS_INCREMENTAL) to only process
+    rows added or failed since the last run. With PROFILING_ENABLED set,
+    ``?profile=1`` runs the batch inline under cProfile and returns the
+    path of the dump in the X-Profile-Path header.
+    """
+    incremental = request.args.get(
+        'incremental', '1' if Config.PROCESS_INCREMENTAL else '0') == '1'
+    profile = Config.PROFILING_ENABLED and request.args.get('profile') == '1'
+    ndjson = wants_ndjson()
     try:
-        # Fetch candidates from Google Sheet
-        candidates = fetch_candidates()
+        # Fetch candidates from Google Sheet; the first page is read here
+        # so an empty or unreachable sheet still gets a plain error response
+        candidates = fetch_candidates(incremental)
+        first = next(candidates, None)
 
-        if not candidates:
+        if first is None:
+            if incremental:
+                # Nothing new since the last run
+                return jsonify([])
             return jsonify({"status": "error", "message": "No candidates found in sheet"}), 404
+        candidates = chain([first], candidates)
 
-        results = []
-        for candidate in candidates:
-            # Download CV
-            cv_path = f"temp_cvs/{candidate['name'].replace(' ', '_')}.pdf"
-            os.makedirs("temp_cvs", exist_ok=True)
-
-            try:
-                download_cv(candidate['cv_link'], cv_path)
-
-                # Process the CV
-                score, matched_skills = process_cv(
-                    cv_path, candidate['job_id'])
-
-                # Add result
-                result = {
-                    "name": candidate['name'],
-                    "job_id": candidate['job_id'],
-                    "score": score,
-                    "matched_skills": matched_skills
-                }
-
-                # Move to shortlisted folder if score is good enough
-                if score >= 3:  # Threshold based on number of matched skills
-                    os.makedirs("shortlisted_cvs", exist_ok=True)
-                    shortlist_path = f"shortlisted_cvs/{candidate['job_id']}_{candidate['name'].replace(' ', '_')}.pdf"
-                    shutil.copy(cv_path, shortlist_path)
-                    result["shortlisted"] = True
-                else:
-                    result["shortlisted"] = False
-
-                # Update Google Sheet with result
-                try:
-                    update_sheet_with_result(result)
-                except Exception as e:
-                    print(
-                        f"Error updating sheet for {candidate['name']}: {str(e)}")
-
-                results.append(result)
-
-            except Exception as e:
-                print(f"Error processing {candidate['name']}: {str(e)}")
-                results.append({
-                    "name": candidate['name'],
-                    "job_id": candidate['job_id'],
-                    "score": 0,
-                    "error": str(e)
-                })
-
-        return jsonify(results)
+        if profile:
+            with profiled('process_cvs') as profile_path:
+                results = [result.to_dict() for result in
+                           iter_candidate_results(candidates, inline=True)]
+            response = jsonify(results)
+            response.headers['X-Profile-Path'] = profile_path
+            return response
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+    # Results come back in sheet order
+    return Response(
+        stream_with_context(stream_results(iter_candidate_results(candidates), ndjson)),
+        mimetype='application/x-ndjson' if ndjson else 'application/json')
+
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    """Start processing the sheet in the background and return the job ID"""
+    incremental = request.args.get(
+        'incremental', '1' if Config.PROCESS_INCREMENTAL else '0') == '1'
+    job_id = batch_jobs.submit(incremental)
+    return jsonify({"job_id": job_id, "status_url": f"/jobs/{job_id}",
+                    "events_url": f"/jobs/{job_id}/events"}), 202
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job_status(job_id):
+    """Report a background job's progress, throughput and ETA"""
+    job = batch_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """
+    Stream a job's results as Server-Sent Events.
+
+    Each finished candidate is sent as a ``result`` event, followed by a
+    ``progress`` event; a final ``done`` event carries the job status.
+    Reconnecting clients resume after the Last-Event-ID they received.
+    """
+    if batch_jobs.get(job_id) is None:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+    # A malformed ID replays from the start
+    last_seq = request.headers.get('Last-Event-ID', 0, type=int)
+
+    def stream(seq):
+        while True:
+            # Read the status first: once finished, every result is stored
+            job = batch_jobs.get(job_id)
+            results = batch_jobs.results_after(job_id, seq)
+            for seq, index, result in results:
+                payload = dict(result, index=index)
+                yield f"id: {seq}\nevent: result\ndata: {json.dumps(payload)}\n\n"
+            if is_finished(job['status']):
+                job = batch_jobs.get(job_id)
+                yield f"event: done\ndata: {json.dumps(job)}\n\n"
+                return
+            if results:
+                yield f"event: progress\ndata: {json.dumps(batch_jobs.get(job_id))}\n\n"
+            time.sleep(Config.JOB_POLL_SECONDS)
+
+    return Response(stream_with_context(stream(last_seq)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache',
+                             'X-Accel-Buffering': 'no'})
+
+
+@app.route('/shortlist', methods=['GET'])
+@app.route('/shortlist/<job_id>', methods=['GET'])
+def get_shortlist(job_id=None):
+    """
+    Serve the current top Config.SHORTLIST_TOP_N candidates per job.
+
+    The index is updated as each CV is scored, so this reflects a batch
+    that is still running; nothing is rescanned.
+    """
+    return jsonify(shortlist.top_candidates(job_id))
+
+
+def split_param(value):
+    """Parse a comma-separated query parameter"""
+    return [part.strip() for part in (value or '').split(',') if part.strip()]
+
+
+@app.route('/search', methods=['GET'])
+def search_cvs():
+    """
+    Score every indexed CV against an ad-hoc skill set, e.g.
+    ``/search?skills=kubernetes,go&must_have=kubernetes&limit=20``.
+
+    Uses the full-text index built as CVs are parsed, so nothing is
+    downloaded or parsed again. Aliases from the jobs file count towards
+    the skill they name.
+    """
+    skills = split_param(request.args.get('skills'))
+    must_have = split_param(request.args.get('must_have'))
+    if not skills and not must_have:
+        return jsonify({"status": "error", "message": "Missing skills"}), 400
+
+    start = time.perf_counter()
+    results = search_index.search(
+        list(dict.fromkeys(must_have + skills)), must_have,
+        limit=request.args.get('limit', 20, type=int))
+    return jsonify({"results": results,
+                    "searched": search_index.document_count(),
+                    "took_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+
+def backfill_jobs(jobs):
+    """
+    Score every CV in the search index against jobs, without Drive.
+
+    The whole corpus is scored against every job in one pass with
+    BatchScorer, so each CV's text is matched once however many jobs there
+    are. Each candidate linked to a CV is offered to each job's shortlist
+    index and, if shortlisted, linked into the shortlisted folder.
+
+    Args:
+        jobs: Dict of job_id -> Job
+
+    Returns:
+        BatchScores for the indexed CVs, and the number of candidates
+        scored per job
+    """
+    # Imported here so the app starts without numpy
+    from utils.batch_scoring import BatchScorer
+
+    sha256s = []
+
+    def texts():
+        for sha256, text in search_index.iter_documents():
+            sha256s.append(sha256)
+            yield text
+
+    scores = BatchScorer(jobs).score(texts())
+    scored = dict.fromkeys(jobs, 0)
+    for cv_index, sha256 in enumerate(sha256s):
+        names = {}
+        for candidate in search_index.candidates_for(sha256):
+            names.setdefault(candidate['name'], candidate['cv_path'])
+        if not names:
+            continue
+        for job_id, job in jobs.items():
+            score = float(scores.for_job(job_id)[cv_index])
+            matched_skills = scores.matched_skills(cv_index, job_id)
+            for name, cv_path in names.items():
+                result = CandidateResult(name, job_id, score, matched_skills)
+                shortlist_result(result, cv_path, cv_path,
+                                 cv_filename(name, cv_path), job)
+                results_store.record(result, 'backfill', sha256)
+                scored[job_id] += 1
+    return scores, scored
+
+
+@app.route('/search/backfill/<job_id>', methods=['POST'])
+def backfill(job_id):
+    """
+    Score a new job against every CV already indexed.
+
+    The job comes from the jobs file, or from a JSON body in the same form
+    as a jobs-file entry. Results go to the shortlist index
+    (GET /shortlist/<job_id>).
+    """
+    definition = request.get_json(silent=True)
+    if definition:
+        job = Job.from_definition(
+            job_id, definition, Config.JOB_DEFINITIONS.get('synonyms', {}))
+    elif job_id in Config.JOB_DEFINITIONS.get('jobs', {}):
+        job = get_job(job_id)
+    else:
+        return jsonify({"status": "error", "message": "Unknown job"}), 404
+
+    start = time.perf_counter()
+    _, scored = backfill_jobs({job_id: job})
+    return jsonify({"job_id": job_id, "candidates_scored": scored[job_id],
+                    "seconds": round(time.perf_counter() - start, 3),
+                    "shortlist": shortlist.top_candidates(job_id)})
+
+
+@app.route('/search/backfill', methods=['POST'])
+def backfill_all():
+    """
+    Score every configured job against every CV already indexed, in one
+    pass, e.g. after editing the jobs file.
+
+    ``min_score`` (default SHORTLIST_THRESHOLD) sets the score counted
+    towards each job's ``pool_fit``: how many indexed CVs reach it.
+    """
+    jobs = {job_id: get_job(job_id)
+            for job_id in Config.JOB_DEFINITIONS.get('jobs', {})}
+    min_score = request.args.get('min_score', Config.SHORTLIST_THRESHOLD,
+                                 type=float)
+
+    start = time.perf_counter()
+    scores, scored = backfill_jobs(jobs)
+    return jsonify({"candidates_scored": scored,
+                    "cvs": len(scores),
+                    "pool_fit": scores.pool_fit(min_score),
+                    "seconds": round(time.perf_counter() - start, 3),
+                    "shortlist": shortlist.top_candidates()})
+
+
+@app.route('/results/stats', methods=['GET'])
+def results_stats():
+    """
+    Aggregate the history of every scoring result, without the Sheets API,
+    e.g. ``/results/stats?job_id=1021&since=2026-10-01&group_by=job_id,day``.
+
+    Query parameters: ``job_id`` (comma-separated), ``since`` and ``until``
+    (ISO dates or datetimes), ``group_by`` (any of job_id, month, day,
+    source and status; default job_id), ``histogram`` (score bucket width)
+    and ``top_skills`` (number of most-matched skills per group).
+    """
+    start = time.perf_counter()
+    try:
+        groups = results_store.stats(
+            job_ids=split_param(request.args.get('job_id')),
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            group_by=tuple(split_param(request.args.get('group_by', 'job_id'))),
+            histogram_width=request.args.get('histogram', type=float),
+            top_skills=request.args.get('top_skills', 0, type=int))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify({"groups": groups,
+                    "took_ms": round((time.perf_counter() - start) * 1000, 2)})
+
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Stage latencies, bytes, pages and API counters for Prometheus"""
+    return Response(metrics.render(),
+                    mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+
+@app.route('/metrics/google_api', methods=['GET'])
+def google_api_metrics():
+    """Requests, throttles, retries and concurrency per Google API quota bucket"""
+    return jsonify(api_metrics())
+
 
 if __name__ == '__main__':
     app.run(debug=True)
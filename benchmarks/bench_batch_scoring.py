@@ -0,0 +1,73 @@
+"""
+Benchmark: BatchScorer versus the per-candidate Job.score_text loop.
+
+Scores a synthetic pool of CV texts against every job both ways, as
+POST /search/backfill does, and picks each job's top N. Checks that both
+give the same scores and matched skills.
+
+Usage:
+    python -m benchmarks.bench_batch_scoring [--cvs 5000] [--skills 30] [--jobs 10]
+"""
+from benchmarks.bench_skill_matcher import make_cv, make_skills
+from models.job import Job
+from utils.batch_scoring import BatchScorer
+import argparse
+import random
+import time
+
+
+def loop_scores(jobs, cvs, top_n):
+    """Score each CV against each job in turn and sort for the top N"""
+    scores = {}
+    top = {}
+    for job_id, job in jobs.items():
+        scores[job_id] = [job.score_text(cv_text) for cv_text in cvs]
+        ranked = sorted(range(len(cvs)), key=lambda i: -scores[job_id][i][0])
+        top[job_id] = ranked[:top_n]
+    return scores, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cvs', type=int, default=5000)
+    parser.add_argument('--skills', type=int, default=30)
+    parser.add_argument('--jobs', type=int, default=10)
+    parser.add_argument('--words', type=int, default=600)
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_skills(args.skills * 4, rng)
+    jobs = {f"job{j}": Job(f"job{j}", rng.sample(vocabulary, args.skills),
+                           weights={skill: rng.randint(1, 3) for skill in vocabulary})
+            for j in range(args.jobs)}
+    cvs = [make_cv(vocabulary, args.words, rng) for _ in range(args.cvs)]
+
+    start = time.perf_counter()
+    expected, _ = loop_scores(jobs, cvs, args.top_n)
+    loop_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    scores = BatchScorer(jobs).score(cvs)
+    scores.top_n_per_job(args.top_n)
+    batch_seconds = time.perf_counter() - start
+
+    for job_id, job in jobs.items():
+        for i, (score, matched_skills) in enumerate(expected[job_id]):
+            assert scores.for_job(job_id)[i] == score, (job_id, i)
+            assert (scores.matched_skills(i, job_id)
+                    == [skill for skill in job.required_skills
+                        if skill in matched_skills]), (job_id, i)
+
+    pairs = args.cvs * args.jobs
+    print(f"cvs x jobs:        {args.cvs} x {args.jobs} ({args.skills} skills each)")
+    print(f"per-candidate:     {loop_seconds:.2f}s "
+          f"({pairs / loop_seconds:,.0f} scores/s)")
+    print(f"BatchScorer:       {batch_seconds:.2f}s "
+          f"({pairs / batch_seconds:,.0f} scores/s)")
+    print(f"speedup:           {loop_seconds / batch_seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+Benchmark: the /process_cvs batch end to end against local fake Google APIs.
+
+Generates a synthetic PDF corpus, serves it through fake Sheets and Drive
+endpoints with a configurable round-trip latency, then runs
+fetch_candidates and the batch pipeline (download, parse and score,
+sheet writes) exactly as the app does. Reports throughput, p50/p99
+latency per stage (estimated from the cv_stage_seconds histogram) and
+peak RSS, and writes them as JSON that later runs can be compared with.
+
+Usage:
+    python -m benchmarks.bench_end_to_end [--cvs 200] [--pages 2] [--latency-ms 20]
+        [--output results.json] [--baseline baseline.json] [--max-regression 0.1]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+STAGES = ('download', 'parse', 'score', 'sheet_write')
+
+# Metrics compared against a baseline, and whether larger is better
+COMPARED = {
+    'throughput_cvs_per_second': True,
+    'wall_seconds': False,
+    'peak_rss_mb': False,
+}
+
+
+def configure(workdir, fake):
+    """Point the app at the fake server and keep its state in workdir"""
+    os.environ.update(fake.environ())
+    os.environ.update({
+        'GOOGLE_SHEET_ID': 'benchmark',
+        'CHECKPOINT_PATH': os.path.join(workdir, 'checkpoint.sqlite3'),
+        'PARSE_CACHE_PATH': os.path.join(workdir, 'parse_cache.sqlite3'),
+        'JOB_DB_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+        'SHORTLIST_INDEX_PATH': os.path.join(workdir, 'shortlist.sqlite3'),
+        'SEARCH_INDEX_PATH': os.path.join(workdir, 'search_index.sqlite3'),
+    })
+    # Measure the app rather than the client-side quota limits, unless the
+    # caller set them explicitly
+    for name in ('DRIVE_REQUESTS_PER_SECOND', 'SHEETS_READS_PER_SECOND',
+                 'SHEETS_WRITES_PER_SECOND'):
+        os.environ.setdefault(name, '1000000')
+
+
+def stage_stats(metrics):
+    stats = {}
+    state = metrics.snapshot()['cv_stage_seconds']
+    for stage in STAGES:
+        values = state.get((stage,))
+        if not values:
+            continue
+        count = sum(values[:-1])
+        stats[stage] = {
+            'count': count,
+            'mean_seconds': values[-1] / count,
+            'p50_seconds': metrics.STAGE_SECONDS.quantile(0.5, stage=stage),
+            'p99_seconds': metrics.STAGE_SECONDS.quantile(0.99, stage=stage),
+        }
+    return stats
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KiB on Linux; children covers the process pool
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024, own / 1024, children / 1024
+
+
+def run(args, workdir):
+    # Config reads the environment at import, so nothing from the app is
+    # imported until the fake server's settings are in place
+    from benchmarks.fake_google import FakeGoogle
+
+    fake = FakeGoogle({}, [], latency=args.latency_ms / 1000)
+    configure(workdir, fake)
+
+    from benchmarks.corpus import build_corpus
+    from config.settings import Config
+    from utils import metrics
+
+    paths = build_corpus(os.path.join(workdir, 'corpus'), args.cvs,
+                         args.pages, seed=args.seed)
+    rng = random.Random(args.seed)
+    job_ids = sorted(Config.JOB_DEFINITIONS.get('jobs', {}))
+    rows = [['Name', 'Job ID', 'CV']]
+    for n, path in enumerate(paths):
+        file_id = f"cv{n}"
+        fake.files[file_id] = path
+        rows.append([f"Candidate {n}", rng.choice(job_ids),
+                     f"https://drive.google.com/file/d/{file_id}/view"])
+    fake.rows = rows
+    fake.start()
+
+    os.chdir(workdir)
+    import app
+
+    try:
+        start = time.perf_counter()
+        # Candidates are read from the sheet page by page as the batch runs
+        results = list(app.iter_candidate_results(app.fetch_candidates()))
+        wall = time.perf_counter() - start
+    finally:
+        fake.stop()
+
+    peak, own, children = peak_rss_mb()
+    counters = metrics.snapshot()
+    return {
+        'config': {
+            'cvs': args.cvs,
+            'pages': args.pages,
+            'latency_ms': args.latency_ms,
+            'transport': Config.BATCH_TRANSPORT,
+            'io_workers': Config.PIPELINE_IO_WORKERS,
+            'cpu_workers': Config.PIPELINE_CPU_WORKERS,
+            'pdf_backend': Config.PDF_BACKEND,
+            'scoring_mode': Config.SCORING_MODE,
+            'python': sys.version.split()[0],
+        },
+        'candidates': len(results),
+        'errors': sum(1 for result in results if result.failed),
+        'rows_appended': len(fake.appended),
+        'api_requests': fake.requests,
+        'wall_seconds': wall,
+        'throughput_cvs_per_second': len(results) / wall,
+        'stages': stage_stats(metrics),
+        'downloaded_bytes': counters['cv_downloaded_bytes'].get((), 0),
+        'pages_parsed': sum(counters['cv_pages_parsed'].values()),
+        'peak_rss_mb': peak,
+        'peak_rss_main_mb': own,
+        'peak_rss_children_mb': children,
+    }
+
+
+def flatten(report):
+    """Metrics to compare, including per-stage p50/p99"""
+    values = {name: report[name] for name in COMPARED if name in report}
+    for stage, stats in report.get('stages', {}).items():
+        for key in ('p50_seconds', 'p99_seconds'):
+            values[f"{stage}.{key}"] = stats[key]
+    return values
+
+
+def compare(report, baseline, max_regression):
+    """Print changes against a baseline; return the regressed metric names"""
+    current = flatten(report)
+    previous = flatten(baseline)
+    regressions = []
+    print(f"\n{'metric':<28}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name, value in current.items():
+        old = previous.get(name)
+        if not old:
+            continue
+        change = (value - old) / old
+        higher_is_better = COMPARED.get(name, False)
+        worse = -change if higher_is_better else change
+        flag = ''
+        if worse > max_regression:
+            regressions.append(name)
+            flag = '  REGRESSION'
+        print(f"{name:<28}{old:>12.4g}{value:>12.4g}{change:>+9.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cvs', type=int, default=200)
+    parser.add_argument('--pages', type=int, default=2)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='defaults to a new temp directory')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--baseline', help='report from an earlier run to compare with')
+    parser.add_argument('--max-regression', type=float, default=0.1,
+                        help='fail if a metric is this fraction worse than the baseline')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    output = os.path.abspath(args.output) if args.output else None
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='cv-bench-'))
+    os.makedirs(workdir, exist_ok=True)
+    report = run(args, workdir)
+
+    print(f"{report['candidates']} CVs ({report['errors']} errors) in "
+          f"{report['wall_seconds']:.2f}s: "
+          f"{report['throughput_cvs_per_second']:.1f} CVs/s, "
+          f"peak RSS {report['peak_rss_mb']:.0f} MB")
+    print(f"{'stage':<14}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}{'mean ms':>10}")
+    for stage, stats in report['stages'].items():
+        print(f"{stage:<14}{stats['count']:>7}{stats['p50_seconds'] * 1000:>10.2f}"
+              f"{stats['p99_seconds'] * 1000:>10.2f}{stats['mean_seconds'] * 1000:>10.2f}")
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.max_regression)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than "
+                  f"{args.max_regression:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
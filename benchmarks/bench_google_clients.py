@@ -0,0 +1,91 @@
+"""
+Micro-benchmark: per-candidate Google client overhead before and after the
+client registry.
+
+Each candidate in a batch needs a Drive client (download) and a Sheets
+client (result write). Before the registry every call parsed the
+service-account JSON and ran discovery ``build()``; now both are cached.
+No network access is needed: a throwaway service-account key is generated
+and no request is ever executed.
+
+Usage:
+    python -m benchmarks.bench_google_clients [--candidates 200]
+"""
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.oauth2.service_account import Credentials
+from googleapiclient.discovery import build
+from services.google_clients import DRIVE_SCOPES, SHEETS_SCOPES, registry
+from services.google_drive_service import get_drive_service
+from services.google_sheets_service import get_sheets_service
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def write_fake_credentials(directory):
+    """Write a throwaway service-account key file and return its path"""
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption()).decode()
+    path = os.path.join(directory, 'service_account.json')
+    with open(path, 'w') as f:
+        json.dump({
+            'type': 'service_account',
+            'project_id': 'benchmark',
+            'private_key_id': 'benchmark',
+            'private_key': pem,
+            'client_email': 'benchmark@benchmark.iam.gserviceaccount.com',
+            'client_id': '0',
+            'token_uri': 'https://oauth2.googleapis.com/token',
+        }, f)
+    return path
+
+
+def uncached_clients():
+    """What every per-candidate call did before the registry"""
+    creds_path = os.getenv('GOOGLE_CREDENTIALS_PATH')
+    creds = Credentials.from_service_account_file(
+        creds_path, scopes=DRIVE_SCOPES)
+    build('drive', 'v3', credentials=creds, cache_discovery=False)
+    creds = Credentials.from_service_account_file(
+        creds_path, scopes=SHEETS_SCOPES)
+    build('sheets', 'v4', credentials=creds, cache_discovery=False)
+
+
+def cached_clients():
+    get_drive_service()
+    get_sheets_service()
+
+
+def measure(fn, candidates):
+    start = time.perf_counter()
+    for _ in range(candidates):
+        fn()
+    return (time.perf_counter() - start) / candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--candidates', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['GOOGLE_CREDENTIALS_PATH'] = write_fake_credentials(tmp)
+        registry.clear()
+
+        before = measure(uncached_clients, args.candidates)
+        after = measure(cached_clients, args.candidates)
+
+    print(f"candidates:          {args.candidates}")
+    print(f"before (per cand.):  {before * 1000:.3f} ms")
+    print(f"after  (per cand.):  {after * 1000:.3f} ms")
+    print(f"speedup:             {before / after:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Benchmark: PDF text extraction backends on sample CVs.
+
+Times every installed backend (PyPDF2, pdfminer.six, pypdfium2) on the
+PDFs in temp_cvs/ (or the paths given) and reports the text each one
+extracted, so speed can be weighed against output.
+
+Usage:
+    python -m benchmarks.bench_pdf_backends [--repeat 20] [pdf ...]
+"""
+from utils.pdf_parser import BACKENDS, available_backends, backend_version
+import argparse
+import glob
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('pdfs', nargs='*')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pdfs = args.pdfs or sorted(glob.glob('temp_cvs/*.pdf'))
+    if not pdfs:
+        parser.error('no PDFs given and none found in temp_cvs/')
+
+    print(f"{'backend':<12}{'version':<12}{'ms/document':>12}{'chars':>10}")
+    for name in available_backends():
+        backend = BACKENDS[name]
+        chars = 0
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            chars = sum(len(text) for pdf in pdfs
+                        for text in backend.iter_pages(pdf))
+        per_document = (time.perf_counter() - start) / (args.repeat * len(pdfs))
+        print(f"{name:<12}{backend_version(backend):<12}"
+              f"{per_document * 1000:>12.2f}{chars:>10}")
+
+
+if __name__ == '__main__':
+    main()
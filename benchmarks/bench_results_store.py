@@ -0,0 +1,119 @@
+"""
+Benchmark: analytics queries over a large results history.
+
+Fills a results store with synthetic results spread over several jobs and
+twelve months, then times the aggregations GET /results/stats runs: per
+job over everything, one job's month by day, and score histograms with
+top skills. Nothing touches Google APIs.
+
+Usage:
+    python -m benchmarks.bench_results_store [--rows 1000000] [--jobs 10]
+        [--repeats 3] [--output results.json]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+SKILLS = ['python', 'sql', 'java', 'javascript', 'aws', 'docker', 'kubernetes',
+          'react', 'figma', 'excel', 'git', 'api', 'linux', 'go', 'c++']
+CHUNK_ROWS = 100000
+
+
+def synthetic_rows(count, jobs, rng, start, span):
+    rows = []
+    for n in range(count):
+        skills = rng.sample(SKILLS, rng.randint(0, 6))
+        failed = rng.random() < 0.01
+        rows.append({
+            'recorded_at': start + rng.random() * span,
+            'job_id': f"job{rng.randrange(jobs)}",
+            'name': f"Candidate {n}",
+            'source': 'sheet',
+            'status': 'failed' if failed else 'scored',
+            'score': None if failed else float(len(skills)),
+            'matched_skills': [] if failed else skills,
+            'shortlisted': None if failed else len(skills) >= 3,
+            'sha256': f"{rng.getrandbits(256):064x}",
+            'download_seconds': rng.random() * 0.2,
+            'process_seconds': rng.random() * 0.05,
+            'reason': 'download failed' if failed else None,
+        })
+    return rows
+
+
+def timed(fn, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--jobs', type=int, default=10)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='defaults to a new temp directory')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='cv-bench-'))
+    # Config reads the environment at import
+    os.environ['RESULTS_STORE_PATH'] = os.path.join(workdir, 'results')
+    from services import results_store
+
+    rng = random.Random(args.seed)
+    year = 365 * 24 * 3600
+    start = time.time() - year
+    write_seconds = 0.0
+    for offset in range(0, args.rows, CHUNK_ROWS):
+        rows = synthetic_rows(min(CHUNK_ROWS, args.rows - offset), args.jobs,
+                              rng, start, year)
+        began = time.perf_counter()
+        results_store.write_rows(rows)
+        write_seconds += time.perf_counter() - began
+    files = sum(len(names) for _, _, names in os.walk(os.environ['RESULTS_STORE_PATH']))
+
+    month = time.strftime('%Y-%m-01', time.gmtime(start + year / 2))
+    queries = {
+        'per_job': lambda: results_store.stats(),
+        'job_month_by_day': lambda: results_store.stats(
+            job_ids=['job0'], since=month, group_by=('day',)),
+        'per_job_month_histogram': lambda: results_store.stats(
+            group_by=('job_id', 'month'), histogram_width=1),
+        'per_job_top_skills': lambda: results_store.stats(top_skills=5),
+    }
+    report = {
+        'config': {
+            'rows': args.rows,
+            'jobs': args.jobs,
+            'python': sys.version.split()[0],
+        },
+        'write_rows_per_second': args.rows / write_seconds,
+        'files': files,
+        'queries': {},
+    }
+    print(f"{args.rows} results written in {write_seconds:.1f}s "
+          f"({report['write_rows_per_second']:.0f} rows/s, {files} files)")
+    print(f"{'query':<28}{'median ms':>11}{'groups':>8}")
+    for name, query in queries.items():
+        seconds, groups = timed(query, args.repeats)
+        report['queries'][name] = {'median_seconds': seconds, 'groups': len(groups)}
+        print(f"{name:<28}{seconds * 1000:>11.1f}{len(groups):>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark: compiled SkillMatcher versus the old per-skill substring loop.
+
+Generates a synthetic corpus of CV texts and jobs with many required
+skills, then scores every CV against every job both ways.
+
+Usage:
+    python -m benchmarks.bench_skill_matcher [--cvs 10000] [--skills 200] [--jobs 3]
+"""
+from utils.skill_matcher import SkillMatcher
+import argparse
+import random
+import string
+import time
+
+FILLER = ('experience team project delivered managed built designed led '
+          'worked developed improved customer data system product').split()
+
+
+def substring_score(cv_text, required_skills):
+    """The scoring loop SkillMatcher replaced"""
+    score = 0
+    matched_skills = []
+    for skill in required_skills:
+        if skill.lower() in cv_text.lower():
+            score += 1
+            matched_skills.append(skill)
+    return score, matched_skills
+
+
+def make_skills(count, rng):
+    skills = set()
+    while len(skills) < count:
+        skills.add(''.join(rng.choices(string.ascii_lowercase,
+                                       k=rng.randint(2, 10))))
+    return sorted(skills)
+
+
+def make_cv(skills, words, rng):
+    tokens = rng.choices(FILLER, k=words)
+    for skill in rng.sample(skills, k=min(len(skills), 15)):
+        tokens.insert(rng.randrange(len(tokens)), skill.title())
+    return ' '.join(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--cvs', type=int, default=10000)
+    parser.add_argument('--skills', type=int, default=200)
+    parser.add_argument('--jobs', type=int, default=3)
+    parser.add_argument('--words', type=int, default=600)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_skills(args.skills * 2, rng)
+    jobs = [rng.sample(vocabulary, args.skills) for _ in range(args.jobs)]
+    cvs = [make_cv(vocabulary, args.words, rng) for _ in range(args.cvs)]
+
+    start = time.perf_counter()
+    for skills in jobs:
+        for cv_text in cvs:
+            substring_score(cv_text, skills)
+    substring_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matchers = [SkillMatcher(skills) for skills in jobs]
+    compile_seconds = time.perf_counter() - start
+    for matcher in matchers:
+        for cv_text in cvs:
+            matcher.score(cv_text)
+    matcher_seconds = time.perf_counter() - start
+
+    pairs = args.cvs * args.jobs
+    print(f"cvs x jobs:        {args.cvs} x {args.jobs} ({args.skills} skills each)")
+    print(f"substring loop:    {substring_seconds:.2f}s "
+          f"({pairs / substring_seconds:,.0f} scores/s)")
+    print(f"SkillMatcher:      {matcher_seconds:.2f}s "
+          f"({pairs / matcher_seconds:,.0f} scores/s, "
+          f"compile {compile_seconds * 1000:.1f} ms)")
+    print(f"speedup:           {substring_seconds / matcher_seconds:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
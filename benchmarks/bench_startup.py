@@ -0,0 +1,129 @@
+"""
+Benchmark: cold start of the app in fresh processes.
+
+Each repeat starts a new interpreter, as a gunicorn or process-pool worker
+would, and times ``import app``, the first request (``GET /``) and the first
+Google API call (a Sheets read against a local fake server, which includes
+importing googleapiclient and building the client). It also reports which
+heavy modules the import alone loaded, so an eager import creeping back in
+shows up here.
+
+Usage:
+    python -m benchmarks.bench_startup [--repeats 10] [--output results.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PHASES = ('import_seconds', 'first_request_seconds', 'first_google_call_seconds',
+          'process_seconds')
+
+# Modules that should only load once something needs them
+HEAVY_MODULES = ('googleapiclient', 'google.auth', 'google.oauth2', 'httplib2',
+                 'PyPDF2', 'pdfminer', 'pypdfium2', 'numpy', 'pandas')
+
+
+def child():
+    """One cold start; prints its timings as JSON"""
+    start = time.perf_counter()
+    import app
+    imported = time.perf_counter()
+    loaded = [name for name in HEAVY_MODULES if name in sys.modules]
+
+    response = app.app.test_client().get('/')
+    requested = time.perf_counter()
+    assert response.status_code == 200, response.status_code
+
+    candidates = list(app.fetch_candidates())
+    called = time.perf_counter()
+
+    print(json.dumps({
+        'import_seconds': imported - start,
+        'first_request_seconds': requested - imported,
+        'first_google_call_seconds': called - requested,
+        'loaded_at_import': loaded,
+        'candidates': len(candidates),
+    }))
+
+
+def run(args, workdir):
+    from benchmarks.bench_end_to_end import configure
+    from benchmarks.fake_google import FakeGoogle
+
+    fake = FakeGoogle({}, [['Name', 'Job ID', 'CV'],
+                           ['Candidate 0', '1021',
+                            'https://drive.google.com/file/d/cv0/view']])
+    configure(workdir, fake)
+    fake.start()
+    # Run from workdir like the app would, with the repo importable
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(
+        filter(None, [root, os.environ.get('PYTHONPATH')])))
+    runs = []
+    try:
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            output = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_startup', '--child'],
+                check=True, capture_output=True, text=True,
+                cwd=workdir, env=env).stdout
+            timings = json.loads(output.strip().splitlines()[-1])
+            # Interpreter start to exit, as the parent sees it
+            timings['process_seconds'] = time.perf_counter() - start
+            runs.append(timings)
+    finally:
+        fake.stop()
+
+    return {
+        'config': {
+            'repeats': args.repeats,
+            'python': sys.version.split()[0],
+        },
+        'phases': {
+            phase: {
+                'median_seconds': statistics.median(run[phase] for run in runs),
+                'min_seconds': min(run[phase] for run in runs),
+                'max_seconds': max(run[phase] for run in runs),
+            }
+            for phase in PHASES
+        },
+        'loaded_at_import': runs[0]['loaded_at_import'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeats', type=int, default=10)
+    parser.add_argument('--workdir', help='defaults to a new temp directory')
+    parser.add_argument('--output', help='write the report as JSON')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='cv-bench-'))
+    os.makedirs(workdir, exist_ok=True)
+    report = run(args, workdir)
+
+    print(f"{'phase':<28}{'median ms':>11}{'min ms':>9}{'max ms':>9}")
+    for phase, stats in report['phases'].items():
+        print(f"{phase:<28}{stats['median_seconds'] * 1000:>11.1f}"
+              f"{stats['min_seconds'] * 1000:>9.1f}{stats['max_seconds'] * 1000:>9.1f}")
+    loaded = report['loaded_at_import']
+    print(f"heavy modules loaded by import app: {', '.join(loaded) or 'none'}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
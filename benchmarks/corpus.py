@@ -0,0 +1,106 @@
+"""
+Synthetic CV corpus for benchmarks.
+
+Writes small text-only PDFs by hand so no PDF-writing dependency is
+needed. Each CV mentions a random subset of the configured skills (and
+their synonyms) among filler text, spread over the requested pages.
+"""
+from config.settings import Config
+import os
+import random
+
+FILLER = ('experience team project delivered managed built designed led '
+          'worked developed improved customer data system product '
+          'responsible stakeholders quarterly release platform').split()
+
+LINES_PER_PAGE = 50
+WORDS_PER_LINE = 12
+
+
+def _escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def write_pdf(path, pages):
+    """
+    Write a PDF with one page per list of text lines.
+
+    Args:
+        path: Output file
+        pages: List of pages, each a list of lines
+    """
+    objects = []
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = ' '.join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, lines in zip(page_ids, pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {page_id + 1} 0 R >>".encode())
+        text = ' T* '.join(f"({_escape(line)}) Tj" for line in lines)
+        stream = f"BT /F1 9 Tf 11 TL 40 760 Td {text} ET".encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += (b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, xref))
+
+    with open(path, 'wb') as f:
+        f.write(out)
+
+
+def skill_vocabulary(definitions=None):
+    """Every skill and alias named in the jobs file"""
+    definitions = definitions or Config.JOB_DEFINITIONS
+    terms = set()
+    for skill, aliases in definitions.get('synonyms', {}).items():
+        terms.add(skill)
+        terms.update(aliases)
+    for job in definitions.get('jobs', {}).values():
+        for tier in ('must_have', 'nice_to_have'):
+            terms.update(job.get(tier, []))
+    return sorted(terms)
+
+
+def make_cv_pages(pages, vocabulary, rng):
+    """Return page line lists with a few skills scattered through filler"""
+    skills = rng.sample(vocabulary, k=min(len(vocabulary), rng.randint(2, 8)))
+    result = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(LINES_PER_PAGE):
+            words = rng.choices(FILLER, k=WORDS_PER_LINE)
+            if skills and rng.random() < 0.1:
+                words[rng.randrange(WORDS_PER_LINE)] = rng.choice(skills)
+            lines.append(' '.join(words))
+        result.append(lines)
+    return result
+
+
+def build_corpus(directory, count, pages, seed=0):
+    """
+    Generate ``count`` CVs of ``pages`` pages each.
+
+    Returns:
+        List of file paths, named cv_<n>.pdf
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    vocabulary = skill_vocabulary()
+    paths = []
+    for n in range(count):
+        path = os.path.join(directory, f"cv_{n}.pdf")
+        write_pdf(path, make_cv_pages(pages, vocabulary, rng))
+        paths.append(path)
+    return paths
@@ -0,0 +1,192 @@
+"""
+Local stand-in for the Sheets and Drive endpoints the app calls.
+
+Serves a form-responses sheet listing the corpus CVs, accepts result
+appends, answers batched Drive metadata requests and serves ranged
+downloads of the corpus files. Every request waits ``latency`` seconds
+first, to imitate the round trip to Google.
+
+Point the app at it with GOOGLE_SHEETS_ENDPOINT, GOOGLE_DRIVE_ENDPOINT and
+GOOGLE_API_ANONYMOUS=1 (see FakeGoogle.environ).
+"""
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+
+class FakeGoogle:
+    """
+    Fake Sheets and Drive APIs on a local port.
+
+    Args:
+        files: Dict of Drive file ID -> local PDF path
+        rows: Form response rows, header first
+        latency: Seconds to wait before answering each request
+    """
+
+    def __init__(self, files, rows, latency=0.0):
+        self.files = files
+        self.rows = rows
+        self.latency = latency
+        self.appended = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._metadata = {}
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _make_handler(self))
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def environ(self):
+        """Environment variables pointing the app's clients at this server"""
+        return {
+            'GOOGLE_SHEETS_ENDPOINT': self.url,
+            'GOOGLE_DRIVE_ENDPOINT': self.url,
+            'GOOGLE_API_ANONYMOUS': '1',
+        }
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def metadata(self, file_id):
+        path = self.files.get(file_id)
+        if path is None:
+            return None
+        if file_id not in self._metadata:
+            with open(path, 'rb') as f:
+                md5 = hashlib.md5(f.read()).hexdigest()
+            self._metadata[file_id] = {
+                'id': file_id,
+                'name': os.path.basename(path),
+                'mimeType': 'application/pdf',
+                'size': str(os.path.getsize(path)),
+                'md5Checksum': md5,
+            }
+        return self._metadata[file_id]
+
+
+def _make_handler(fake):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _begin(self):
+            with fake._lock:
+                fake.requests += 1
+            if fake.latency:
+                time.sleep(fake.latency)
+
+        def _send(self, status, body, content_type='application/json', headers=None):
+            if isinstance(body, (dict, list)):
+                body = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _body(self):
+            length = int(self.headers.get('Content-Length', 0))
+            return self.rfile.read(length)
+
+        def do_GET(self):
+            self._begin()
+            path = urlparse(self.path).path
+            if path.startswith('/v4/spreadsheets/') and '/values/' in path:
+                return self._send(200, {'values': self._rows(unquote(path))})
+
+            match = re.match(r'/drive/v3/files/([^/]+)$', path)
+            if match and 'alt=media' in self.path:
+                return self._download(match.group(1))
+            if match:
+                info = fake.metadata(match.group(1))
+                if info is None:
+                    return self._send(404, {'error': {'code': 404}})
+                return self._send(200, info)
+            self._send(404, {'error': {'code': 404}})
+
+        def do_POST(self):
+            self._begin()
+            body = self._body()
+            path = urlparse(self.path).path
+            if path.endswith(':append'):
+                rows = json.loads(body).get('values', [])
+                with fake._lock:
+                    fake.appended.extend(rows)
+                return self._send(200, {'updates': {'updatedRows': len(rows)}})
+            if path == '/batch/drive/v3':
+                return self._batch(body)
+            self._send(404, {'error': {'code': 404}})
+
+        def _rows(self, path):
+            # Honour "A<start>:Z<end>" ranges so paged reads work
+            match = re.search(r'!A(\d+):Z(\d*)$', path)
+            if not match:
+                return fake.rows
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(fake.rows)
+            return fake.rows[start - 1:end]
+
+        def _download(self, file_id):
+            path = fake.files.get(file_id)
+            if path is None:
+                return self._send(404, {'error': {'code': 404}})
+            size = os.path.getsize(path)
+            match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('range', ''))
+            if not match:
+                with open(path, 'rb') as f:
+                    return self._send(200, f.read(), 'application/pdf')
+            start = int(match.group(1))
+            end = min(int(match.group(2) or size - 1), size - 1)
+            if start >= size:
+                return self._send(416, b'', 'application/pdf',
+                                  {'Content-Range': f'bytes */{size}'})
+            with open(path, 'rb') as f:
+                f.seek(start)
+                chunk = f.read(end - start + 1)
+            self._send(206, chunk, 'application/pdf',
+                       {'Content-Range': f'bytes {start}-{end}/{size}'})
+
+        def _batch(self, body):
+            # Parse the multipart/mixed request into its embedded GETs
+            message = BytesParser(policy=HTTP).parsebytes(
+                b'Content-Type: ' + self.headers['Content-Type'].encode()
+                + b'\r\n\r\n' + body)
+            boundary = 'batch_fake_boundary'
+            parts = []
+            for part in message.iter_parts():
+                content_id = part['Content-ID'].strip('<>')
+                request_line = part.get_payload(decode=True).split(b'\r\n', 1)[0]
+                file_id = re.search(rb'/files/([^/?\s]+)', request_line).group(1).decode()
+                info = fake.metadata(file_id)
+                status = '200 OK' if info else '404 Not Found'
+                payload = json.dumps(info or {'error': {'code': 404}})
+                parts.append(
+                    f"--{boundary}\r\nContent-Type: application/http\r\n"
+                    f"Content-ID: <response-{content_id}>\r\n\r\n"
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n\r\n"
+                    f"{payload}\r\n")
+            response = ''.join(parts) + f"--{boundary}--\r\n"
+            self._send(200, response.encode(),
+                       f'multipart/mixed; boundary={boundary}')
+
+    return Handler
@@ -0,0 +1,255 @@
+"""
+Score a local directory of CV PDFs without the web app or Google APIs.
+
+Walks the directory, shards the PDFs across a process pool and scores each
+one with process_cv against the jobs in Config.REQUIRED_SKILLS (or the
+--job-id ones). Results are written through pandas as each shard finishes:
+appended to a CSV file, or as part files in a Parquet dataset directory.
+They also go to the results store with source "cli", as the web app's do,
+so /results/stats covers them. An interrupted run continues where it
+stopped with --resume, which also retries the CVs that failed.
+
+Usage:
+    python cli.py DIRECTORY --output results.csv [--job-id 1021 ...]
+        [--workers N] [--shard-size 32] [--resume]
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from config.settings import Config
+import argparse
+import glob
+import io
+import os
+import pandas as pd
+import sys
+import time
+
+COLUMNS = ['path', 'name', 'job_id', 'score', 'matched_skills',
+           'shortlisted', 'error']
+
+
+def find_pdfs(directory):
+    """Every PDF under directory, as sorted paths relative to it"""
+    paths = []
+    for root, _, files in os.walk(directory):
+        for filename in files:
+            if filename.lower().endswith('.pdf'):
+                paths.append(os.path.relpath(os.path.join(root, filename),
+                                             directory))
+    return sorted(paths)
+
+
+def score_shard(directory, items):
+    """
+    Score a shard of CVs (runs in a worker process).
+
+    Args:
+        directory: Directory the paths are relative to
+        items: (path, job_ids) pairs
+
+    Returns:
+        One row dict per CV and job, with the CV's sha256 and the job's
+        process_seconds for the results store; a CV that fails to parse
+        gets an error row for each job rather than failing the shard
+    """
+    from app import process_cv
+    from models.job import get_job
+    from utils.parse_cache import file_sha256
+
+    rows = []
+    for path, job_ids in items:
+        name = os.path.splitext(os.path.basename(path))[0]
+        cv_path = os.path.join(directory, path)
+        try:
+            sha256 = file_sha256(cv_path)
+        except OSError:
+            sha256 = None
+        for job_id in job_ids:
+            row = {'path': path, 'name': name, 'job_id': job_id, 'score': None,
+                   'matched_skills': None, 'shortlisted': None, 'error': None,
+                   'sha256': sha256, 'process_seconds': None}
+            start = time.perf_counter()
+            try:
+                score, matched_skills = process_cv(cv_path, job_id, sha256=sha256)
+            except Exception as e:
+                row['error'] = str(e)
+            else:
+                row['process_seconds'] = time.perf_counter() - start
+                row['score'] = score
+                row['matched_skills'] = ';'.join(matched_skills)
+                row['shortlisted'] = get_job(job_id).is_shortlisted(
+                    score, matched_skills)
+            rows.append(row)
+    return rows
+
+
+def record_rows(rows):
+    """Add a shard's rows to the results store, as the web batches do"""
+    from models.result import CandidateResult
+    from services import results_store
+
+    for row in rows:
+        if row['error'] is not None:
+            result = CandidateResult(row['name'], row['job_id'], error=row['error'])
+        else:
+            result = CandidateResult(
+                row['name'], row['job_id'], row['score'],
+                row['matched_skills'].split(';') if row['matched_skills'] else [],
+                row['shortlisted'])
+        results_store.record(result, 'cli', row['sha256'],
+                             {'process_seconds': row['process_seconds']})
+
+
+def is_parquet(output):
+    return output.endswith('.parquet')
+
+
+def drop_failed(output):
+    """
+    Remove an earlier run's error rows from its output, so a resumed run
+    scores those CVs again, as /process_cvs retries failed rows.
+
+    Returns:
+        Number of rows removed
+    """
+    removed = 0
+    if is_parquet(output):
+        for part in glob.glob(os.path.join(output, 'part-*.parquet')):
+            frame = pd.read_parquet(part)
+            failed = frame['error'].notna()
+            if failed.any():
+                # Kept even when empty, since parts are numbered by count
+                frame[~failed].to_parquet(part + '.tmp', index=False)
+                os.replace(part + '.tmp', part)
+                removed += int(failed.sum())
+        return removed
+    # Strings as written, so the rows that stay are written back unchanged
+    frame = pd.read_csv(output, dtype=str, keep_default_na=False,
+                        on_bad_lines='skip')
+    failed = frame['error'] != ''
+    if failed.any():
+        frame[~failed].to_csv(output + '.tmp', index=False)
+        os.replace(output + '.tmp', output)
+    return int(failed.sum())
+
+
+def read_done(output):
+    """(path, job_id) pairs already scored in an earlier run's output"""
+    if is_parquet(output):
+        parts = glob.glob(os.path.join(output, 'part-*.parquet'))
+        if not parts:
+            return set()
+        done = pd.concat([pd.read_parquet(part, columns=['path', 'job_id'])
+                          for part in parts])
+    else:
+        # A run killed mid-write can leave a truncated last line
+        done = pd.read_csv(output, usecols=['path', 'job_id'], dtype=str,
+                           on_bad_lines='skip')
+    return set(done.dropna().itertuples(index=False, name=None))
+
+
+class ResultWriter:
+    """Writes each shard's rows as soon as it finishes"""
+
+    def __init__(self, output, resume):
+        self.output = output
+        self.parquet = is_parquet(output)
+        if self.parquet:
+            os.makedirs(output, exist_ok=True)
+            self._part = len(glob.glob(os.path.join(output, 'part-*.parquet')))
+        self._header = not (resume and os.path.exists(output))
+
+    def write(self, rows):
+        frame = pd.DataFrame(rows, columns=COLUMNS)
+        if self.parquet:
+            path = os.path.join(self.output, f"part-{self._part:05d}.parquet")
+            # Written under a temporary name so a part is never half there
+            frame.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+            self._part += 1
+            return
+        # One write per shard keeps an interrupted run's file readable
+        with open(self.output, 'a', newline='') as f:
+            f.write(frame.to_csv(index=False, header=self._header))
+            f.flush()
+        self._header = False
+
+
+def shards(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('directory')
+    parser.add_argument('--output', required=True,
+                        help='.csv file, or .parquet dataset directory')
+    parser.add_argument('--job-id', action='append', dest='job_ids',
+                        help='job to score against (repeatable); defaults to every job')
+    parser.add_argument('--workers', type=int, default=Config.PIPELINE_CPU_WORKERS)
+    parser.add_argument('--shard-size', type=int, default=32,
+                        help='CVs per task; results are written a shard at a time')
+    parser.add_argument('--resume', action='store_true',
+                        help='skip CVs already scored in the output, retrying failed ones')
+    args = parser.parse_args()
+
+    job_ids = args.job_ids or list(Config.REQUIRED_SKILLS)
+    unknown = [job_id for job_id in job_ids if job_id not in Config.REQUIRED_SKILLS]
+    if unknown:
+        parser.error(f"unknown job IDs: {', '.join(unknown)}")
+    if os.path.exists(args.output) and not args.resume:
+        parser.error(f"{args.output} exists; pass --resume to continue it")
+    if is_parquet(args.output):
+        # Fail before scoring anything if no Parquet engine is installed
+        try:
+            pd.DataFrame(columns=COLUMNS).to_parquet(io.BytesIO())
+        except ImportError as e:
+            parser.error(str(e))
+
+    paths = find_pdfs(args.directory)
+    done = set()
+    if args.resume and os.path.exists(args.output):
+        removed = drop_failed(args.output)
+        if removed:
+            print(f"Retrying {removed} failed result(s) from the earlier run")
+        done = read_done(args.output)
+    # A CV cut off part-way through its jobs is scored for the rest only
+    todo = []
+    for path in paths:
+        missing = [job_id for job_id in job_ids if (path, job_id) not in done]
+        if missing:
+            todo.append((path, missing))
+    print(f"{len(paths)} PDFs found, {len(paths) - len(todo)} already done, "
+          f"{len(todo)} to score against {len(job_ids)} job(s)")
+    if not todo:
+        return
+
+    writer = ResultWriter(args.output, args.resume)
+    finished = 0
+    errors = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(args.workers, 1)) as executor:
+        futures = {executor.submit(score_shard, args.directory, shard): len(shard)
+                   for shard in shards(todo, max(args.shard_size, 1))}
+        for future in as_completed(futures):
+            rows = future.result()
+            writer.write(rows)
+            record_rows(rows)
+            finished += futures[future]
+            errors += len({row['path'] for row in rows if row['error']})
+            elapsed = time.perf_counter() - start
+            rate = finished / elapsed
+            print(f"{finished}/{len(todo)} files, {rate:.1f} files/s, "
+                  f"ETA {(len(todo) - finished) / rate:.0f}s", file=sys.stderr)
+
+    from services import results_store
+    results_store.flush()
+
+    elapsed = time.perf_counter() - start
+    print(f"Scored {finished} files in {elapsed:.1f}s "
+          f"({finished / elapsed:.1f} files/s, {errors} errors); "
+          f"results in {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,26 @@
+import json
 import os
 
+JOBS_FILE = os.getenv('JOBS_FILE', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'jobs.json'))
+
+
+def load_job_definitions(path):
+    """Read job definitions (skills, weights, tiers, synonyms) from JSON"""
+    with open(path) as f:
+        return json.load(f)
+
+
+def skills_by_job(definitions):
+    """Flatten job definitions to job_id -> list of skills, must-haves first"""
+    required = {}
+    for job_id, job in definitions.get('jobs', {}).items():
+        skills = []
+        for tier in ('must_have', 'nice_to_have'):
+            skills.extend(job.get(tier, []))
+        required[job_id] = list(dict.fromkeys(skills))
+    return required
+
 
 class Config:
     GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID')
@@ -7,11 +28,141 @@ class Config:
     GOOGLE_DRIVE_FOLDER_ID = os.getenv('GOOGLE_DRIVE_FOLDER_ID')
     SHORTLISTED_CVS_FOLDER = 'shortlisted_cvs'
 
-    # More detailed skills with weights
-    REQUIRED_SKILLS = {
-        '1021': ['python', 'flask', 'api', 'sql', 'git'],
-        'job_id_2': ['javascript', 'react', 'html', 'css', 'node'],
-        'developer': ['python', 'javascript', 'api', 'git', 'sql'],
-        'designer': ['figma', 'ui', 'ux', 'adobe', 'design'],
-        # Add more job IDs and their required skills as needed
+    # Batch pipeline: threads for Drive/Sheets I/O, processes for parsing
+    # and scoring, and a cap on candidates in flight at once
+    PIPELINE_IO_WORKERS = int(os.getenv('PIPELINE_IO_WORKERS', 8))
+    PIPELINE_CPU_WORKERS = int(
+        os.getenv('PIPELINE_CPU_WORKERS', os.cpu_count() or 1))
+    PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 64))
+
+    # /process_cvs transport for Drive downloads and result writes:
+    # "threads" uses googleapiclient on the IO thread pool, "asyncio" one
+    # event loop over a shared aiohttp connection pool with keep-alive,
+    # with up to ASYNC_MAX_IN_FLIGHT files in flight. Calls in flight are
+    # still capped per quota bucket by GOOGLE_API_MAX_CONCURRENCY.
+    BATCH_TRANSPORT = os.getenv('BATCH_TRANSPORT', 'threads')
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', 256))
+    ASYNC_HTTP_CONNECTIONS = int(os.getenv('ASYNC_HTTP_CONNECTIONS', 100))
+
+    # Refresh cached Google API tokens this many seconds before they expire
+    GOOGLE_TOKEN_REFRESH_MARGIN = int(
+        os.getenv('GOOGLE_TOKEN_REFRESH_MARGIN', 300))
+
+    # Background batch jobs (POST /jobs)
+    JOB_DB_PATH = os.getenv('JOB_DB_PATH', 'cache/jobs.sqlite3')
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', 1))
+    JOB_POLL_SECONDS = float(os.getenv('JOB_POLL_SECONDS', 0.5))
+    JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', 10))
+    JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', 60))
+
+    # Form responses are read this many rows per request, and batches are
+    # planned (grouped by Drive file, metadata prefetched) this many
+    # candidates at a time, so memory doesn't grow with the sheet
+    SHEETS_READ_PAGE_ROWS = int(os.getenv('SHEETS_READ_PAGE_ROWS', 5000))
+    BATCH_PLAN_WINDOW = int(os.getenv('BATCH_PLAN_WINDOW', 1000))
+
+    # Buffered writes to the Results sheet
+    SHEETS_WRITE_BATCH_ROWS = int(os.getenv('SHEETS_WRITE_BATCH_ROWS', 200))
+    SHEETS_WRITE_FLUSH_SECONDS = float(
+        os.getenv('SHEETS_WRITE_FLUSH_SECONDS', 5))
+
+    # Google API calls: requests per second for each quota bucket (Sheets
+    # allows 60 reads and 60 writes a minute per user by default), bursts of
+    # up to this many seconds' worth, a cap on calls in flight per bucket
+    # that halves while the API throttles, and retries for 429/5xx errors
+    GOOGLE_API_RATE_LIMITS = {
+        'drive': float(os.getenv('DRIVE_REQUESTS_PER_SECOND', 100)),
+        'sheets.read': float(os.getenv('SHEETS_READS_PER_SECOND', 1)),
+        'sheets.write': float(os.getenv('SHEETS_WRITES_PER_SECOND', 1)),
     }
+    GOOGLE_API_BURST_SECONDS = float(os.getenv('GOOGLE_API_BURST_SECONDS', 10))
+    GOOGLE_API_MAX_CONCURRENCY = int(os.getenv('GOOGLE_API_MAX_CONCURRENCY', 8))
+    GOOGLE_API_MAX_RETRIES = int(os.getenv('GOOGLE_API_MAX_RETRIES', 5))
+    GOOGLE_API_MAX_BACKOFF = float(os.getenv('GOOGLE_API_MAX_BACKOFF', 64))
+
+    # Point the clients at another server, e.g. a local fake for testing,
+    # optionally sending requests unauthenticated
+    GOOGLE_API_ENDPOINTS = {
+        'drive': os.getenv('GOOGLE_DRIVE_ENDPOINT'),
+        'sheets': os.getenv('GOOGLE_SHEETS_ENDPOINT'),
+    }
+    GOOGLE_API_ANONYMOUS = os.getenv('GOOGLE_API_ANONYMOUS', '0') == '1'
+
+    # CV downloads stream to disk in ranged chunks; larger files are refused
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv('DOWNLOAD_CHUNK_SIZE', 1024 * 1024))
+    MAX_CV_BYTES = int(os.getenv('MAX_CV_BYTES', 20 * 1024 * 1024))
+
+    # /process uploads up to this size are kept and parsed in memory, larger
+    # ones spill to disk, as does every upload once a request's uploads
+    # hold UPLOAD_MEMORY_BYTES in memory; one request may carry this many
+    # CVs (zip archive members included) and this many bytes (0 for no
+    # limit)
+    UPLOAD_SPOOL_BYTES = int(os.getenv('UPLOAD_SPOOL_BYTES', 4 * 1024 * 1024))
+    UPLOAD_MEMORY_BYTES = int(os.getenv('UPLOAD_MEMORY_BYTES', 64 * 1024 * 1024))
+    UPLOAD_MAX_FILES = int(os.getenv('UPLOAD_MAX_FILES', 500))
+    UPLOAD_MAX_REQUEST_BYTES = int(
+        os.getenv('UPLOAD_MAX_REQUEST_BYTES', 256 * 1024 * 1024))
+
+    # Drive file metadata is prefetched in batch HTTP requests of this many
+    # files (the Drive API accepts at most 100)
+    DRIVE_BATCH_SIZE = int(os.getenv('DRIVE_BATCH_SIZE', 100))
+
+    # PDF text extraction: backend ("auto", "pypdf2", "pdfminer" or
+    # "pypdfium2"), page-parallel extraction for long documents, and limits
+    # after which extraction stops early (0 means no limit)
+    PDF_BACKEND = os.getenv('PDF_BACKEND', 'auto')
+    PDF_PAGE_WORKERS = int(os.getenv('PDF_PAGE_WORKERS', os.cpu_count() or 1))
+    PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', 16))
+    PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 0))
+    PDF_MAX_CHARS = int(os.getenv('PDF_MAX_CHARS', 0))
+
+    # Read PDFs through a memory map instead of buffered file reads
+    PARSE_USE_MMAP = os.getenv('PARSE_USE_MMAP', '1') == '1'
+
+    # Persistent cache of extracted CV text, keyed by SHA-256 of the PDF
+    PARSE_CACHE_ENABLED = os.getenv('PARSE_CACHE_ENABLED', '1') == '1'
+    PARSE_CACHE_PATH = os.getenv('PARSE_CACHE_PATH', 'cache/parse_cache.sqlite3')
+    PARSE_CACHE_MAX_BYTES = int(
+        os.getenv('PARSE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+    # Full-text index of every parsed CV, for ad-hoc skill searches
+    # (GET /search) and scoring new jobs without downloading CVs again
+    SEARCH_INDEX_ENABLED = os.getenv('SEARCH_INDEX_ENABLED', '1') == '1'
+    SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', 'cache/search_index.sqlite3')
+
+    # Every scoring result is also kept in a local Parquet dataset,
+    # partitioned by job and month, for GET /results/stats. Results are
+    # written this many at a time (and after each batch, before a query
+    # and at exit), and a partition is compacted into one file once it
+    # has more part files than RESULTS_STORE_COMPACT_PARTS
+    RESULTS_STORE_ENABLED = os.getenv('RESULTS_STORE_ENABLED', '1') == '1'
+    RESULTS_STORE_PATH = os.getenv('RESULTS_STORE_PATH', 'cache/results')
+    RESULTS_STORE_FLUSH_ROWS = int(os.getenv('RESULTS_STORE_FLUSH_ROWS', 5000))
+    RESULTS_STORE_COMPACT_PARTS = int(os.getenv('RESULTS_STORE_COMPACT_PARTS', 8))
+
+    # Incremental /process_cvs: skip rows and Drive files already processed
+    PROCESS_INCREMENTAL = os.getenv('PROCESS_INCREMENTAL', '0') == '1'
+    CHECKPOINT_PATH = os.getenv('CHECKPOINT_PATH', 'cache/checkpoint.sqlite3')
+
+    # /process_cvs?profile=1 dumps a cProfile of one batch to PROFILE_DIR
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+    # "full" parses every page so all matched skills are reported;
+    # "early_exit" stops parsing once the shortlist decision is settled
+    # (the reported score is then a lower bound)
+    SCORING_MODE = os.getenv('SCORING_MODE', 'full')
+
+    # Default score a candidate needs to be shortlisted; jobs can override
+    # it with "threshold" in the jobs file
+    SHORTLIST_THRESHOLD = float(os.getenv('SHORTLIST_THRESHOLD', 3))
+
+    # Persistent index of the highest-scoring candidates per job, updated
+    # as each CV is scored (GET /shortlist)
+    SHORTLIST_TOP_N = int(os.getenv('SHORTLIST_TOP_N', 5))
+    SHORTLIST_INDEX_PATH = os.getenv('SHORTLIST_INDEX_PATH', 'cache/shortlist.sqlite3')
+
+    # More detailed skills with weights, tiers and synonyms live in the jobs
+    # file (config/jobs.json, or JOBS_FILE); add job IDs there
+    JOB_DEFINITIONS = load_job_definitions(JOBS_FILE)
+    REQUIRED_SKILLS = skills_by_job(JOB_DEFINITIONS)
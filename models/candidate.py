@@ -1,9 +1,16 @@
 class Candidate:
-    def __init__(self, name, job_id, cv_link):
+    """
+    A form response row. Slotted, so a large sheet costs a few pointers
+    per candidate rather than a dict each.
+    """
+    __slots__ = ('name', 'job_id', 'cv_link', 'score', 'row')
+
+    def __init__(self, name, job_id, cv_link, score=0, row=None):
         self.name = name
         self.job_id = job_id
         self.cv_link = cv_link
-        self.score = 0
+        self.score = score
+        self.row = row
 
     def set_score(self, score):
         self.score = score
@@ -14,4 +21,13 @@ class Candidate:
             "job_id": self.job_id,
             "cv_link": self.cv_link,
             "score": self.score
-        }
\ No newline at end of file
+        }
+
+    def to_row(self):
+        """Compact JSON-friendly form: [name, job_id, cv_link, row]"""
+        return [self.name, self.job_id, self.cv_link, self.row]
+
+    @classmethod
+    def from_row(cls, values):
+        name, job_id, cv_link, row = values
+        return cls(name, job_id, cv_link, row=row)
@@ -1,7 +1,76 @@
+from config.settings import Config
+from utils.skill_matcher import SkillMatcher
+
+
+def normalize_skill(skill):
+    """Casefold a skill name and collapse internal whitespace"""
+    return ' '.join(skill.casefold().split())
+
+
 class Job:
-    def __init__(self, job_id, required_skills):
+    """
+    A job's skill model: weighted skills split into must-have and
+    nice-to-have tiers, plus alias groups that count towards a skill.
+
+    The normalized alias -> skill index and the compiled matcher are built
+    once here, so scoring cost doesn't grow with the number of synonyms.
+    """
+
+    def __init__(self, job_id, required_skills, weights=None, must_have=None,
+                 synonyms=None, threshold=None):
+        """
+        Args:
+            job_id: Job identifier
+            required_skills: Canonical skill names
+            weights: Optional skill -> weight; unlisted skills weigh 1
+            must_have: Skills a candidate needs to be shortlisted
+            synonyms: Optional skill -> list of aliases
+            threshold: Score needed to be shortlisted, defaults to
+                Config.SHORTLIST_THRESHOLD
+        """
         self.job_id = job_id
-        self.required_skills = required_skills
+        self.required_skills = list(required_skills)
+        weights = weights or {}
+        self.weights = {skill: weights.get(skill, 1)
+                        for skill in self.required_skills}
+        self.must_have = [skill for skill in self.required_skills
+                          if skill in set(must_have or [])]
+        self.threshold = (Config.SHORTLIST_THRESHOLD if threshold is None
+                          else threshold)
+        self.max_score = sum(self.weights.values())
+
+        synonyms = synonyms or {}
+        self.index = {}
+        for skill in self.required_skills:
+            self.index[normalize_skill(skill)] = skill
+            for alias in synonyms.get(skill, []):
+                self.index.setdefault(normalize_skill(alias), skill)
+        self.matcher = SkillMatcher(self.index)
+
+    @classmethod
+    def from_definition(cls, job_id, definition, synonyms=None):
+        """
+        Build a Job from a jobs-file entry.
+
+        Each tier is a list of skills (weight 1) or a skill -> weight dict.
+        Job-level synonyms extend the shared ones.
+        """
+        weights = {}
+        tiers = {}
+        for tier in ('must_have', 'nice_to_have'):
+            skills = definition.get(tier, [])
+            if isinstance(skills, dict):
+                weights.update(skills)
+            tiers[tier] = list(skills)
+
+        merged = {skill: list(aliases)
+                  for skill, aliases in (synonyms or {}).items()}
+        for skill, aliases in definition.get('synonyms', {}).items():
+            merged.setdefault(skill, []).extend(aliases)
+
+        return cls(job_id, tiers['must_have'] + tiers['nice_to_have'],
+                   weights=weights, must_have=tiers['must_have'],
+                   synonyms=merged, threshold=definition.get('threshold'))
 
     def get_job_id(self):
         return self.job_id
@@ -10,8 +79,103 @@ class Job:
         return self.required_skills
 
     def score_candidate(self, candidate_skills):
-        score = 0
-        for skill in self.required_skills:
-            if skill in candidate_skills:
-                score += 1
-        return score
\ No newline at end of file
+        """Weighted score of a list of skill names, aliases included"""
+        matched = {self.index.get(normalize_skill(skill))
+                   for skill in candidate_skills}
+        return sum(self.weights[skill] for skill in self.required_skills
+                   if skill in matched)
+
+    def score_text(self, cv_text):
+        """
+        Score CV text against the job.
+
+        Returns:
+            (score, matched_skills) with the weighted score and the matched
+            canonical skills in the job's order
+        """
+        matched_skills = list(self.matcher.match(cv_text))
+        score = sum(self.weights[skill] for skill in matched_skills)
+        return score, matched_skills
+
+    def start_match(self):
+        """Begin scoring text fed in page by page; see IncrementalMatch"""
+        return IncrementalMatch(self)
+
+    def missing_must_haves(self, matched_skills):
+        matched = set(matched_skills)
+        return [skill for skill in self.must_have if skill not in matched]
+
+    def is_shortlisted(self, score, matched_skills):
+        """Shortlist on the score threshold, with every must-have matched"""
+        return (score >= self.threshold
+                and not self.missing_must_haves(matched_skills))
+
+
+class IncrementalMatch:
+    """
+    Scores a CV against a job as its pages arrive.
+
+    ``settled`` turns True once more text cannot change the shortlist
+    decision: every skill has matched, the job's maximum score is below its
+    threshold, or the candidate is already shortlisted (scores only grow).
+    Until every skill matches, the score is a lower bound.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.matched = set()
+
+    def feed(self, text):
+        """Match another page of text"""
+        self.matched.update(self.job.matcher.match(text))
+
+    @property
+    def matched_skills(self):
+        return [skill for skill in self.job.required_skills
+                if skill in self.matched]
+
+    @property
+    def score(self):
+        return sum(self.job.weights[skill] for skill in self.matched)
+
+    @property
+    def complete(self):
+        """True when every skill has matched, so the score is final"""
+        return len(self.matched) == len(self.job.required_skills)
+
+    @property
+    def settled(self):
+        if self.complete or self.job.max_score < self.job.threshold:
+            return True
+        return self.job.is_shortlisted(self.score, self.matched)
+
+
+_jobs = None
+
+
+def load_jobs(definitions=None):
+    """
+    Build Job objects for every job in the definitions.
+
+    Args:
+        definitions: Parsed jobs file, defaults to Config.JOB_DEFINITIONS
+
+    Returns:
+        Dict of job_id -> Job
+    """
+    if definitions is None:
+        definitions = Config.JOB_DEFINITIONS
+    synonyms = definitions.get('synonyms', {})
+    return {job_id: Job.from_definition(job_id, definition, synonyms)
+            for job_id, definition in definitions.get('jobs', {}).items()}
+
+
+def get_job(job_id):
+    """Return the configured Job, built once per process; unknown IDs score 0"""
+    global _jobs
+    if _jobs is None:
+        _jobs = load_jobs()
+    job = _jobs.get(job_id)
+    if job is None:
+        job = Job(job_id, [])
+    return job
@@ -0,0 +1,35 @@
+class CandidateResult:
+    """
+    The outcome of processing one candidate's CV.
+
+    Slotted to keep large batches small in memory. Only one of the scored
+    fields (matched_skills, shortlisted), ``error`` or ``skipped`` is set;
+    ``to_dict`` leaves out whichever fields don't apply.
+    """
+    __slots__ = ('name', 'job_id', 'score', 'matched_skills', 'shortlisted',
+                 'error', 'skipped', 'drive_url')
+
+    def __init__(self, name, job_id, score=0, matched_skills=None,
+                 shortlisted=None, error=None, skipped=None, drive_url=None):
+        self.name = name
+        self.job_id = job_id
+        self.score = score
+        self.matched_skills = matched_skills
+        self.shortlisted = shortlisted
+        self.error = error
+        self.skipped = skipped
+        self.drive_url = drive_url
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def to_dict(self):
+        """JSON form of the result, as returned by the API"""
+        result = {"name": self.name, "job_id": self.job_id, "score": self.score}
+        for field in ('matched_skills', 'shortlisted', 'error', 'skipped',
+                      'drive_url'):
+            value = getattr(self, field)
+            if value is not None:
+                result[field] = value
+        return result
@@ -0,0 +1,217 @@
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import Config
+from utils.sqlite_store import connect
+import json
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    incremental INTEGER NOT NULL,
+    candidates TEXT,
+    total INTEGER,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat REAL
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    failed INTEGER NOT NULL,
+    result TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    UNIQUE (job_id, idx)
+);
+"""
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+
+def _db():
+    return connect(Config.JOB_DB_PATH, SCHEMA)
+
+
+class BatchJobManager:
+    """
+    Runs /process_cvs batches in the background with state in SQLite.
+
+    Each job records its candidate list once fetched and every candidate
+    result as it finishes, so progress can be polled and streamed, and a
+    job interrupted by a restart resumes with only its unfinished
+    candidates. Running jobs refresh a heartbeat; every process checks for
+    jobs whose heartbeat has gone stale as it starts and on each of its own
+    heartbeats, and picks them up again.
+    """
+
+    def __init__(self, fetch, run, encode=None, decode=None):
+        """
+        Args:
+            fetch: Callable(incremental) returning the candidates
+            run: Callable(candidates) yielding (index, result) pairs as
+                each candidate finishes; results have to_dict() and failed
+            encode: Converts a candidate to JSON-friendly form for storage
+            decode: Inverse of encode
+        """
+        self.fetch = fetch
+        self.run = run
+        self.encode = encode or (lambda candidate: candidate)
+        self.decode = decode or (lambda stored: stored)
+        self._executor = None
+        self._active = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker pool and resume orphaned jobs; safe to repeat"""
+        with self._lock:
+            if self._executor is not None:
+                return
+            self._executor = ThreadPoolExecutor(
+                max_workers=Config.JOB_WORKERS)
+            threading.Thread(target=self._heartbeat, daemon=True).start()
+        self._reclaim_stale()
+
+    def _reclaim_stale(self):
+        """Resume queued or running jobs whose process stopped heartbeating"""
+        stale = time.time() - Config.JOB_STALE_SECONDS
+        rows = _db().execute(
+            'SELECT id FROM jobs WHERE status IN (?, ?) AND COALESCE(heartbeat, 0) < ?',
+            (QUEUED, RUNNING, stale)).fetchall()
+        for (job_id,) in rows:
+            with self._lock:
+                if job_id in self._active:
+                    continue
+            # Conditional update so only one process claims each job
+            claimed = _db().execute(
+                'UPDATE jobs SET heartbeat = ? WHERE id = ? AND COALESCE(heartbeat, 0) < ?',
+                (time.time(), job_id, stale)).rowcount
+            if claimed:
+                self._schedule(job_id)
+
+    def submit(self, incremental=False):
+        """Queue a new batch job and return its ID immediately"""
+        self.start()
+        job_id = uuid.uuid4().hex
+        _db().execute(
+            'INSERT INTO jobs (id, status, incremental, created_at, heartbeat) '
+            'VALUES (?, ?, ?, ?, ?)',
+            (job_id, QUEUED, int(incremental), time.time(), time.time()))
+        self._schedule(job_id)
+        return job_id
+
+    def get(self, job_id):
+        """Return job status with progress, throughput and ETA, or None"""
+        row = _db().execute(
+            'SELECT status, total, error, created_at, started_at, finished_at '
+            'FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        status, total, error, created_at, started_at, finished_at = row
+        completed, failed = _db().execute(
+            'SELECT COUNT(*), COALESCE(SUM(failed), 0) FROM job_results WHERE job_id = ?',
+            (job_id,)).fetchone()
+
+        throughput = None
+        eta = None
+        if started_at:
+            elapsed = (finished_at or time.time()) - started_at
+            if elapsed > 0 and completed:
+                throughput = completed / elapsed
+                if total is not None and status == RUNNING:
+                    eta = (total - completed) / throughput
+
+        return {
+            "job_id": job_id,
+            "status": status,
+            "total": total,
+            "completed": completed,
+            "failed": failed,
+            "throughput_per_second": throughput,
+            "eta_seconds": eta,
+            "created_at": created_at,
+            "started_at": started_at,
+            "finished_at": finished_at,
+            "error": error
+        }
+
+    def results_after(self, job_id, seq=0):
+        """Return [(seq, index, result)] recorded after the given sequence"""
+        rows = _db().execute(
+            'SELECT seq, idx, result FROM job_results WHERE job_id = ? AND seq > ? ORDER BY seq',
+            (job_id, seq)).fetchall()
+        return [(s, idx, json.loads(result)) for s, idx, result in rows]
+
+    def _schedule(self, job_id):
+        with self._lock:
+            self._active.add(job_id)
+        self._executor.submit(self._execute, job_id)
+
+    def _execute(self, job_id):
+        db = _db()
+        try:
+            incremental, stored = db.execute(
+                'SELECT incremental, candidates FROM jobs WHERE id = ?',
+                (job_id,)).fetchone()
+            db.execute(
+                'UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?) WHERE id = ?',
+                (RUNNING, time.time(), job_id))
+
+            if stored is None:
+                # Stored in compact form so the job can resume after a restart
+                stored = json.dumps([self.encode(candidate) for candidate
+                                     in self.fetch(bool(incremental))])
+                candidates = json.loads(stored)
+                db.execute('UPDATE jobs SET candidates = ?, total = ? WHERE id = ?',
+                           (stored, len(candidates), job_id))
+            else:
+                candidates = json.loads(stored)
+
+            # Skip candidates finished before a restart
+            done = {idx for (idx,) in db.execute(
+                'SELECT idx FROM job_results WHERE job_id = ?', (job_id,))}
+            todo = [i for i in range(len(candidates)) if i not in done]
+
+            for index, result in self.run(self.decode(candidates[i]) for i in todo):
+                db.execute(
+                    'INSERT OR REPLACE INTO job_results (job_id, idx, failed, result, finished_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (job_id, todo[index], int(result.failed),
+                     json.dumps(result.to_dict()), time.time()))
+
+            db.execute('UPDATE jobs SET status = ?, finished_at = ? WHERE id = ?',
+                       (COMPLETED, time.time(), job_id))
+        except Exception as e:
+            print(f"Error running job {job_id}: {str(e)}")
+            db.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ?',
+                (FAILED, str(e), time.time(), job_id))
+        finally:
+            with self._lock:
+                self._active.discard(job_id)
+
+    def _heartbeat(self):
+        while True:
+            time.sleep(Config.JOB_HEARTBEAT_SECONDS)
+            with self._lock:
+                active = list(self._active)
+            for job_id in active:
+                _db().execute('UPDATE jobs SET heartbeat = ? WHERE id = ?',
+                              (time.time(), job_id))
+            # Jobs orphaned by a restart only go stale after it
+            try:
+                self._reclaim_stale()
+            except Exception as e:
+                print(f"Error checking for stale jobs: {str(e)}")
+
+
+def is_finished(status):
+    """True once a job will record no more results"""
+    return status in (COMPLETED, FAILED)
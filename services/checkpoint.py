@@ -0,0 +1,90 @@
+from config.settings import Config
+from utils.sqlite_store import connect
+import hashlib
+import os
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed_rows (
+    sheet_id TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    row_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    processed_at REAL NOT NULL,
+    PRIMARY KEY (sheet_id, row_index)
+);
+CREATE TABLE IF NOT EXISTS processed_files (
+    file_id TEXT PRIMARY KEY,
+    md5 TEXT NOT NULL,
+    local_path TEXT NOT NULL,
+    processed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS processed_files_md5 ON processed_files (md5);
+"""
+
+ROW_DONE = 'done'
+ROW_FAILED = 'failed'
+# Rows not worth retrying, such as CVs that aren't PDFs
+ROW_SKIPPED = 'skipped'
+
+
+def _db():
+    return connect(Config.CHECKPOINT_PATH, SCHEMA)
+
+
+def row_hash(candidate):
+    """Hash the fields that identify a form response row"""
+    key = '\x1f'.join([candidate.name, candidate.job_id, candidate.cv_link])
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def resume_row(sheet_id):
+    """
+    Return the first sheet row an incremental run needs to fetch.
+
+    That is the earliest failed row if any, otherwise the row after the last
+    processed one. Row 1 (the header) is returned for a sheet never seen.
+    """
+    conn = _db()
+    failed = conn.execute(
+        'SELECT MIN(row_index) FROM processed_rows WHERE sheet_id = ? AND status = ?',
+        (sheet_id, ROW_FAILED)).fetchone()[0]
+    if failed is not None:
+        return failed
+    last = conn.execute(
+        'SELECT MAX(row_index) FROM processed_rows WHERE sheet_id = ?',
+        (sheet_id,)).fetchone()[0]
+    return 1 if last is None else last + 1
+
+
+def is_row_done(sheet_id, candidate):
+    """True if this exact row content was already processed or skipped"""
+    row = _db().execute(
+        'SELECT row_hash, status FROM processed_rows WHERE sheet_id = ? AND row_index = ?',
+        (sheet_id, candidate.row)).fetchone()
+    return (row is not None and row[0] == row_hash(candidate)
+            and row[1] in (ROW_DONE, ROW_SKIPPED))
+
+
+def mark_row(sheet_id, candidate, status):
+    """Record the outcome of processing a form response row"""
+    _db().execute(
+        'INSERT OR REPLACE INTO processed_rows VALUES (?, ?, ?, ?, ?)',
+        (sheet_id, candidate.row, row_hash(candidate), status, time.time()))
+
+
+def record_file(file_id, md5, local_path):
+    """Remember the checksum and local copy of a downloaded Drive file"""
+    _db().execute(
+        'INSERT OR REPLACE INTO processed_files VALUES (?, ?, ?, ?)',
+        (file_id, md5, local_path, time.time()))
+
+
+def find_file_copy(md5):
+    """Return the local path of a downloaded file with this md5, or None"""
+    for (local_path,) in _db().execute(
+            'SELECT local_path FROM processed_files WHERE md5 = ? '
+            'ORDER BY processed_at DESC', (md5,)):
+        if os.path.exists(local_path):
+            return local_path
+    return None
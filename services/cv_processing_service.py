@@ -1,8 +1,9 @@
 from flask import jsonify
+import heapq
 import os
 import requests
 from models.candidate import Candidate
-from models.job import Job
+from models.job import get_job
 from utils.pdf_parser import parse_pdf
 from utils.scoring_algorithm import score_candidates  # Updated import
 
@@ -29,7 +30,7 @@ class CVProcessingService:
             cv_content = parse_pdf(cv_file_path)
 
             # Get job requirements
-            job = Job(job_id)
+            job = get_job(job_id)
             required_skills = job.get_required_skills()
 
             # Score candidate
@@ -59,9 +60,8 @@ class CVProcessingService:
     def select_top_candidates(self, job_candidates):
         shortlisted = {}
         for job_id, candidates in job_candidates.items():
-            # Sort candidates by score
-            candidates.sort(key=lambda x: x.score, reverse=True)
-            top_candidates = candidates[:5]
+            # Select the top five without sorting every candidate
+            top_candidates = heapq.nlargest(5, candidates, key=lambda x: x.score)
 
             # Rename and save shortlisted CVs
             for index, candidate in enumerate(top_candidates, start=1):
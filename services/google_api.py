@@ -0,0 +1,319 @@
+from config.settings import Config
+from utils import metrics
+import json
+import os
+import random
+import threading
+import time
+
+# Quota buckets: Sheets meters reads and writes separately, Drive meters
+# all queries together
+DRIVE = 'drive'
+SHEETS_READ = 'sheets.read'
+SHEETS_WRITE = 'sheets.write'
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+RATE_LIMIT_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded'}
+
+
+class TokenBucket:
+    """Allows ``rate`` calls per second on average, bursting up to ``capacity``"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until the tokens are available; returns seconds waited"""
+        waited = 0.0
+        while True:
+            delay = self.try_acquire(tokens)
+            if not delay:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    def try_acquire(self, tokens=1):
+        """
+        Take the tokens if they are available without waiting.
+
+        A cost above the bucket's capacity could never be met; it waits for
+        a full bucket instead.
+
+        Returns:
+            0 if they were taken, otherwise seconds until they will be
+        """
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens
+                               + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0
+            return (tokens - self._tokens) / self.rate
+
+
+class AdaptiveConcurrency:
+    """
+    Caps the calls in flight, halving the cap when the API throttles and
+    raising it by one after a full cap's worth of unthrottled calls.
+    """
+
+    def __init__(self, maximum, minimum=1):
+        self.maximum = max(maximum, minimum)
+        self.minimum = minimum
+        self.limit = self.maximum
+        self._active = 0
+        self._successes = 0
+        self._cond = threading.Condition()
+        self._on_release = []
+
+    def acquire(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+
+    def try_acquire(self, on_release=None):
+        """
+        Take a slot if one is free, without blocking.
+
+        Callers that can't block, such as coroutines, pass ``on_release``:
+        if no slot is free it is called once, from whichever thread next
+        releases one, and the caller tries again.
+
+        Returns:
+            True if a slot was taken
+        """
+        with self._cond:
+            if self._active < self.limit:
+                self._active += 1
+                return True
+            if on_release is not None:
+                self._on_release.append(on_release)
+            return False
+
+    def release(self, throttled=False):
+        with self._cond:
+            self._active -= 1
+            if throttled:
+                self._back_off()
+            else:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+            waiting, self._on_release = self._on_release, []
+        for callback in waiting:
+            callback()
+
+    def throttled(self):
+        """Record throttling seen outside acquire/release"""
+        with self._cond:
+            self._back_off()
+
+    def _back_off(self):
+        self.limit = max(self.minimum, self.limit // 2)
+        self._successes = 0
+
+
+class QuotaBucket:
+    """Rate limit, concurrency cap and counters for one API quota bucket"""
+
+    def __init__(self, name, rate, max_concurrency):
+        self.name = name
+        self.tokens = TokenBucket(rate, rate * Config.GOOGLE_API_BURST_SECONDS)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.counts = {
+            "requests": 0,
+            "throttled": 0,
+            "transient_errors": 0,
+            "retries": 0,
+            "failures": 0,
+            "rate_limit_wait_seconds": 0.0,
+        }
+        self._lock = threading.Lock()
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.counts[key] += amount
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = dict(self.counts)
+        snapshot["concurrency_limit"] = self.concurrency.limit
+        return snapshot
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+_pid = os.getpid()
+
+
+def get_bucket(name):
+    """Return the process-wide QuotaBucket for a bucket name"""
+    global _pid
+    with _buckets_lock:
+        if _pid != os.getpid():
+            # A forked worker gets its own quota state
+            _buckets.clear()
+            _pid = os.getpid()
+        bucket = _buckets.get(name)
+        if bucket is None:
+            bucket = _buckets[name] = QuotaBucket(
+                name, Config.GOOGLE_API_RATE_LIMITS[name],
+                Config.GOOGLE_API_MAX_CONCURRENCY)
+        return bucket
+
+
+def is_http_error(error):
+    """True if error is a googleapiclient HttpError"""
+    # Imported here so the app starts without loading googleapiclient
+    from googleapiclient.errors import HttpError
+    return isinstance(error, HttpError)
+
+
+def is_throttled(error):
+    """True if an HttpError reports a rate or quota limit"""
+    if error.resp.status == 429:
+        return True
+    if error.resp.status != 403:
+        return False
+    try:
+        details = json.loads(error.content.decode('utf-8'))['error']['errors']
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return False
+    return any(detail.get('reason') in RATE_LIMIT_REASONS for detail in details)
+
+
+def is_retryable(error):
+    """True if a failed call is worth retrying after a backoff"""
+    if is_http_error(error):
+        return error.resp.status in RETRY_STATUSES or is_throttled(error)
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def is_ambiguous(error):
+    """
+    True if a failed call may still have been applied: a server error,
+    timeout or dropped connection rather than the request being rejected
+    """
+    if is_http_error(error):
+        return error.resp.status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def record_retry(bucket_name, error):
+    """
+    Count a retry that call() doesn't make itself, such as resending one
+    part of a batch request, and back off concurrency on throttling.
+    """
+    bucket = get_bucket(bucket_name)
+    if is_http_error(error) and is_throttled(error):
+        bucket.count("throttled")
+        bucket.concurrency.throttled()
+    else:
+        bucket.count("transient_errors")
+    bucket.count("retries")
+
+
+def backoff_delay(attempt, error=None):
+    """
+    Exponential backoff with jitter, as the Google API docs advise.
+
+    A Retry-After header on the error response takes precedence.
+    """
+    if is_http_error(error):
+        retry_after = error.resp.get('retry-after')
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+    return min(2 ** attempt + random.random(), Config.GOOGLE_API_MAX_BACKOFF)
+
+
+def call(bucket_name, fn, cost=1, max_retries=None, idempotent=True):
+    """
+    Call ``fn()`` under a bucket's rate limit, retrying throttling and
+    transient server errors.
+
+    Args:
+        bucket_name: Quota bucket, e.g. DRIVE or SHEETS_WRITE
+        fn: Callable making one API request; raises HttpError on failure
+        cost: Quota units the call uses (a batch request uses one per call)
+        max_retries: Defaults to Config.GOOGLE_API_MAX_RETRIES
+        idempotent: False for calls such as appends that must not be sent
+            twice; they are only retried when throttled, since a server
+            error or timeout may mean the first attempt was applied
+
+    Returns:
+        Whatever fn returns
+
+    Raises:
+        The last error once retries are exhausted, or any non-retryable error
+    """
+    if max_retries is None:
+        max_retries = Config.GOOGLE_API_MAX_RETRIES
+    bucket = get_bucket(bucket_name)
+
+    attempt = 0
+    while True:
+        bucket.count("rate_limit_wait_seconds", bucket.tokens.acquire(cost))
+        bucket.concurrency.acquire()
+        throttled = False
+        try:
+            bucket.count("requests")
+            return fn()
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            throttled = is_http_error(e) and is_throttled(e)
+            bucket.count("throttled" if throttled else "transient_errors")
+            if attempt >= max_retries or not (idempotent or throttled):
+                bucket.count("failures")
+                raise
+            delay = backoff_delay(attempt, e)
+            attempt += 1
+            bucket.count("retries")
+            print(f"{bucket_name} request failed ({str(e)}), "
+                  f"retrying in {delay:.1f}s")
+        finally:
+            bucket.concurrency.release(throttled)
+        time.sleep(delay)
+
+
+def execute(request, bucket_name, **kwargs):
+    """Execute a googleapiclient request through call()"""
+    return call(bucket_name, request.execute, **kwargs)
+
+
+def api_metrics():
+    """Counters for every quota bucket used so far in this process"""
+    with _buckets_lock:
+        buckets = list(_buckets.values())
+    return {bucket.name: bucket.snapshot() for bucket in buckets}
+
+
+def _collect_metrics():
+    snapshots = api_metrics()
+    for key, documentation in (
+            ("requests", "Google API requests sent"),
+            ("throttled", "Google API requests throttled (429 or rate-limit 403)"),
+            ("transient_errors", "Google API requests failed with 5xx or connection errors"),
+            ("retries", "Google API requests retried"),
+            ("failures", "Google API requests that failed after every retry"),
+            ("rate_limit_wait_seconds", "Time spent waiting on the client-side rate limit")):
+        yield (f"google_api_{key}", 'counter', documentation,
+               [({"bucket": name}, snapshot[key])
+                for name, snapshot in snapshots.items()])
+    yield ("google_api_concurrency_limit", 'gauge',
+           "Current adaptive cap on Google API calls in flight",
+           [({"bucket": name}, snapshot["concurrency_limit"])
+            for name, snapshot in snapshots.items()])
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,386 @@
+from services.google_api import (DRIVE, SHEETS_READ, SHEETS_WRITE, backoff_delay,
+                                 get_bucket, is_http_error, is_retryable,
+                                 is_throttled)
+from services.google_clients import (DRIVE_SCOPES, SHEETS_SCOPES, discovery_document,
+                                     expires_soon, registry)
+from services.google_drive_service import (CVTooLargeError, extract_file_id, file_md5,
+                                          open_partial)
+from services.google_sheets_service import RESULTS_RANGE
+from config.settings import Config
+from utils.metrics import DOWNLOADED_BYTES, SHEET_ROWS_WRITTEN, time_stage
+from functools import partial
+from urllib.parse import quote
+import asyncio
+import os
+import threading
+
+# Body bytes written to disk per read while a ranged chunk streams in
+READ_SIZE = 64 * 1024
+
+
+def _wake(loop, waiter):
+    # Called from whichever thread released a concurrency slot
+    def wake():
+        try:
+            loop.call_soon_threadsafe(
+                lambda: waiter.done() or waiter.set_result(None))
+        except RuntimeError:
+            # The loop has been closed
+            pass
+    return wake
+
+
+async def _acquire_slot(concurrency):
+    loop = asyncio.get_running_loop()
+    while True:
+        waiter = loop.create_future()
+        if concurrency.try_acquire(on_release=_wake(loop, waiter)):
+            return
+        await waiter
+
+
+async def call_async(bucket_name, fn, cost=1, max_retries=None, idempotent=True):
+    """
+    Await ``fn()`` under a bucket's rate limit, retrying throttling and
+    transient server errors; the coroutine counterpart of google_api.call.
+
+    The quota buckets are the ones call() uses, so threads and coroutines
+    in one process share a single rate limit and concurrency cap.
+
+    Args:
+        bucket_name: Quota bucket, e.g. DRIVE or SHEETS_WRITE
+        fn: Coroutine function making one API request; raises HttpError
+            on failure
+        cost: Quota units the call uses
+        max_retries: Defaults to Config.GOOGLE_API_MAX_RETRIES
+        idempotent: False for calls that must not be sent twice, as for
+            google_api.call
+
+    Returns:
+        Whatever fn returns
+
+    Raises:
+        The last error once retries are exhausted, or any non-retryable error
+    """
+    if max_retries is None:
+        max_retries = Config.GOOGLE_API_MAX_RETRIES
+    bucket = get_bucket(bucket_name)
+
+    attempt = 0
+    while True:
+        waited = 0.0
+        while True:
+            delay = bucket.tokens.try_acquire(cost)
+            if not delay:
+                break
+            await asyncio.sleep(delay)
+            waited += delay
+        bucket.count("rate_limit_wait_seconds", waited)
+        await _acquire_slot(bucket.concurrency)
+        throttled = False
+        try:
+            bucket.count("requests")
+            return await fn()
+        except Exception as e:
+            if not is_retryable(e):
+                raise
+            throttled = is_http_error(e) and is_throttled(e)
+            bucket.count("throttled" if throttled else "transient_errors")
+            if attempt >= max_retries or not (idempotent or throttled):
+                bucket.count("failures")
+                raise
+            delay = backoff_delay(attempt, e)
+            attempt += 1
+            bucket.count("retries")
+            print(f"{bucket_name} request failed ({str(e)}), "
+                  f"retrying in {delay:.1f}s")
+        finally:
+            bucket.concurrency.release(throttled)
+        await asyncio.sleep(delay)
+
+
+async def _http_error(response):
+    """An HttpError like googleapiclient raises, so retries treat it the same"""
+    from googleapiclient.errors import HttpError
+    import httplib2
+
+    content = await response.read()
+    info = {name.lower(): value for name, value in response.headers.items()}
+    info['status'] = str(response.status)
+    info['reason'] = response.reason
+    return HttpError(httplib2.Response(info), content, uri=str(response.url))
+
+
+def _refresh(creds):
+    from google.auth.transport.requests import Request
+    creds.refresh(Request())
+
+
+class AsyncGoogleClient:
+    """
+    Drive and Sheets calls over one aiohttp session on a background event
+    loop.
+
+    Every request shares the session's connection pool (at most
+    Config.ASYNC_HTTP_CONNECTIONS connections, kept alive between
+    requests), so hundreds of downloads can be in flight on one thread.
+    Credentials come from the shared client registry, and the endpoints
+    from Config.GOOGLE_API_ENDPOINTS or the bundled discovery documents,
+    so a local fake server works the same as with the threaded clients.
+
+    Coroutines run on ``loop``; ``run`` and ``append_rows_blocking`` call
+    into it from other threads. Use it as a context manager.
+    """
+
+    def __init__(self, connections=None):
+        self.connections = connections or Config.ASYNC_HTTP_CONNECTIONS
+        self.loop = None
+        self._thread = None
+        self._session = None
+        self._refresh_lock = None
+        # scopes -> credentials, checked on the loop without a thread hop
+        self._credentials = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        """Start the event loop thread and open the session"""
+        if self.loop is not None:
+            return
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever,
+                                        daemon=True)
+        self._thread.start()
+        self.run(self._open())
+
+    def run(self, coro):
+        """Run a coroutine on the client's loop and wait for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def close(self):
+        """Close the session and stop the loop"""
+        if self.loop is None:
+            return
+        try:
+            self.run(self._session.close())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join()
+            self.loop.close()
+            self.loop = None
+
+    async def _open(self):
+        # aiohttp takes a few hundred milliseconds to import
+        import aiohttp
+
+        self._aiohttp = aiohttp
+        self._refresh_lock = asyncio.Lock()
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.connections),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=30,
+                                          sock_read=60))
+
+    @staticmethod
+    def _url(api, version, path):
+        root = (Config.GOOGLE_API_ENDPOINTS.get(api)
+                or discovery_document(api, version)['rootUrl'])
+        return root.rstrip('/') + '/' + path
+
+    @staticmethod
+    def _usable(creds):
+        return creds is not None and creds.valid and not expires_soon(creds)
+
+    async def _auth_headers(self, scopes):
+        # Credentials are shared with the threaded clients; fetching or
+        # refreshing a token blocks, so it happens off the loop, and only
+        # when there is no token yet or it is about to expire
+        key = tuple(scopes)
+        creds = self._credentials.get(key)
+        if not self._usable(creds):
+            async with self._refresh_lock:
+                creds = self._credentials.get(key)
+                if not self._usable(creds):
+                    creds = await asyncio.to_thread(registry.get_credentials, scopes)
+                    if not creds.valid:
+                        await asyncio.to_thread(_refresh, creds)
+                    self._credentials[key] = creds
+        headers = {}
+        creds.apply(headers)
+        return headers
+
+    async def _request_json(self, method, url, scopes, **kwargs):
+        headers = await self._auth_headers(scopes)
+        try:
+            async with self._session.request(method, url, headers=headers,
+                                             **kwargs) as response:
+                if response.status != 200:
+                    raise await _http_error(response)
+                return await response.json(content_type=None)
+        except self._aiohttp.ClientConnectionError as e:
+            # Retried by call_async like any other dropped connection
+            raise ConnectionError(str(e)) from e
+
+    async def get_values(self, spreadsheet_id, range_name):
+        """Read a range of sheet values"""
+        url = self._url('sheets', 'v4', f"v4/spreadsheets/{spreadsheet_id}"
+                                        f"/values/{quote(range_name, safe='')}")
+        result = await call_async(SHEETS_READ, partial(
+            self._request_json, 'GET', url, SHEETS_SCOPES))
+        return result.get('values', [])
+
+    async def append_rows(self, rows, sheet_range=RESULTS_RANGE, spreadsheet_id=None):
+        """
+        Append rows to the sheet in a single request.
+
+        Args:
+            rows: List of row value lists
+            sheet_range: A1 range of the table to append to
+            spreadsheet_id: Target spreadsheet, defaults to GOOGLE_SHEET_ID
+        """
+        sheet_id = spreadsheet_id or os.getenv('GOOGLE_SHEET_ID')
+        url = self._url('sheets', 'v4', f"v4/spreadsheets/{sheet_id}"
+                                        f"/values/{quote(sheet_range, safe='')}:append")
+        with time_stage('sheet_write'):
+            response = await call_async(SHEETS_WRITE, partial(
+                self._request_json, 'POST', url, SHEETS_SCOPES,
+                params={'valueInputOption': 'RAW',
+                        'insertDataOption': 'INSERT_ROWS'},
+                json={'values': rows}), idempotent=False)
+        SHEET_ROWS_WRITTEN.inc(len(rows))
+        return response
+
+    def append_rows_blocking(self, rows, sheet_range=RESULTS_RANGE):
+        """append_rows for threads, e.g. as a SheetResultWriter's append"""
+        return self.run(self.append_rows(rows, sheet_range))
+
+    async def get_file_metadata(self, file_id, fields='id,name,mimeType,size,md5Checksum'):
+        """Fetch one Drive file's metadata"""
+        url = self._url('drive', 'v3', f"drive/v3/files/{quote(file_id, safe='')}")
+        return await call_async(DRIVE, partial(
+            self._request_json, 'GET', url, DRIVE_SCOPES,
+            params={'fields': fields}))
+
+    async def download_cv(self, file_url, destination_path, chunk_size=None,
+                          max_bytes=None, md5=None):
+        """
+        Download a CV from Google Drive; the coroutine counterpart of
+        google_drive_service.download_cv, with the same ranged chunks,
+        ``.part`` resume checked against md5, and size limit.
+
+        Each chunk is written to disk as it arrives rather than held in
+        memory, so many concurrent downloads stay cheap.
+
+        Returns:
+            Path to the downloaded file
+
+        Raises:
+            CVTooLargeError: If the file is larger than max_bytes
+        """
+        chunk_size = chunk_size or Config.DOWNLOAD_CHUNK_SIZE
+        max_bytes = max_bytes or Config.MAX_CV_BYTES
+        file_id = extract_file_id(file_url)
+        os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+
+        with time_stage('download'):
+            return await self._stream_to_file(
+                file_id, destination_path, chunk_size, max_bytes, md5)
+
+    async def _stream_to_file(self, file_id, destination_path, chunk_size,
+                              max_bytes, md5=None):
+        url = self._url('drive', 'v3', f"drive/v3/files/{quote(file_id, safe='')}")
+        partial_path = destination_path + '.part'
+        # Waiting for another writer's lock blocks, so it happens off the loop
+        f = await asyncio.to_thread(open_partial, partial_path)
+        with f:
+            try:
+                offset = f.tell()
+                if offset and not md5:
+                    # No way to tell which version of the file the leftover is
+                    f.truncate(0)
+                    offset = 0
+                await self._download_from(url, f, file_id, offset,
+                                          chunk_size, max_bytes)
+                if offset and await asyncio.to_thread(file_md5, partial_path) != md5:
+                    # The file changed on Drive since the leftover was written
+                    print(f"Discarding partial download of {file_id}: "
+                          f"it doesn't match the file's md5")
+                    f.truncate(0)
+                    await self._download_from(url, f, file_id, 0,
+                                              chunk_size, max_bytes)
+            except CVTooLargeError:
+                # Nothing worth resuming
+                os.remove(partial_path)
+                raise
+            os.replace(partial_path, destination_path)
+        return destination_path
+
+    async def _download_from(self, url, f, file_id, offset, chunk_size, max_bytes):
+        """Append the file to f from offset on, one ranged chunk at a time"""
+        while True:
+            status, total, written = await call_async(DRIVE, partial(
+                self._fetch_range, url, f, file_id, offset,
+                chunk_size, max_bytes))
+
+            if status == 416:
+                # Range starts past the end: the partial file is complete
+                if total == offset:
+                    break
+                f.truncate(0)
+                offset = 0
+                continue
+            if status == 200:
+                # Range ignored: the body was the whole file
+                offset = 0
+
+            offset += written
+            DOWNLOADED_BYTES.inc(written)
+            if offset >= total or not written:
+                break
+
+    async def _fetch_range(self, url, f, file_id, offset, chunk_size, max_bytes):
+        """
+        Request one ranged chunk and append its body to f at offset.
+
+        Returns:
+            (status, total file size, bytes written)
+        """
+        headers = await self._auth_headers(DRIVE_SCOPES)
+        headers['Range'] = f"bytes={offset}-{offset + chunk_size - 1}"
+        try:
+            async with self._session.get(url, params={'alt': 'media'},
+                                         headers=headers) as response:
+                if response.status not in (200, 206, 416):
+                    raise await _http_error(response)
+                if response.status == 416:
+                    total = int(response.headers['Content-Range'].rsplit('/', 1)[1])
+                    return 416, total, 0
+                if response.status == 200:
+                    start = 0
+                    total = response.content_length
+                else:
+                    start = offset
+                    total = int(response.headers['Content-Range'].rsplit('/', 1)[1])
+                if total is not None and total > max_bytes:
+                    raise CVTooLargeError(
+                        f"{file_id} is {total} bytes, limit is {max_bytes}")
+
+                # A retried chunk overwrites whatever its last attempt wrote
+                f.truncate(start)
+                written = 0
+                async for data in response.content.iter_chunked(READ_SIZE):
+                    written += len(data)
+                    if start + written > max_bytes:
+                        raise CVTooLargeError(
+                            f"{file_id} is over the limit of {max_bytes} bytes")
+                    f.write(data)
+                f.flush()
+                if total is None:
+                    total = written
+                return response.status, total, written
+        except self._aiohttp.ClientConnectionError as e:
+            raise ConnectionError(str(e)) from e
@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from config.settings import Config
+import json
+import os
+import threading
+
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+# google-auth and googleapiclient take a few hundred milliseconds to import,
+# so they are imported on first use rather than when each worker starts
+
+
+@lru_cache(maxsize=None)
+def discovery_document(api, version):
+    """
+    Return the parsed discovery document bundled with googleapiclient.
+
+    Parsed once per process and shared by every client built from it, so
+    building a client needs no network round trip and no JSON parsing.
+
+    Raises:
+        ValueError: If googleapiclient has no static document for the API
+    """
+    from googleapiclient.discovery_cache import get_static_doc
+
+    content = get_static_doc(api, version)
+    if content is None:
+        raise ValueError(f"No bundled discovery document for {api} {version}")
+    return json.loads(content)
+
+
+class ClientRegistry:
+    """
+    Process-wide cache of Google API clients.
+
+    Service-account credentials are parsed once per scope set and shared by
+    every thread. Discovery-built service objects are cached per thread,
+    because the httplib2 transport underneath them is not thread-safe.
+    Everything is created lazily on first use.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._credentials = {}
+        self._local = threading.local()
+        self._pid = os.getpid()
+
+    def get_credentials(self, scopes):
+        """Return shared credentials for the scopes, refreshing them early"""
+        key = tuple(scopes)
+        with self._lock:
+            self._reset_after_fork()
+            creds = self._credentials.get(key)
+            if creds is None:
+                if Config.GOOGLE_API_ANONYMOUS:
+                    # For local fake servers that don't check tokens
+                    from google.auth.credentials import AnonymousCredentials
+                    creds = AnonymousCredentials()
+                else:
+                    from google.oauth2.service_account import Credentials
+                    creds_path = os.getenv('GOOGLE_CREDENTIALS_PATH')
+                    creds = Credentials.from_service_account_file(
+                        creds_path, scopes=list(scopes))
+                self._credentials[key] = creds
+            # Refresh under the lock so threads sharing these credentials
+            # don't all race to refresh the same token as it expires. The
+            # first token is fetched lazily by the transport on first request.
+            if creds.token and expires_soon(creds):
+                from google.auth.transport.requests import Request
+                creds.refresh(Request())
+        return creds
+
+    def get_client(self, api, version, scopes):
+        """Return this thread's client for the API, building it on first use"""
+        creds = self.get_credentials(scopes)
+        clients = getattr(self._local, 'clients', None)
+        if clients is None or self._local.pid != os.getpid():
+            clients = self._local.clients = {}
+            self._local.pid = os.getpid()
+        key = (api, version, tuple(scopes))
+        client = clients.get(key)
+        if client is None:
+            from googleapiclient.discovery import build_from_document
+
+            document = discovery_document(api, version)
+            endpoint = Config.GOOGLE_API_ENDPOINTS.get(api)
+            if endpoint:
+                # Rewrite the root URL rather than passing client_options,
+                # which leaves batch requests pointed at Google
+                document = dict(document, rootUrl=endpoint.rstrip('/') + '/')
+            client = build_from_document(document, credentials=creds)
+            clients[key] = client
+        return client
+
+    def clear(self):
+        """Drop all cached credentials and this thread's clients"""
+        with self._lock:
+            self._credentials.clear()
+        self._local.clients = {}
+        self._local.pid = os.getpid()
+
+    def _reset_after_fork(self):
+        # Worker processes must not reuse the parent's open connections
+        if self._pid != os.getpid():
+            self._credentials.clear()
+            self._local = threading.local()
+            self._pid = os.getpid()
+
+
+
+def expires_soon(creds):
+    """True if a token expires within Config.GOOGLE_TOKEN_REFRESH_MARGIN"""
+    if creds.expiry is None:
+        return False
+    # google-auth stores expiry as a naive UTC datetime
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    margin = timedelta(seconds=Config.GOOGLE_TOKEN_REFRESH_MARGIN)
+    return creds.expiry - now <= margin
+
+
+registry = ClientRegistry()
+
+
+def get_drive_client():
+    """Return the calling thread's cached Google Drive client"""
+    return registry.get_client('drive', 'v3', DRIVE_SCOPES)
+
+
+def get_sheets_client():
+    """Return the calling thread's cached Google Sheets client"""
+    return registry.get_client('sheets', 'v4', SHEETS_SCOPES)
@@ -1,62 +1,184 @@
 from flask import Flask, request, jsonify, render_template
 from services.google_sheets_service import get_sheets_service, fetch_form_responses, process_candidates
-from utils.pdf_parser import parse_pdf
-from utils.scoring_algorithm import score_candidate, score_candidates
+from utils.parse_cache import parse_pdf_cached
+from models.job import get_job
 from config.settings import Config
 from dotenv import load_dotenv
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
-import io
+from services.google_api import DRIVE, backoff_delay, call, execute, is_retryable, record_retry
+from services.google_clients import get_drive_client
+from utils.file_lock import lock_file, open_for_append
+from utils.metrics import DOWNLOADED_BYTES, time_stage
+from functools import partial
+import hashlib
 import os
 import shutil
+import time
 
 
 def get_drive_service():
-    """Create and return Google Drive service client"""
-    creds_path = os.getenv('GOOGLE_CREDENTIALS_PATH')
-    scopes = ['https://www.googleapis.com/auth/drive']
-    creds = Credentials.from_service_account_file(creds_path, scopes=scopes)
-    return build('drive', 'v3', credentials=creds)
+    """Return the Google Drive service client cached for this thread"""
+    return get_drive_client()
 
 
-def download_cv(file_url, destination_path):
+def extract_file_id(file_url):
+    """Extract the Drive file ID from a sharing or view URL"""
+    # Handle different URL formats
+    if '/d/' in file_url:
+        return file_url.split('/d/')[1].split('/')[0]
+    return file_url.split('/')[-2]
+
+
+class CVTooLargeError(Exception):
+    """Raised when a Drive file exceeds Config.MAX_CV_BYTES"""
+
+
+def open_partial(partial_path):
+    """
+    Open a download's ``.part`` file for appending, with an exclusive lock
+    held until it is closed.
+
+    The lock is an OS file lock, so downloads of one file from other
+    threads or processes wait for it rather than interleaving appends. A
+    writer that waited while another finished and renamed the file into
+    place gets a new ``.part`` file. The file position is its end, as it
+    was when the lock was taken.
+    """
+    while True:
+        f = open_for_append(partial_path)
+        try:
+            lock_file(f)
+            if os.path.samestat(os.fstat(f.fileno()), os.stat(partial_path)):
+                return f
+        except FileNotFoundError:
+            # Renamed into place while this writer waited
+            pass
+        except BaseException:
+            f.close()
+            raise
+        f.close()
+
+
+def download_cv(file_url, destination_path, chunk_size=None, max_bytes=None,
+                md5=None):
     """
     Download CV from Google Drive using the file URL.
 
+    The file is streamed in ranged chunks into ``<destination>.part`` and
+    renamed into place once complete, so only one chunk is held in memory
+    and readers never see a half-written CV. A ``.part`` file left by an
+    interrupted download is resumed from where it stopped when the file's
+    md5 is known, and the finished file is checked against it; a leftover
+    from another version of the file is discarded.
+
     Args:
         file_url: URL of the file in Google Drive
         destination_path: Full path where the file should be saved
+        chunk_size: Bytes per ranged request, defaults to
+            Config.DOWNLOAD_CHUNK_SIZE
+        max_bytes: Size limit, defaults to Config.MAX_CV_BYTES
+        md5: The file's Drive md5Checksum, if known
 
     Returns:
         Path to the downloaded file
+
+    Raises:
+        CVTooLargeError: If the file is larger than max_bytes
     """
+    chunk_size = chunk_size or Config.DOWNLOAD_CHUNK_SIZE
+    max_bytes = max_bytes or Config.MAX_CV_BYTES
     drive_service = get_drive_service()
-
-    # Extract file ID from URL - handle different URL formats
-    if '/d/' in file_url:
-        file_id = file_url.split('/d/')[1].split('/')[0]
-    else:
-        file_id = file_url.split('/')[-2]  # Extract file ID from URL
+    file_id = extract_file_id(file_url)
 
     request = drive_service.files().get_media(fileId=file_id)
-    fh = io.BytesIO()
-
-    downloader = MediaIoBaseDownload(fh, request)
-    done = False
-    while done is False:
-        status, done = downloader.next_chunk()
 
     # Ensure the directory exists
     os.makedirs(os.path.dirname(destination_path), exist_ok=True)
 
-    # Save the file
-    with open(destination_path, 'wb') as f:
-        f.write(fh.getbuffer())
-
+    with time_stage('download'):
+        return _stream_to_file(request, file_id, destination_path,
+                               chunk_size, max_bytes, md5)
+
+
+def file_md5(path):
+    """Return the hex MD5 digest of a file's bytes, as Drive reports it"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fetch_range(request, offset, chunk_size):
+    headers = dict(request.headers)
+    headers['range'] = f"bytes={offset}-{offset + chunk_size - 1}"
+    resp, content = request.http.request(
+        request.uri, method='GET', headers=headers)
+    if resp.status not in (200, 206, 416):
+        from googleapiclient.errors import HttpError
+        raise HttpError(resp, content, uri=request.uri)
+    return resp, content
+
+
+def _stream_to_file(request, file_id, destination_path, chunk_size, max_bytes,
+                    md5=None):
+    partial_path = destination_path + '.part'
+    # Renamed or removed while still locked, so no writer appends to it after
+    with open_partial(partial_path) as f:
+        try:
+            offset = f.tell()
+            if offset and not md5:
+                # No way to tell which version of the file the leftover is
+                f.truncate(0)
+                offset = 0
+            _download_from(request, f, file_id, offset, chunk_size, max_bytes)
+            if offset and file_md5(partial_path) != md5:
+                # The file changed on Drive since the leftover was written
+                print(f"Discarding partial download of {file_id}: "
+                      f"it doesn't match the file's md5")
+                f.truncate(0)
+                _download_from(request, f, file_id, 0, chunk_size, max_bytes)
+        except CVTooLargeError:
+            # Nothing worth resuming
+            os.remove(partial_path)
+            raise
+        os.replace(partial_path, destination_path)
     return destination_path
 
 
+def _download_from(request, f, file_id, offset, chunk_size, max_bytes):
+    """Append the file to f from offset on, one ranged chunk at a time"""
+    while True:
+        resp, content = call(DRIVE, partial(
+            _fetch_range, request, offset, chunk_size))
+
+        if resp.status == 416:
+            # Range starts past the end: the partial file is complete
+            total = int(resp['content-range'].rsplit('/', 1)[1])
+            if total == offset:
+                break
+            f.truncate(0)
+            offset = 0
+            continue
+        if resp.status == 200:
+            # Range ignored: the body is the whole file
+            f.truncate(0)
+            offset = 0
+            total = len(content)
+        else:
+            total = int(resp['content-range'].rsplit('/', 1)[1])
+
+        if total > max_bytes:
+            raise CVTooLargeError(
+                f"{file_id} is {total} bytes, limit is {max_bytes}")
+
+        f.write(content)
+        offset += len(content)
+        DOWNLOADED_BYTES.inc(len(content))
+        if offset >= total or not content:
+            break
+    f.flush()
+
+
 def upload_to_drive(file_path, file_name):
     """Upload file to Google Drive"""
     drive_service = get_drive_service()
@@ -67,12 +189,13 @@ def upload_to_drive(file_path, file_name):
         'parents': [folder_id]
     }
 
+    from googleapiclient.http import MediaFileUpload
     media = MediaFileUpload(file_path, resumable=True)
-    file = drive_service.files().create(
+    file = execute(drive_service.files().create(
         body=file_metadata,
         media_body=media,
         fields='id,webViewLink'
-    ).execute()
+    ), DRIVE, idempotent=False)
 
     return file.get('id'), file.get('webViewLink')
 
@@ -80,18 +203,71 @@ def upload_to_drive(file_path, file_name):
 def get_file_metadata(file_url):
     """Get metadata of the file from Google Drive."""
     drive_service = get_drive_service()
+    file_id = extract_file_id(file_url)
 
-    # Extract file ID from URL - handle different URL formats
-    if '/d/' in file_url:
-        file_id = file_url.split('/d/')[1].split('/')[0]
-    else:
-        file_id = file_url.split('/')[-2]
-
-    file = drive_service.files().get(fileId=file_id, fields='name').execute()
+    file = execute(drive_service.files().get(fileId=file_id, fields='name'),
+                   DRIVE)
 
     return file.get('name')
 
 
+METADATA_FIELDS = 'id,name,mimeType,size,md5Checksum'
+
+
+def get_files_metadata(file_ids, fields=METADATA_FIELDS, batch_size=None):
+    """
+    Fetch metadata for many Drive files with batch HTTP requests.
+
+    Up to ``batch_size`` ``files().get`` calls share one HTTP round trip.
+    Calls in a batch that are throttled are retried in a later batch; a
+    file whose lookup fails (missing, no access) is left out of the result
+    rather than failing the rest of the batch.
+
+    Args:
+        file_ids: Drive file IDs; duplicates are fetched once
+        fields: Metadata fields to request
+        batch_size: Calls per batch request, defaults to
+            Config.DRIVE_BATCH_SIZE
+
+    Returns:
+        Dict of file_id -> metadata dict
+    """
+    batch_size = min(batch_size or Config.DRIVE_BATCH_SIZE, 100)
+    drive_service = get_drive_service()
+    metadata = {}
+    pending = list(dict.fromkeys(file_ids))
+    attempt = 0
+
+    while pending:
+        retry = []
+
+        def callback(request_id, response, exception):
+            if exception is None:
+                metadata[request_id] = response
+            elif is_retryable(exception) and attempt < Config.GOOGLE_API_MAX_RETRIES:
+                # Throttled parts of a batch are sent again in a new batch
+                record_retry(DRIVE, exception)
+                retry.append(request_id)
+            else:
+                print(f"Error fetching metadata for {request_id}: {str(exception)}")
+
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            batch = drive_service.new_batch_http_request(callback=callback)
+            for file_id in chunk:
+                batch.add(drive_service.files().get(fileId=file_id, fields=fields),
+                          request_id=file_id)
+            # Each call in a batch counts against the quota separately
+            call(DRIVE, batch.execute, cost=len(chunk))
+
+        if retry:
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+        pending = retry
+
+    return metadata
+
+
 # Load .env file
 load_dotenv()
 
@@ -108,7 +284,7 @@ def fetch_candidates():
     # Fetch data from Form Responses sheet
     form_responses = fetch_form_responses(sheet_id, "Form Responses 1")
     # Process candidates from the responses
-    candidates = process_candidates(form_responses)
+    candidates = list(process_candidates(form_responses))
     return candidates
 
 
@@ -125,14 +301,11 @@ def process_cv(cv_path, job_id):
     Returns:
         Score of the CV
     """
-    # Parse PDF text
-    cv_text = parse_pdf(cv_path)
-
-    # Get required skills for this job_id
-    required_skills = Config.REQUIRED_SKILLS.get(job_id, [])
+    # Parse PDF text, reusing text already extracted from the same file
+    cv_text = parse_pdf_cached(cv_path)
 
-    # Score the CV against required skills
-    score, matched_skills = score_candidate(cv_text, required_skills)
+    # Score the CV with the job's precomputed weighted skill index
+    score, matched_skills = get_job(job_id).score_text(cv_text)
     return score
 
 
@@ -187,22 +360,22 @@ def process_cvs():
         results = []
         for candidate in candidates:
             # Download CV
-            cv_path = f"temp_cvs/{candidate['name'].replace(' ', '_')}.pdf"
+            cv_path = f"temp_cvs/{candidate.name.replace(' ', '_')}.pdf"
             os.makedirs("temp_cvs", exist_ok=True)
             try:
-                download_cv(candidate['cv_link'], cv_path)
+                download_cv(candidate.cv_link, cv_path)
                 # Process the CV
-                score = process_cv(cv_path, candidate['job_id'])
+                score = process_cv(cv_path, candidate.job_id)
                 # Add result
                 result = {
-                    "name": candidate['name'],
-                    "job_id": candidate['job_id'],
+                    "name": candidate.name,
+                    "job_id": candidate.job_id,
                     "score": score
                 }
                 # Move to shortlisted folder if score is good enough
                 if score >= 3:  # Threshold based on number of matched skills
                     os.makedirs("shortlisted_cvs", exist_ok=True)
-                    shortlist_path = f"shortlisted_cvs/{candidate['job_id']}_{candidate['name'].replace(' ', '_')}.pdf"
+                    shortlist_path = f"shortlisted_cvs/{candidate.job_id}_{candidate.name.replace(' ', '_')}.pdf"
                     shutil.copy(cv_path, shortlist_path)
                     result["shortlisted"] = True
                 else:
@@ -211,10 +384,10 @@ def process_cvs():
                 results.append(result)
 
             except Exception as e:
-                print(f"Error processing {candidate['name']}: {str(e)}")
+                print(f"Error processing {candidate.name}: {str(e)}")
                 results.append({
-                    "name": candidate['name'],
-                    "job_id": candidate['job_id'],
+                    "name": candidate.name,
+                    "job_id": candidate.job_id,
                     "score": 0,
                     "error": str(e)
                 })
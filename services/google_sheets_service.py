@@ -1,74 +1,219 @@
-from googleapiclient.discovery import build
-from google.oauth2.service_account import Credentials
+from services.google_api import SHEETS_READ, SHEETS_WRITE, execute, is_ambiguous
+from services.google_clients import get_sheets_client
+from config.settings import Config
+from models.candidate import Candidate
+from utils.metrics import SHEET_ROWS_WRITTEN, time_stage
 import os
+import threading
+
+RESULTS_RANGE = 'Results!A:F'  # Update to match your sheet
 
 
 def get_sheets_service():
-    """Create and return Google Sheets service client"""
-    creds_path = os.getenv('GOOGLE_CREDENTIALS_PATH')
-    scopes = ['https://www.googleapis.com/auth/spreadsheets']
-    creds = Credentials.from_service_account_file(creds_path, scopes=scopes)
-    return build('sheets', 'v4', credentials=creds)
+    """Return the Google Sheets service client cached for this thread"""
+    return get_sheets_client()
 
 
 def fetch_form_responses(spreadsheet_id, range_name):
     """Fetch form responses from Google Sheets"""
     service = get_sheets_service()
     sheet = service.spreadsheets()
-    result = sheet.values().get(spreadsheetId=spreadsheet_id, range=range_name).execute()
+    result = execute(sheet.values().get(spreadsheetId=spreadsheet_id, range=range_name),
+                     SHEETS_READ)
     values = result.get('values', [])
     return values
 
 
-def process_candidates(data):
-    """Process the fetched data to extract candidates"""
-    candidates = []
-    # Skip if no data
-    if not data:
-        return candidates
+def iter_form_responses(spreadsheet_id, sheet_name, first_row=1, page_rows=None):
+    """
+    Yield a sheet's rows from first_row on, fetched a page at a time.
+
+    Only one page of rows is held at once. Form responses are appended
+    without gaps, so a short page marks the end of the sheet.
+
+    Args:
+        spreadsheet_id: Spreadsheet to read
+        sheet_name: Tab name, e.g. "Form Responses 1"
+        first_row: Sheet row number to start from
+        page_rows: Rows per request, defaults to Config.SHEETS_READ_PAGE_ROWS
+    """
+    page_rows = page_rows or Config.SHEETS_READ_PAGE_ROWS
+    start = first_row
+    while True:
+        end = start + page_rows - 1
+        values = fetch_form_responses(spreadsheet_id,
+                                      f"'{sheet_name}'!A{start}:Z{end}")
+        yield from values
+        if len(values) < page_rows:
+            return
+        start = end + 1
+
 
-    # Skip header row
-    for row in data[1:]:
+def process_candidates(data, first_row=1):
+    """
+    Process the fetched data to extract candidates.
+
+    Args:
+        data: Iterable of row values, e.g. from iter_form_responses
+        first_row: Sheet row number of the first row; row 1 is the header row
+
+    Yields:
+        Candidate objects with name, job_id, cv_link and sheet row
+    """
+    for row_number, row in enumerate(data, first_row):
+        # Skip header row
+        if row_number == 1:
+            continue
         # Ensure row has enough columns
         if len(row) >= 3:
-            candidate_name = row[0]
-            job_id = row[1]
-            cv_link = row[2]
-            candidates.append({
-                'name': candidate_name,
-                'job_id': job_id,
-                'cv_link': cv_link
-            })
-    return candidates
+            yield Candidate(row[0], row[1], row[2], row=row_number)
 
 
-def update_sheet_with_result(result):
-    """Update Google Sheet with CV processing result"""
-    service = get_sheets_service()
-    sheet_id = os.getenv('GOOGLE_SHEET_ID')
-
-    # Prepare data row
-    row = [
-        result['name'],
-        result['job_id'],
-        result.get('drive_url', ''),
-        result['score'],
-        'Yes' if result['shortlisted'] else 'No',
-        ','.join(result.get('matched_skills', [])
-                 if 'matched_skills' in result else [])
+def result_to_row(result):
+    """Convert a CV processing result into a Results sheet row"""
+    return [
+        result.name,
+        result.job_id,
+        result.drive_url or '',
+        result.score,
+        'Yes' if result.shortlisted else 'No',
+        ','.join(result.matched_skills or [])
     ]
 
-    # Append to sheet
+
+def append_rows(rows, sheet_range=RESULTS_RANGE, spreadsheet_id=None):
+    """
+    Append rows to the sheet in a single request.
+
+    Args:
+        rows: List of row value lists
+        sheet_range: A1 range of the table to append to
+        spreadsheet_id: Target spreadsheet, defaults to GOOGLE_SHEET_ID
+    """
+    service = get_sheets_service()
+    sheet_id = spreadsheet_id or os.getenv('GOOGLE_SHEET_ID')
     body = {
-        'values': [row]
+        'values': rows
     }
 
-    sheet_range = 'Results!A:F'  # Update to match your sheet
+    # Retried with backoff only when throttled: an append that failed with
+    # a server error or timeout may have landed, and resending it would
+    # write the rows twice
+    with time_stage('sheet_write'):
+        response = execute(service.spreadsheets().values().append(
+            spreadsheetId=sheet_id,
+            range=sheet_range,
+            valueInputOption='RAW',
+            insertDataOption='INSERT_ROWS',
+            body=body
+        ), SHEETS_WRITE, idempotent=False)
+    SHEET_ROWS_WRITTEN.inc(len(rows))
+    return response
+
+
+def update_sheet_with_result(result):
+    """Update Google Sheet with CV processing result"""
+    append_rows([result_to_row(result)])
+
+
+class SheetResultWriter:
+    """
+    Buffers result rows and appends them to the Results sheet in batches.
+
+    Rows are flushed in one request once ``max_rows`` are buffered or
+    ``flush_interval`` seconds have passed, and again on close. Use it as a
+    context manager so buffered rows are still written if the run crashes.
+    Safe to call ``add`` from several threads.
+
+    Rows go out through append_rows unless another ``append(rows,
+    sheet_range)`` function is given, such as the asyncio client's.
+    A row's ``on_written`` callback runs once the request carrying it has
+    succeeded; rows dropped by a failed final flush never run theirs.
+    """
+
+    def __init__(self, sheet_range=RESULTS_RANGE, max_rows=None,
+                 flush_interval=None, append=None):
+        self.sheet_range = sheet_range
+        self.append = append or append_rows
+        self.max_rows = max_rows or Config.SHEETS_WRITE_BATCH_ROWS
+        self.flush_interval = flush_interval or Config.SHEETS_WRITE_FLUSH_SECONDS
+        self._rows = []
+        self._callbacks = []
+        self._lock = threading.Lock()
+        # Serializes requests so rows land in the order they were added
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._timer = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def start(self):
+        """Start the background thread that flushes on the time threshold"""
+        if self._timer is None:
+            self._timer = threading.Thread(target=self._flush_periodically,
+                                           daemon=True)
+            self._timer.start()
+
+    def add(self, result, on_written=None):
+        """
+        Buffer a result row, flushing if the row threshold is reached.
+
+        Args:
+            result: CandidateResult to write
+            on_written: Optional function called once the row is in the sheet
+        """
+        with self._lock:
+            self._rows.append(result_to_row(result))
+            if on_written is not None:
+                self._callbacks.append(on_written)
+            full = len(self._rows) >= self.max_rows
+        if full:
+            self._try_flush()
+
+    def flush(self):
+        """
+        Write all buffered rows now.
+
+        Rows are kept for the next flush if the append was rejected, and
+        dropped if it may have been applied (a server error or timeout),
+        so they are never written twice.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._rows = self._rows, []
+                callbacks, self._callbacks = self._callbacks, []
+            if not rows:
+                return
+            try:
+                self.append(rows, self.sheet_range)
+            except Exception as e:
+                if not is_ambiguous(e):
+                    with self._lock:
+                        self._rows[:0] = rows
+                        self._callbacks[:0] = callbacks
+                raise
+            for on_written in callbacks:
+                on_written()
+
+    def close(self):
+        """Stop the flush thread and write any remaining rows"""
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.join()
+            self._timer = None
+        self._try_flush()
+
+    def _try_flush(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Error updating sheet: {str(e)}")
 
-    service.spreadsheets().values().append(
-        spreadsheetId=sheet_id,
-        range=sheet_range,
-        valueInputOption='RAW',
-        insertDataOption='INSERT_ROWS',
-        body=body
-    ).execute()
+    def _flush_periodically(self):
+        while not self._stop.wait(self.flush_interval):
+            self._try_flush()
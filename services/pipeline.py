@@ -0,0 +1,249 @@
+from concurrent.futures import (FIRST_COMPLETED, Future, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from config.settings import Config
+from utils import metrics
+
+# Stage kinds: IO stages run on a thread pool (Drive downloads, Sheets
+# writes), CPU stages run on a process pool (PDF parsing, scoring), ASYNC
+# stages are coroutines run on an event loop (iter_async_pipeline only)
+IO = 'io'
+CPU = 'cpu'
+ASYNC = 'async'
+
+
+class InlineExecutor:
+    """Executor that runs each call immediately in the calling thread"""
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        pass
+
+
+def make_executor(kind, workers):
+    """Create the executor for a stage kind; zero workers runs inline"""
+    if workers <= 0:
+        return InlineExecutor()
+    if kind == CPU:
+        return ProcessPoolExecutor(max_workers=workers)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def iter_pipeline(items, stages, on_error, io_workers=None, cpu_workers=None,
+                  max_in_flight=None, ordered=True):
+    """
+    Run every item through a sequence of stages and yield results in order.
+
+    Each stage is a ``(kind, fn)`` pair where kind is IO or CPU. The stage
+    function is called as ``fn(item, value)`` with the previous stage's
+    return value (None for the first stage). Items and CPU stage functions
+    must be picklable; metrics they record in worker processes are merged
+    into this process. When a stage raises, ``on_error(item, exc)`` supplies
+    the result for that item and its remaining stages are skipped, so one
+    failing item never holds up the others.
+
+    Args:
+        items: Iterable of work items (consumed lazily)
+        stages: List of (kind, fn) pairs
+        on_error: Callable building the result for a failed item
+        io_workers: Thread pool size, defaults to Config.PIPELINE_IO_WORKERS
+        cpu_workers: Process pool size, defaults to Config.PIPELINE_CPU_WORKERS
+        max_in_flight: Items admitted but not yet yielded, defaults to
+            Config.PIPELINE_QUEUE_SIZE
+        ordered: Yield in input order; when False, yield (index, result)
+            pairs as soon as each item finishes
+
+    Yields:
+        The last stage's result (or the error result) for each item, in the
+        same order as items
+    """
+    if io_workers is None:
+        io_workers = Config.PIPELINE_IO_WORKERS
+    if cpu_workers is None:
+        cpu_workers = Config.PIPELINE_CPU_WORKERS
+    if max_in_flight is None:
+        max_in_flight = Config.PIPELINE_QUEUE_SIZE
+    max_in_flight = max(1, max_in_flight)
+
+    pools = {IO: make_executor(IO, io_workers),
+             CPU: make_executor(CPU, cpu_workers)}
+    source = enumerate(items)
+    pending = {}   # future -> (index, item, stage position, collecting)
+    finished = {}  # index -> result waiting on an earlier item
+    yielded = 0
+    admitted = 0
+    exhausted = False
+
+    def submit(index, item, position, value):
+        kind, fn = stages[position]
+        collecting = kind == CPU and cpu_workers > 0
+        try:
+            if collecting:
+                future = pools[kind].submit(metrics.call_collecting, fn, item, value)
+            else:
+                future = pools[kind].submit(fn, item, value)
+        except Exception as e:
+            finished[index] = on_error(item, e)
+            return
+        pending[future] = (index, item, position, collecting)
+
+    try:
+        while True:
+            # The window counts finished-but-unyielded items too, so a slow
+            # item at the head cannot let the reorder buffer grow unbounded
+            while not exhausted and admitted - yielded < max_in_flight:
+                try:
+                    index, item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                admitted += 1
+                submit(index, item, 0, None)
+
+            if ordered:
+                while yielded in finished:
+                    yield finished.pop(yielded)
+                    yielded += 1
+            else:
+                for index in list(finished):
+                    result = finished.pop(index)
+                    yielded += 1
+                    yield index, result
+
+            if not pending:
+                if exhausted:
+                    break
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, item, position, collecting = pending.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    finished[index] = on_error(item, e)
+                    continue
+                if collecting:
+                    value, delta = value
+                    metrics.merge(delta)
+                if position + 1 < len(stages):
+                    submit(index, item, position + 1, value)
+                else:
+                    finished[index] = value
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+def run_pipeline(items, stages, on_error, **kwargs):
+    """Run iter_pipeline to completion and return the results as a list"""
+    return list(iter_pipeline(items, stages, on_error, **kwargs))
+
+
+def iter_async_pipeline(items, stages, on_error, loop, io_workers=None,
+                        cpu_workers=None, max_in_flight=None, ordered=False):
+    """
+    Like iter_pipeline, but ASYNC stages run as coroutines on ``loop``,
+    which must be running in another thread.
+
+    Waiting on the network then costs a coroutine rather than a thread, so
+    ``max_in_flight`` can be in the hundreds. IO and CPU stages still run
+    on their pools, and items are still read in the calling thread.
+
+    Args:
+        items: Iterable of work items (consumed lazily)
+        stages: List of (kind, fn) pairs; ASYNC stage functions are
+            coroutine functions called as ``fn(item, value)``
+        on_error: Callable building the result for a failed item
+        loop: Event loop the ASYNC stages run on
+        io_workers: Thread pool size, defaults to Config.PIPELINE_IO_WORKERS;
+            at least one, since an IO stage run inline would block the loop
+        cpu_workers: Process pool size, defaults to Config.PIPELINE_CPU_WORKERS
+        max_in_flight: Items admitted but not yet yielded, defaults to
+            Config.ASYNC_MAX_IN_FLIGHT
+        ordered: Yield in input order rather than (index, result) pairs
+            as soon as each item finishes
+
+    Yields:
+        Each item's result in input order, or (index, result) pairs when
+        ordered is False
+    """
+    # Only loaded by batches that use it; asyncio slows every app import
+    import asyncio
+
+    if io_workers is None:
+        io_workers = Config.PIPELINE_IO_WORKERS
+    if cpu_workers is None:
+        cpu_workers = Config.PIPELINE_CPU_WORKERS
+    if max_in_flight is None:
+        max_in_flight = Config.ASYNC_MAX_IN_FLIGHT
+    max_in_flight = max(1, max_in_flight)
+    # Inline, a blocking IO stage would stall every coroutine on the loop,
+    # and one that calls back into the loop (a sheet append through the
+    # client) would wait on itself forever
+    io_workers = max(1, io_workers)
+
+    pools = {IO: make_executor(IO, io_workers),
+             CPU: make_executor(CPU, cpu_workers)}
+
+    async def run_item(item):
+        value = None
+        for kind, fn in stages:
+            try:
+                if kind == ASYNC:
+                    value = await fn(item, value)
+                elif kind == CPU and cpu_workers > 0:
+                    value, delta = await loop.run_in_executor(
+                        pools[CPU], metrics.call_collecting, fn, item, value)
+                    metrics.merge(delta)
+                else:
+                    value = await loop.run_in_executor(pools[kind], fn, item, value)
+            except Exception as e:
+                return on_error(item, e)
+        return value
+
+    source = enumerate(items)
+    pending = {}   # future -> index
+    finished = {}  # index -> result waiting on an earlier item
+    yielded = 0
+    admitted = 0
+    exhausted = False
+    try:
+        while True:
+            # As in iter_pipeline, the window counts finished-but-unyielded
+            # items, so a slow item at the head stops admission
+            while not exhausted and admitted - yielded < max_in_flight:
+                try:
+                    index, item = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                future = asyncio.run_coroutine_threadsafe(run_item(item), loop)
+                pending[future] = index
+                admitted += 1
+
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                finished[pending.pop(future)] = future.result()
+            if ordered:
+                while yielded in finished:
+                    yield finished.pop(yielded)
+                    yielded += 1
+            else:
+                for index in list(finished):
+                    result = finished.pop(index)
+                    yielded += 1
+                    yield index, result
+    finally:
+        for future in pending:
+            future.cancel()
+        for pool in pools.values():
+            pool.shutdown(wait=True, cancel_futures=True)
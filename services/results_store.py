@@ -0,0 +1,388 @@
+from config.settings import Config
+from functools import partial
+from urllib.parse import quote
+import atexit
+import glob
+import os
+import threading
+import time
+import uuid
+
+SCORED = 'scored'
+FAILED = 'failed'
+SKIPPED = 'skipped'
+
+# Stored in every part file; job_id and month come from the directories
+COLUMNS = ['recorded_at', 'name', 'source', 'status', 'score', 'matched_skills',
+           'shortlisted', 'sha256', 'download_seconds', 'process_seconds',
+           'reason']
+GROUP_KEYS = ('job_id', 'month', 'day', 'source', 'status')
+
+
+def _schema():
+    import pyarrow as pa
+
+    # Explicit, so a part file where a column is all null still matches
+    return pa.schema([
+        ('recorded_at', pa.timestamp('ns', tz='UTC')),
+        ('name', pa.string()),
+        ('source', pa.string()),
+        ('status', pa.string()),
+        ('score', pa.float64()),
+        ('matched_skills', pa.list_(pa.string())),
+        ('shortlisted', pa.bool_()),
+        ('sha256', pa.string()),
+        ('download_seconds', pa.float64()),
+        ('process_seconds', pa.float64()),
+        ('reason', pa.string()),
+    ])
+
+
+_rows = []
+_lock = threading.Lock()
+# Serializes writes so a flush and a compaction never race in one process
+_write_lock = threading.Lock()
+
+
+def record(result, source, sha256=None, timings=None):
+    """
+    Buffer a result for the store, writing the buffer once it holds
+    Config.RESULTS_STORE_FLUSH_ROWS results.
+
+    Args:
+        result: CandidateResult (scored, failed or skipped)
+        source: Where it came from: "sheet", "upload", "backfill" or "cli"
+        sha256: SHA-256 of the CV, if known
+        timings: Optional dict with download_seconds and process_seconds
+    """
+    if not Config.RESULTS_STORE_ENABLED:
+        return
+    timings = timings or {}
+    if result.error is not None:
+        status, reason = FAILED, result.error
+    elif result.skipped is not None:
+        status, reason = SKIPPED, result.skipped
+    else:
+        status, reason = SCORED, None
+    row = {
+        'recorded_at': time.time(),
+        'job_id': str(result.job_id),
+        'name': result.name,
+        'source': source,
+        'status': status,
+        'score': float(result.score) if status == SCORED else None,
+        'matched_skills': list(result.matched_skills or []),
+        'shortlisted': result.shortlisted,
+        'sha256': sha256,
+        'download_seconds': timings.get('download_seconds'),
+        'process_seconds': timings.get('process_seconds'),
+        'reason': reason,
+    }
+    with _lock:
+        _rows.append(row)
+        full = len(_rows) >= Config.RESULTS_STORE_FLUSH_ROWS
+    if full:
+        flush()
+
+
+def _partition_dir(job_id, month):
+    # Hive-style directory names, URI-escaped the way pyarrow reads them
+    return os.path.join(Config.RESULTS_STORE_PATH,
+                        f"job_id={quote(job_id, safe='')}",
+                        f"month={month}")
+
+
+def _write_part(directory, write):
+    """Write a part file with write(path); it appears complete or not at all"""
+    os.makedirs(directory, exist_ok=True)
+    name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+    # Names starting with "_" are skipped by readers until renamed
+    partial_path = os.path.join(directory, f"_{name}.tmp")
+    write(partial_path)
+    os.replace(partial_path, os.path.join(directory, name))
+
+
+def write_rows(rows):
+    """
+    Write result rows to the store, one part file per job and month::
+
+        RESULTS_STORE_PATH/job_id=1021/month=2026-10/part-<time>-<id>.parquet
+
+    A partition with more than Config.RESULTS_STORE_COMPACT_PARTS part
+    files is then compacted.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(rows)
+    frame['recorded_at'] = pd.to_datetime(frame['recorded_at'], unit='s', utc=True)
+    frame['month'] = frame['recorded_at'].dt.strftime('%Y-%m')
+    written = []
+    with _write_lock:
+        for (job_id, month), part in frame.groupby(['job_id', 'month'], sort=False):
+            directory = _partition_dir(job_id, month)
+            _write_part(directory, partial(part.reindex(columns=COLUMNS).to_parquet,
+                                           index=False, schema=_schema()))
+            written.append(directory)
+    for directory in written:
+        if len(_part_files(directory)) > Config.RESULTS_STORE_COMPACT_PARTS:
+            compact(directory)
+
+
+def flush():
+    """Write every buffered result now"""
+    with _lock:
+        rows = _rows[:]
+        _rows.clear()
+    if not rows:
+        return
+    try:
+        write_rows(rows)
+    except Exception as e:
+        # Dropped rather than kept, so a store that can't be written to
+        # doesn't grow the buffer without bound
+        print(f"Error writing {len(rows)} results to the results store: {str(e)}")
+
+
+def _part_files(directory):
+    return sorted(glob.glob(os.path.join(directory, 'part-*.parquet')))
+
+
+def compact(directory):
+    """
+    Merge a partition's part files into one.
+
+    Files are claimed by renaming them to hidden names first, so another
+    process compacting the same partition skips them rather than merging
+    them twice. Readers miss the claimed rows until the merged file is in
+    place.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    with _write_lock:
+        claimed = []
+        for path in _part_files(directory):
+            hidden = os.path.join(directory, '_' + os.path.basename(path))
+            try:
+                os.rename(path, hidden)
+            except FileNotFoundError:
+                # Claimed by another process
+                continue
+            claimed.append((path, hidden))
+        merged = False
+        try:
+            if len(claimed) > 1:
+                table = pa.concat_tables(
+                    [pq.read_table(hidden, schema=_schema()) for _, hidden in claimed])
+                _write_part(directory, partial(pq.write_table, table))
+                merged = True
+        finally:
+            for path, hidden in claimed:
+                if merged:
+                    os.remove(hidden)
+                else:
+                    # Nothing was written; put the files back
+                    os.rename(hidden, path)
+
+
+def _timestamp(value):
+    import pandas as pd
+
+    value = pd.Timestamp(value)
+    return value.tz_localize('UTC') if value.tzinfo is None else value.tz_convert('UTC')
+
+
+def read_table(columns, job_ids=None, since=None, until=None):
+    """
+    Read the columns of the results matching the filters as an Arrow table.
+
+    Only partitions for the requested jobs and months are opened, and only
+    the requested columns are read from them.
+
+    Args:
+        columns: Columns to read, including job_id or month if wanted
+        job_ids: Jobs to include, or None for all
+        since: ISO date or datetime; results recorded at or after it
+        until: ISO date or datetime; results recorded before it
+
+    Returns:
+        pyarrow.Table, or None if nothing has been stored yet
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    flush()
+    if not glob.glob(os.path.join(Config.RESULTS_STORE_PATH, 'job_id=*')):
+        return None
+
+    # Job IDs look like numbers but are names
+    keys = pa.schema([('job_id', pa.string()), ('month', pa.string())])
+    dataset = ds.dataset(
+        Config.RESULTS_STORE_PATH, format='parquet',
+        schema=pa.unify_schemas([_schema(), keys]),
+        partitioning=ds.partitioning(keys, flavor='hive'))
+    condition = ds.scalar(True)
+    if job_ids:
+        condition &= ds.field('job_id').isin([str(job_id) for job_id in job_ids])
+    if since:
+        start = _timestamp(since)
+        condition &= ((ds.field('month') >= start.strftime('%Y-%m'))
+                      & (ds.field('recorded_at') >= start))
+    if until:
+        end = _timestamp(until)
+        condition &= ((ds.field('month') <= end.strftime('%Y-%m'))
+                      & (ds.field('recorded_at') < end))
+    return dataset.to_table(columns=list(columns), filter=condition)
+
+
+def load(columns, job_ids=None, since=None, until=None):
+    """
+    read_table as a DataFrame; text columns with few distinct values
+    (job_id, month, source, status) come back as categoricals.
+    """
+    import pandas as pd
+    import pyarrow.compute as pc
+
+    table = read_table(columns, job_ids, since, until)
+    if table is None:
+        return pd.DataFrame(columns=list(columns))
+    for name in ('job_id', 'month', 'source', 'status'):
+        if name in table.column_names:
+            table = table.set_column(table.schema.get_field_index(name), name,
+                                     pc.dictionary_encode(table[name]))
+    return table.to_pandas()
+
+
+def _group_key(keys, value):
+    # Group keys as JSON-friendly values; days are kept as timestamps
+    # while grouping
+    value = value if isinstance(value, tuple) else (value,)
+    return tuple(item.strftime('%Y-%m-%d') if key == 'day' else item
+                 for key, item in zip(keys, value))
+
+
+def _top_skills(keys, job_ids, since, until, limit):
+    """The skills scored results matched most often, per group"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = [key if key != 'day' else 'recorded_at' for key in keys]
+    table = read_table(list(dict.fromkeys([*columns, 'status', 'matched_skills'])),
+                       job_ids, since, until)
+    table = table.filter(pc.equal(table['status'], SCORED))
+    if 'day' in keys:
+        table = table.append_column('day', pc.floor_temporal(table['recorded_at'], unit='day'))
+    # One row per matched skill, with its result's group keys
+    lists = table['matched_skills']
+    parents = pc.list_parent_indices(lists)
+    skills = pa.table({**{key: pc.take(table[key], parents) for key in keys},
+                       'skill': pc.list_flatten(lists)})
+    counts = skills.group_by([*keys, 'skill']).aggregate([([], 'count_all')])
+    counts = counts.to_pandas().sort_values(['count_all', 'skill'],
+                                            ascending=[False, True])
+    top = {}
+    for row in counts.itertuples(index=False):
+        found = top.setdefault(_group_key(keys, tuple(row[:len(keys)])), [])
+        if len(found) < limit:
+            found.append([row.skill, int(row.count_all)])
+    return top
+
+
+def stats(job_ids=None, since=None, until=None, group_by=('job_id',),
+          histogram_width=None, top_skills=0):
+    """
+    Aggregate stored results.
+
+    Args:
+        job_ids: Jobs to include, or None for all
+        since: ISO date or datetime; results recorded at or after it
+        until: ISO date or datetime; results recorded before it
+        group_by: Keys from GROUP_KEYS to group by
+        histogram_width: Add a score histogram with buckets this wide
+        top_skills: Add the N skills matched most often
+
+    Returns:
+        List of dicts, one per group in key order, with the group's keys,
+        counts per status, shortlisted count, score mean, min, p50, p90
+        and max, and mean and p90 parse-and-score time of scored results
+
+    Raises:
+        ValueError: If a group_by key is unknown
+    """
+    unknown = [key for key in group_by if key not in GROUP_KEYS]
+    if unknown:
+        raise ValueError(f"Unknown group_by keys: {', '.join(unknown)}")
+
+    keys = list(group_by)
+    # "day" is read as recorded_at and truncated
+    columns = [key if key != 'day' else 'recorded_at' for key in keys]
+    columns += ['status', 'score', 'shortlisted', 'process_seconds']
+    frame = load(list(dict.fromkeys(columns)), job_ids, since, until)
+    if frame.empty:
+        return []
+    if 'day' in keys:
+        frame['day'] = frame['recorded_at'].dt.floor('D')
+    if not keys:
+        frame['all'] = 0
+    group_keys = keys or ['all']
+
+    counts = frame.groupby([*group_keys, 'status'], observed=True).size().unstack(fill_value=0)
+    counts = counts.reindex(columns=[SCORED, FAILED, SKIPPED], fill_value=0)
+    counts['results'] = counts.sum(axis=1)
+    scored = frame[frame['status'] == SCORED].assign(
+        shortlisted=lambda scored: scored['shortlisted'].eq(True))
+    scored_by = scored.groupby(group_keys, observed=True)
+    summary = scored_by.agg(
+        shortlisted=('shortlisted', 'sum'), score_mean=('score', 'mean'),
+        score_min=('score', 'min'), score_max=('score', 'max'),
+        seconds_mean=('process_seconds', 'mean'))
+    # With no scored rows the quantiles have no columns, and no group
+    # reads them
+    if not scored.empty:
+        quantiles = scored_by[['score', 'process_seconds']].quantile([0.5, 0.9]).unstack()
+        summary['score_p50'] = quantiles[('score', 0.5)]
+        summary['score_p90'] = quantiles[('score', 0.9)]
+        summary['seconds_p90'] = quantiles[('process_seconds', 0.9)]
+    summary = counts.join(summary)
+
+    histograms = {}
+    if histogram_width:
+        buckets = (scored['score'] // histogram_width * histogram_width).rename('bucket')
+        for key, count in scored.groupby([*group_keys, buckets], observed=True).size().items():
+            histograms.setdefault(_group_key(group_keys, key[:-1]), {})[f"{key[-1]:g}"] = int(count)
+    skills = {}
+    if top_skills and not scored.empty:
+        skills = _top_skills(keys, job_ids, since, until, top_skills)
+
+    groups = []
+    for key, row in zip(summary.index, summary.itertuples(index=False)):
+        key = _group_key(group_keys, key)
+        group = dict(zip(keys, key))
+        group.update({
+            'results': int(row.results),
+            SCORED: int(row.scored),
+            FAILED: int(row.failed),
+            SKIPPED: int(row.skipped),
+            'shortlisted': int(row.shortlisted) if row.scored else 0,
+        })
+        if row.scored:
+            group['score'] = {
+                'mean': float(row.score_mean),
+                'min': float(row.score_min),
+                'p50': float(row.score_p50),
+                'p90': float(row.score_p90),
+                'max': float(row.score_max),
+            }
+            if row.seconds_mean == row.seconds_mean:
+                group['process_seconds'] = {'mean': float(row.seconds_mean),
+                                            'p90': float(row.seconds_p90)}
+            if histogram_width:
+                group['score_histogram'] = histograms.get(key, {})
+            if top_skills:
+                group['top_skills'] = skills.get(key if keys else (), [])
+        groups.append(group)
+    return groups
+
+
+# Results still buffered when the process exits are written then
+atexit.register(flush)
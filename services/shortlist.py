@@ -0,0 +1,177 @@
+from config.settings import Config
+from utils.sqlite_store import connect
+import json
+import os
+import time
+
+# A candidate is keyed by their CV as well as their name, so two people with
+# the same name applying for one job are kept apart. cv_key is the key the
+# search index links the CV by: its local path, or upload:<name> for an
+# upload parsed in memory.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shortlist_entries (
+    job_id TEXT NOT NULL,
+    cv_key TEXT NOT NULL,
+    name TEXT NOT NULL,
+    score REAL NOT NULL,
+    matched_skills TEXT NOT NULL,
+    shortlisted INTEGER NOT NULL,
+    cv_path TEXT,
+    seq INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, cv_key, name)
+);
+"""
+
+_migrated_pids = set()
+
+
+def _db():
+    conn = connect(Config.SHORTLIST_INDEX_PATH, SCHEMA)
+    if os.getpid() not in _migrated_pids:
+        _migrate(conn)
+        _migrated_pids.add(os.getpid())
+    return conn
+
+
+def _migrate(conn):
+    """Move entries from the name-keyed table older versions wrote"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                        "AND name = 'shortlist'").fetchone():
+            conn.execute(
+                'INSERT OR IGNORE INTO shortlist_entries '
+                'SELECT job_id, COALESCE(cv_path, name), name, score, matched_skills, '
+                'shortlisted, cv_path, seq, updated_at FROM shortlist')
+            conn.execute('DROP TABLE shortlist')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def link_cv(cv_path, shortlist_path):
+    """
+    Hardlink a CV into the shortlist folder instead of copying it.
+
+    Where a hardlink isn't possible (another filesystem, or a filesystem
+    without links) the CV is recorded by reference instead.
+
+    Returns:
+        The shortlisted path, or cv_path when it couldn't be linked
+    """
+    if not os.path.exists(cv_path):
+        return cv_path
+    os.makedirs(os.path.dirname(shortlist_path) or '.', exist_ok=True)
+    if os.path.exists(shortlist_path):
+        if os.path.samefile(cv_path, shortlist_path):
+            return shortlist_path
+        os.remove(shortlist_path)
+    try:
+        os.link(cv_path, shortlist_path)
+    except OSError:
+        return cv_path
+    return shortlist_path
+
+
+def write_cv(data, shortlist_path):
+    """
+    Write the bytes of a CV that was parsed in memory into the shortlist
+    folder; it appears there complete or not at all.
+
+    Returns:
+        The shortlisted path
+    """
+    os.makedirs(os.path.dirname(shortlist_path) or '.', exist_ok=True)
+    partial_path = f"{shortlist_path}.{os.getpid()}.tmp"
+    with open(partial_path, 'wb') as f:
+        f.write(data)
+    os.replace(partial_path, shortlist_path)
+    return shortlist_path
+
+
+def record(result, cv_key, cv_path=None):
+    """
+    Offer a scored candidate to its job's top-N index.
+
+    Called as each candidate is scored, so the index is current while a
+    batch is still running. The index lives in SQLite and each offer is
+    one write transaction, so every worker process sees the same top N:
+    a candidate scored again replaces their earlier entry, and candidates
+    that drop out of the top Config.SHORTLIST_TOP_N are removed. Ties go
+    to the earlier entry.
+
+    Args:
+        result: CandidateResult with a score
+        cv_key: Key of the candidate's CV, as linked in the search index
+        cv_path: Shortlisted copy or local path of the candidate's CV
+
+    Returns:
+        True if the candidate is in its job's top N
+    """
+    key = (result.job_id, cv_key, result.name)
+    conn = _db()
+    # IMMEDIATE so two processes can't both see room for one more entry
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        count, lowest = conn.execute(
+            'SELECT COUNT(*), MIN(score) FROM shortlist_entries WHERE job_id = ?',
+            (result.job_id,)).fetchone()
+        known = conn.execute(
+            'SELECT 1 FROM shortlist_entries WHERE job_id = ? AND cv_key = ? AND name = ?',
+            key).fetchone()
+        if (not known and count >= Config.SHORTLIST_TOP_N
+                and result.score <= lowest):
+            conn.execute('COMMIT')
+            return False
+        seq = conn.execute(
+            'SELECT COALESCE(MAX(seq), 0) + 1 FROM shortlist_entries').fetchone()[0]
+        conn.execute(
+            'INSERT OR REPLACE INTO shortlist_entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (*key, result.score, json.dumps(result.matched_skills or []),
+             int(bool(result.shortlisted)), cv_path, seq, time.time()))
+        conn.execute(
+            'DELETE FROM shortlist_entries WHERE job_id = ? AND rowid NOT IN ('
+            'SELECT rowid FROM shortlist_entries WHERE job_id = ? '
+            'ORDER BY score DESC, seq LIMIT ?)',
+            (result.job_id, result.job_id, Config.SHORTLIST_TOP_N))
+        kept = conn.execute(
+            'SELECT 1 FROM shortlist_entries WHERE job_id = ? AND cv_key = ? AND name = ?',
+            key).fetchone() is not None
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    return kept
+
+
+def top_candidates(job_id=None):
+    """
+    Return the current top-N entries, highest score first.
+
+    Args:
+        job_id: One job, or None for every job
+
+    Returns:
+        List of entries for the job, or a dict of job_id -> list
+    """
+    query = ('SELECT job_id, name, score, matched_skills, shortlisted, cv_path '
+             'FROM shortlist_entries')
+    params = ()
+    if job_id is not None:
+        query += ' WHERE job_id = ?'
+        params = (job_id,)
+    top = {}
+    for row_job_id, name, score, matched_skills, shortlisted, cv_path in _db().execute(
+            query + ' ORDER BY job_id, score DESC, seq', params):
+        top.setdefault(row_job_id, []).append({
+            "name": name,
+            "score": score,
+            "matched_skills": json.loads(matched_skills),
+            "shortlisted": bool(shortlisted),
+            "cv_path": cv_path,
+        })
+    if job_id is not None:
+        return top.get(job_id, [])
+    return top
@@ -1,38 +1,77 @@
 document.addEventListener('DOMContentLoaded', function() {
-    const form = document.getElementById('cv-upload-form');
+    const button = document.getElementById('process-sheet-button');
+    const progress = document.getElementById('job-progress');
     const resultsContainer = document.getElementById('results-container');
 
-    form.addEventListener('submit', function(event) {
-        event.preventDefault();
-        
-        const formData = new FormData(form);
-        
-        fetch('/process_cvs', {
-            method: 'POST',
-            body: formData
-        })
+    if (!button) {
+        return;
+    }
+
+    button.addEventListener('click', function() {
+        button.disabled = true;
+        resultsContainer.innerHTML = '';
+        progress.textContent = 'Starting...';
+
+        fetch('/jobs', { method: 'POST' })
         .then(response => response.json())
-        .then(data => {
-            displayResults(data);
-        })
+        .then(job => followJob(job))
         .catch(error => {
             console.error('Error:', error);
+            progress.textContent = 'Could not start processing.';
+            button.disabled = false;
         });
     });
 
-    function displayResults(data) {
-        resultsContainer.innerHTML = '';
-        if (data.length === 0) {
-            resultsContainer.innerHTML = '<p>No candidates shortlisted.</p>';
-            return;
-        }
-
+    function followJob(job) {
         const ul = document.createElement('ul');
-        data.forEach(candidate => {
-            const li = document.createElement('li');
-            li.textContent = `${candidate.name} - Score: ${candidate.score}`;
-            ul.appendChild(li);
-        });
         resultsContainer.appendChild(ul);
+
+        // Results arrive one candidate at a time as they finish
+        const events = new EventSource(job.events_url);
+
+        events.addEventListener('result', function(event) {
+            ul.appendChild(renderCandidate(JSON.parse(event.data)));
+        });
+
+        events.addEventListener('progress', function(event) {
+            showProgress(JSON.parse(event.data));
+        });
+
+        events.addEventListener('done', function(event) {
+            const status = JSON.parse(event.data);
+            showProgress(status);
+            if (status.completed === 0) {
+                resultsContainer.innerHTML = '<p>No candidates processed.</p>';
+            }
+            events.close();
+            button.disabled = false;
+        });
+    }
+
+    function renderCandidate(candidate) {
+        const li = document.createElement('li');
+        if (candidate.error) {
+            li.textContent = `${candidate.name} - Error: ${candidate.error}`;
+        } else if (candidate.skipped) {
+            li.textContent = `${candidate.name} - Skipped: ${candidate.skipped}`;
+        } else {
+            const shortlisted = candidate.shortlisted ? ' (shortlisted)' : '';
+            li.textContent = `${candidate.name} - Job ${candidate.job_id} - Score: ${candidate.score}${shortlisted}`;
+        }
+        return li;
+    }
+
+    function showProgress(status) {
+        let text = `${status.status}: ${status.completed}/${status.total ?? '?'} processed`;
+        if (status.failed) {
+            text += `, ${status.failed} failed`;
+        }
+        if (status.throughput_per_second) {
+            text += `, ${status.throughput_per_second.toFixed(1)}/s`;
+        }
+        if (status.eta_seconds) {
+            text += `, about ${Math.ceil(status.eta_seconds)}s left`;
+        }
+        progress.textContent = text;
     }
-});
\ No newline at end of file
+});
@@ -0,0 +1,183 @@
+from models.job import Job, load_jobs
+from utils.skill_matcher import SkillMatcher
+import numpy as np
+
+
+def top_n_indices(scores, n):
+    """
+    Return the indices of the n highest scores, highest first.
+
+    Uses argpartition, so only the selected entries are sorted. Ties are
+    broken by position, the same order a stable sort would give.
+    """
+    scores = np.asarray(scores)
+    if n <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.intp)
+    if n < scores.size:
+        kth = scores[np.argpartition(-scores, n - 1)[n - 1]]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[:n - above.size]
+        chosen = np.concatenate([above, ties])
+    else:
+        chosen = np.arange(scores.size)
+    order = np.lexsort((chosen, -scores[chosen]))
+    return chosen[order]
+
+
+class TermMatrix:
+    """
+    Sparse CV x skill matrix in coordinate form.
+
+    Only the matched (cv, skill) pairs are stored, so memory grows with the
+    number of matches rather than CVs x vocabulary size.
+    """
+
+    def __init__(self, shape, rows, cols, values):
+        self.shape = shape
+        self.rows = rows
+        self.cols = cols
+        self.values = values
+
+    def dot(self, dense):
+        """Multiply by a dense (skill x k) matrix, returning (cv x k)"""
+        result = np.zeros((self.shape[0], dense.shape[1]), dtype=dense.dtype)
+        np.add.at(result, self.rows, dense[self.cols] * self.values[:, None])
+        return result
+
+    def row_columns(self, row):
+        """Columns matched in one row, in column order"""
+        # Rows are stored in order, so a row's entries are contiguous
+        start, stop = np.searchsorted(self.rows, [row, row + 1])
+        return np.sort(self.cols[start:stop])
+
+    def to_dense(self):
+        matrix = np.zeros(self.shape, dtype=np.float32)
+        matrix[self.rows, self.cols] = self.values
+        return matrix
+
+
+class BatchScores:
+    """CV x job score matrix with top-N, fit and matched-skill queries"""
+
+    def __init__(self, job_ids, scores, terms=None, columns=None):
+        """
+        Args:
+            job_ids: Job ID of each score column
+            scores: (cv x job) score matrix
+            terms: TermMatrix the scores came from, for matched_skills
+            columns: (job_id, skill) of each of its columns
+        """
+        self.job_ids = job_ids
+        self.scores = scores
+        self.terms = terms
+        self.columns = columns
+        self._job_column = {job_id: i for i, job_id in enumerate(job_ids)}
+
+    def __len__(self):
+        return self.scores.shape[0]
+
+    def for_job(self, job_id):
+        """Scores of every CV for one job"""
+        return self.scores[:, self._job_column[job_id]]
+
+    def matched_skills(self, cv_index, job_id):
+        """The job's skills found in a CV, in the job's order"""
+        columns = (self.columns[col] for col in self.terms.row_columns(cv_index))
+        return [skill for column_job_id, skill in columns
+                if column_job_id == job_id]
+
+    def top_n(self, job_id, n=5):
+        """Return [(cv_index, score)] for the job's n best CVs"""
+        column = self.for_job(job_id)
+        return [(int(i), float(column[i])) for i in top_n_indices(column, n)]
+
+    def top_n_per_job(self, n=5):
+        return {job_id: self.top_n(job_id, n) for job_id in self.job_ids}
+
+    def best_jobs(self, cv_index, min_score=3):
+        """Return [(job_id, score)] the CV qualifies for, best first"""
+        row = self.scores[cv_index]
+        return [(self.job_ids[j], float(row[j]))
+                for j in top_n_indices(row, row.size) if row[j] >= min_score]
+
+    def pool_fit(self, min_score=3):
+        """Number of CVs in the pool scoring at least min_score per job"""
+        counts = (self.scores >= min_score).sum(axis=0)
+        return {job_id: int(counts[j]) for j, job_id in enumerate(self.job_ids)}
+
+
+class BatchScorer:
+    """
+    Scores a pool of CVs against every job in one pass.
+
+    Each CV is tokenized once with a matcher over the union of all jobs'
+    skills and aliases into a sparse matrix with a column per (job, skill)
+    pair; weighted scores for every (CV, job) pair are then a single
+    product with the column x job weight matrix.
+    """
+
+    def __init__(self, jobs=None):
+        """
+        Args:
+            jobs: Dict of job_id -> Job (or list of skills), defaults to
+                every configured job
+        """
+        if jobs is None:
+            jobs = load_jobs()
+        jobs = {job_id: job if isinstance(job, Job) else Job(job_id, job)
+                for job_id, job in jobs.items()}
+        self.job_ids = list(jobs)
+        self.columns = [(job_id, skill) for job_id, job in jobs.items()
+                        for skill in job.required_skills]
+        column = {pair: i for i, pair in enumerate(self.columns)}
+
+        # Terms are resolved per job, since two jobs may map one alias to
+        # different skills; a term feeds a column in every job that uses it
+        self._term_columns = {}
+        for job_id, job in jobs.items():
+            for term, skill in job.index.items():
+                self._term_columns.setdefault(term, []).append(
+                    column[(job_id, skill)])
+        self.matcher = SkillMatcher(list(self._term_columns))
+
+        # float64, so sums compare with thresholds as Job.score_text's do
+        self.job_matrix = np.zeros(
+            (len(self.columns), len(self.job_ids)), dtype=np.float64)
+        for j, job in enumerate(jobs.values()):
+            for skill, weight in job.weights.items():
+                self.job_matrix[column[(job.job_id, skill)], j] = weight
+
+    def term_matrix(self, cv_texts, frequency=False):
+        """
+        Tokenize CVs into a sparse skill-presence (or skill-frequency) matrix.
+
+        Args:
+            cv_texts: Iterable of CV texts
+            frequency: Store occurrence counts instead of presence
+
+        Returns:
+            TermMatrix of shape (number of CVs, number of (job, skill) columns)
+        """
+        rows, cols, values = [], [], []
+        count = 0
+        for i, text in enumerate(cv_texts):
+            count += 1
+            # Several terms can count towards the same column
+            found = {}
+            for term, positions in self.matcher.match(text).items():
+                for col in self._term_columns[term]:
+                    found[col] = found.get(col, 0) + len(positions)
+            for col, occurrences in found.items():
+                rows.append(i)
+                cols.append(col)
+                values.append(occurrences if frequency else 1)
+        return TermMatrix((count, len(self.columns)),
+                          np.asarray(rows, dtype=np.intp),
+                          np.asarray(cols, dtype=np.intp),
+                          np.asarray(values, dtype=np.float32))
+
+    def score(self, cv_texts):
+        """Score every CV against every job, returning BatchScores"""
+        terms = self.term_matrix(cv_texts)
+        return BatchScores(self.job_ids, terms.dot(self.job_matrix),
+                           terms, self.columns)
@@ -0,0 +1,58 @@
+import errno
+import os
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+# Windows locks a byte range, and other handles can't read a locked range,
+# so the lock covers one byte far past the end of any CV instead of the
+# contents
+_LOCK_OFFSET = 2 ** 31 - 2
+
+# CreateFile arguments, which _winapi doesn't all export
+_SHARE_ALL = 0x1 | 0x2 | 0x4  # FILE_SHARE_READ | WRITE | DELETE
+_OPEN_ALWAYS = 4
+
+
+def _share_delete_opener(path, flags):
+    """
+    Open a file like os.open, but let it be renamed or removed while open,
+    as POSIX allows; the CRT's own open doesn't share delete access.
+    """
+    import _winapi
+    handle = _winapi.CreateFile(
+        path, _winapi.GENERIC_READ | _winapi.GENERIC_WRITE, _SHARE_ALL, 0,
+        _OPEN_ALWAYS, 0, 0)
+    return msvcrt.open_osfhandle(handle, flags & os.O_APPEND)
+
+
+def open_for_append(path):
+    """Open a file for appending in binary mode, creating it if needed"""
+    if os.name == 'nt':
+        return open(path, 'ab', opener=_share_delete_opener)
+    return open(path, 'ab')
+
+
+def lock_file(f):
+    """
+    Block until this process holds an exclusive lock on an open file.
+
+    The lock is released when the file is closed. It is an OS lock, so it
+    excludes other threads and processes alike. The file position is left
+    at the end of the file, which may have grown while waiting.
+    """
+    if os.name != 'nt':
+        fcntl.flock(f, fcntl.LOCK_EX)
+    else:
+        f.seek(_LOCK_OFFSET)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                break
+            except OSError as e:
+                # LK_LOCK gives up after ten one-second retries
+                if e.errno != errno.EDEADLOCK:
+                    raise
+    f.seek(0, os.SEEK_END)
@@ -0,0 +1,248 @@
+from contextlib import contextmanager
+import bisect
+import threading
+import time
+
+# Latency buckets in seconds, from a cached parse up to a slow download
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30, 60)
+
+
+def exponential_buckets(start, factor, count):
+    """Bucket bounds start, start * factor, ... (count of them)"""
+    # Rounded so the "le" labels stay readable
+    return tuple(float(f'{start * factor ** i:.3g}') for i in range(count))
+
+
+_metrics = {}
+_collectors = []
+_lock = threading.Lock()
+
+
+class Counter:
+    """A monotonically increasing count, optionally split by labels"""
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # Unlabelled counters are reported as 0 before the first increment
+        self._values = {} if self.labelnames else {(): 0}
+        _register(self)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _state(self):
+        return dict(self._values)
+
+    def _merge(self, state):
+        for key, value in state.items():
+            self._values[key] = self._values.get(key, 0) + value
+
+    @staticmethod
+    def _diff(after, before):
+        return after - before
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.name + '_total', key, value
+
+
+class Histogram:
+    """Observations counted into cumulative buckets, optionally by labels"""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        _register(self)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            # One slot per bucket plus +Inf, then the running sum
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantile(self, q, **labels):
+        """
+        Estimate a quantile by interpolating within its bucket, as
+        Prometheus' histogram_quantile does; None before any observation.
+        """
+        with _lock:
+            state = list(self._values.get(self._key(labels), []))
+        total = sum(state[:-1])
+        if not total:
+            return None
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, state):
+            if count and cumulative + count >= rank:
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = bound
+        # Past the last finite bucket
+        return self.buckets[-1]
+
+    _key = Counter._key
+
+    def _state(self):
+        return {key: list(state) for key, state in self._values.items()}
+
+    def _merge(self, state):
+        for key, values in state.items():
+            current = self._values.setdefault(key, [0] * len(values))
+            for i, value in enumerate(values):
+                current[i] += value
+
+    @staticmethod
+    def _diff(after, before):
+        return [a - b for a, b in zip(after, before)]
+
+    def _samples(self):
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), state):
+                cumulative += count
+                yield self.name + '_bucket', key + (('le', str(bound)),), cumulative
+            yield self.name + '_count', key, cumulative
+            yield self.name + '_sum', key, state[-1]
+
+
+def _register(metric):
+    with _lock:
+        if metric.name in _metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        _metrics[metric.name] = metric
+
+
+def register_collector(collect):
+    """
+    Add a callable rendered on every scrape for values kept elsewhere.
+
+    It returns (name, kind, documentation, samples) tuples, where samples
+    is a list of (labels dict, value).
+    """
+    _collectors.append(collect)
+
+
+def snapshot():
+    """Copy the current value of every metric in this process"""
+    with _lock:
+        return {name: metric._state() for name, metric in _metrics.items()}
+
+
+def diff(after, before):
+    """Return what was recorded between two snapshots"""
+    delta = {}
+    for name, state in after.items():
+        metric = _metrics[name]
+        old = before.get(name, {})
+        changes = {}
+        for key, value in state.items():
+            if key in old:
+                value = metric._diff(value, old[key])
+            changes[key] = value
+        if changes:
+            delta[name] = changes
+    return delta
+
+
+def merge(delta):
+    """Add values recorded in another process, as returned by diff()"""
+    with _lock:
+        for name, state in delta.items():
+            _metrics[name]._merge(state)
+
+
+def call_collecting(fn, *args):
+    """
+    Call fn in a worker process and return (result, metrics delta).
+
+    The parent passes the delta to merge() so work done in process pools
+    shows up in its /metrics.
+    """
+    before = snapshot()
+    result = fn(*args)
+    return result, diff(snapshot(), before)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"'
+                          for name, value in pairs) + '}'
+
+
+def render():
+    """Render every metric in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for metric in _metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample, key, value in metric._samples():
+                # Histogram buckets carry an extra ("le", bound) pair
+                pairs = (list(zip(metric.labelnames, key))
+                         + list(key[len(metric.labelnames):]))
+                lines.append(f"{sample}{_format_labels(pairs)} {value}")
+
+    for collect in _collectors:
+        for name, kind, documentation, samples in collect():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                sample = name + '_total' if kind == 'counter' else name
+                lines.append(f"{sample}{_format_labels(labels.items())} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+# Batch pipeline instrumentation, shared by the services that record it
+# Half-octave buckets from 0.5ms to ~90s keep quantile estimates within
+# about 20% for the benchmark reports
+STAGE_SECONDS = Histogram(
+    'cv_stage_seconds', 'Time spent in each CV processing stage', ['stage'],
+    buckets=exponential_buckets(0.0005, 2 ** 0.5, 36))
+DOWNLOADED_BYTES = Counter(
+    'cv_downloaded_bytes', 'Bytes of CVs downloaded from Drive')
+PAGES_PARSED = Counter(
+    'cv_pages_parsed', 'PDF pages extracted', ['backend'])
+PARSE_CACHE = Counter(
+    'cv_parse_cache', 'Parse cache lookups', ['result'])
+SHEET_ROWS_WRITTEN = Counter(
+    'cv_sheet_rows_written', 'Result rows appended to the sheet')
+CANDIDATES = Counter(
+    'cv_candidates', 'Batch candidates processed', ['outcome'])
+
+
+def time_stage(stage):
+    """Context manager recording the with block in cv_stage_seconds"""
+    return STAGE_SECONDS.time(stage=stage)
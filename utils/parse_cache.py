@@ -0,0 +1,223 @@
+from config.settings import Config
+from utils.pdf_parser import is_pdf_path, iter_pdf_pages, parse_pdf, parser_version
+from utils.sqlite_store import connect
+from utils.metrics import PARSE_CACHE
+from utils.search_index import index_cv
+import hashlib
+import os
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parsed_text (
+    sha256 TEXT NOT NULL,
+    parser_version TEXT NOT NULL,
+    text TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (sha256, parser_version)
+);
+CREATE INDEX IF NOT EXISTS parsed_text_last_used ON parsed_text (last_used);
+CREATE TABLE IF NOT EXISTS cache_size (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    total INTEGER NOT NULL
+);
+"""
+
+_purged_pids = set()
+
+
+def _db():
+    conn = connect(Config.PARSE_CACHE_PATH, SCHEMA)
+    if os.getpid() not in _purged_pids:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Entries from older parser versions can never be hit again
+            conn.execute('DELETE FROM parsed_text WHERE parser_version != ?',
+                         (parser_version(),))
+            # The running total is summed once per process, in case an
+            # older version without it wrote the cache
+            conn.execute('INSERT OR REPLACE INTO cache_size '
+                         'SELECT 0, COALESCE(SUM(size), 0) FROM parsed_text')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        _purged_pids.add(os.getpid())
+    return conn
+
+
+def file_sha256(path):
+    """Return the hex SHA-256 digest of a file's bytes"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def source_sha256(source):
+    """SHA-256 of a PDF given as a path, bytes or a binary file object"""
+    if is_pdf_path(source):
+        return file_sha256(source)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+    digest = hashlib.sha256()
+    source.seek(0)
+    for block in iter(lambda: source.read(1024 * 1024), b''):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def get_cached_text(sha256):
+    """Return cached text for the digest, or None on a miss"""
+    conn = _db()
+    version = parser_version()
+    row = conn.execute(
+        'SELECT text FROM parsed_text WHERE sha256 = ? AND parser_version = ?',
+        (sha256, version)).fetchone()
+    if row is None:
+        PARSE_CACHE.inc(result='miss')
+        return None
+    PARSE_CACHE.inc(result='hit')
+    conn.execute(
+        'UPDATE parsed_text SET last_used = ? WHERE sha256 = ? AND parser_version = ?',
+        (time.time(), sha256, version))
+    return row[0]
+
+
+def store_text(sha256, text):
+    """Cache extracted text for the digest, evicting old entries if needed"""
+    conn = _db()
+    version = parser_version()
+    size = len(text.encode('utf-8'))
+    # The running total changes in the same transaction as the entries, so
+    # no write has to sum the whole cache
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute(
+            'SELECT size FROM parsed_text WHERE sha256 = ? AND parser_version = ?',
+            (sha256, version)).fetchone()
+        conn.execute(
+            'INSERT OR REPLACE INTO parsed_text VALUES (?, ?, ?, ?, ?)',
+            (sha256, version, text, size, time.time()))
+        conn.execute('UPDATE cache_size SET total = total + ?',
+                     (size - (row[0] if row else 0),))
+        _evict(conn, Config.PARSE_CACHE_MAX_BYTES)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def evict(max_bytes):
+    """Delete least recently used entries until the cache fits max_bytes"""
+    conn = _db()
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        _evict(conn, max_bytes)
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def _evict(conn, max_bytes):
+    total = conn.execute('SELECT total FROM cache_size').fetchone()[0]
+    if total <= max_bytes:
+        return
+
+    excess = total - max_bytes
+    victims = []
+    for rowid, size in conn.execute(
+            'SELECT rowid, size FROM parsed_text ORDER BY last_used'):
+        victims.append((rowid,))
+        excess -= size
+        if excess <= 0:
+            break
+    conn.executemany('DELETE FROM parsed_text WHERE rowid = ?', victims)
+    conn.execute('UPDATE cache_size SET total = total - ?',
+                 (total - max_bytes - excess,))
+
+
+def parse_pdf_cached(source, name=None, sha256=None):
+    """
+    Parse a PDF, reusing the text extracted from identical bytes earlier.
+
+    The text is also added to the full-text search index.
+
+    Args:
+        source: Path to the PDF file, its bytes or a binary file object
+        name: Key the search index links candidates by, defaults to the
+            path; CVs parsed from memory need one to be linked
+        sha256: The source's digest, if the caller already has it
+
+    Returns:
+        Extracted text, as returned by parse_pdf
+    """
+    if not Config.PARSE_CACHE_ENABLED and not Config.SEARCH_INDEX_ENABLED:
+        return parse_pdf(source)
+
+    sha256 = sha256 or source_sha256(source)
+    text = get_cached_text(sha256) if Config.PARSE_CACHE_ENABLED else None
+    if text is None:
+        text = parse_pdf(source)
+        if Config.PARSE_CACHE_ENABLED:
+            store_text(sha256, text)
+    if Config.SEARCH_INDEX_ENABLED:
+        index_cv(_index_name(source, name), sha256, text)
+    return text
+
+
+def _index_name(source, name):
+    if name is None and is_pdf_path(source):
+        return os.fspath(source)
+    return name
+
+
+def stream_pdf_text(source, name=None, sha256=None):
+    """
+    Yield a PDF's text page by page, for consumers that may stop early.
+
+    A cache hit yields the whole cached text at once. Otherwise pages are
+    extracted lazily, and the text is cached and added to the search index
+    only if the consumer reads every page, so an early exit never stores
+    partial text.
+
+    Args:
+        source: Path to the PDF file, its bytes or a binary file object
+        name: Search index key, as for parse_pdf_cached
+        sha256: The source's digest, if the caller already has it
+
+    Yields:
+        Text chunks that joined with newlines give parse_pdf's output
+    """
+    if not Config.PARSE_CACHE_ENABLED and not Config.SEARCH_INDEX_ENABLED:
+        sha256 = None
+    elif sha256 is None:
+        sha256 = source_sha256(source)
+    if Config.PARSE_CACHE_ENABLED:
+        text = get_cached_text(sha256)
+        if text is not None:
+            if Config.SEARCH_INDEX_ENABLED:
+                index_cv(_index_name(source, name), sha256, text)
+            yield text
+            return
+
+    max_chars = Config.PDF_MAX_CHARS
+    pages = []
+    length = 0
+    for page in iter_pdf_pages(source):
+        pages.append(page)
+        yield page
+        length += len(page) + 1
+        if max_chars and length >= max_chars:
+            break
+
+    if sha256 is not None:
+        text = "\n".join(pages).strip()
+        text = text[:max_chars] if max_chars else text
+        if Config.PARSE_CACHE_ENABLED:
+            store_text(sha256, text)
+        if Config.SEARCH_INDEX_ENABLED:
+            index_cv(_index_name(source, name), sha256, text)
@@ -1,12 +1,308 @@
-from PyPDF2 import PdfReader
-
-def parse_pdf(pdf_path):
-    text = ""
-    with open(pdf_path, "rb") as file:
-        reader = PdfReader(file)
-        for page in reader.pages:
-            text += page.extract_text() + "\n"
-    return text.strip()
+from concurrent.futures import ProcessPoolExecutor
+from config.settings import Config
+from contextlib import contextmanager
+from functools import lru_cache, partial
+from importlib import metadata
+from utils.metrics import PAGES_PARSED
+import io
+import mmap
+import multiprocessing
+import os
+import threading
+
+
+def is_pdf_path(source):
+    """True if a PDF source is a filesystem path rather than bytes or a stream"""
+    return isinstance(source, (str, os.PathLike))
+
+
+@contextmanager
+def open_pdf(source, use_mmap=False):
+    """
+    Open a PDF source as a binary stream.
+
+    Args:
+        source: Path to the PDF, its bytes, or a seekable binary file object
+            (read from the start)
+        use_mmap: Map a path into memory instead of reading it buffered
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+        return
+    if not is_pdf_path(source):
+        source.seek(0)
+        yield source
+        return
+    with open(source, "rb") as file:
+        # Map the file so pages are read straight from the page cache;
+        # empty files can't be mapped and fall back to buffered reads
+        if use_mmap and os.fstat(file.fileno()).st_size:
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+        else:
+            yield file
+
+
+class Document:
+    """
+    A PDF opened by a backend, so its pages can be counted and extracted
+    without opening it again.
+
+    Attributes:
+        page_count: Callable returning the number of pages
+        pages: Callable taking (start, stop) and yielding each page's text
+    """
+
+    def __init__(self, page_count, pages):
+        self.page_count = page_count
+        self.pages = pages
+
+
+class Backend:
+    """Extraction backend; subclasses implement open_document"""
+
+    def page_count(self, source):
+        with self.open_document(source) as document:
+            return document.page_count()
+
+    def iter_pages(self, source, start=0, stop=None):
+        with self.open_document(source) as document:
+            yield from document.pages(start, stop)
+
+
+class PyPDF2Backend(Backend):
+    """Pure-Python extraction with PyPDF2 (always installed)"""
+    name = 'pypdf2'
+    distribution = 'PyPDF2'
+
+    @contextmanager
+    def open_document(self, source):
+        from PyPDF2 import PdfReader
+        with open_pdf(source, use_mmap=Config.PARSE_USE_MMAP) as file:
+            reader = PdfReader(file)
+            yield Document(lambda: len(reader.pages),
+                           partial(self._pages, reader))
+
+    @staticmethod
+    def _pages(reader, start, stop):
+        for page in reader.pages[start:stop]:
+            yield page.extract_text() or ""
+
+
+class PdfminerBackend(Backend):
+    """Layout-aware extraction with pdfminer.six, when installed"""
+    name = 'pdfminer'
+    distribution = 'pdfminer.six'
+
+    @contextmanager
+    def open_document(self, source):
+        from pdfminer.pdfdocument import PDFDocument
+        from pdfminer.pdfpage import PDFPage
+        from pdfminer.pdfparser import PDFParser
+        with open_pdf(source) as file:
+            # Page objects are cheap; laying a page out is the slow part
+            pages = list(PDFPage.create_pages(PDFDocument(PDFParser(file))))
+            yield Document(lambda: len(pages), partial(self._pages, pages))
+
+    @staticmethod
+    def _pages(pages, start, stop):
+        # What pdfminer.high_level.extract_pages does, on pages already read
+        from pdfminer.converter import PDFPageAggregator
+        from pdfminer.layout import LAParams, LTTextContainer
+        from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+        resource_manager = PDFResourceManager(caching=True)
+        device = PDFPageAggregator(resource_manager, laparams=LAParams())
+        interpreter = PDFPageInterpreter(resource_manager, device)
+        for page in pages[start:stop]:
+            interpreter.process_page(page)
+            yield "".join(element.get_text() for element in device.get_result()
+                          if isinstance(element, LTTextContainer))
+
+
+class PdfiumBackend(Backend):
+    """Native PDFium extraction with pypdfium2, when installed"""
+    name = 'pypdfium2'
+    distribution = 'pypdfium2'
+
+    # PDFium is not thread-safe; calls are serialized within a process
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _input(source):
+        # PDFium takes a path, bytes or a seekable file object
+        if isinstance(source, (bytearray, memoryview)):
+            return bytes(source)
+        if not is_pdf_path(source) and not isinstance(source, bytes):
+            source.seek(0)
+        return source
+
+    @contextmanager
+    def open_document(self, source):
+        import pypdfium2
+        with self._lock:
+            pdf = pypdfium2.PdfDocument(self._input(source))
+            count = len(pdf)
+        try:
+            yield Document(lambda: count, partial(self._pages, pdf, count))
+        finally:
+            with self._lock:
+                pdf.close()
+
+    def _pages(self, pdf, count, start, stop):
+        for index in range(start, min(stop or count, count)):
+            with self._lock:
+                page = pdf[index]
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+            yield text
+
+
+BACKENDS = {backend.name: backend
+            for backend in (PdfiumBackend(), PdfminerBackend(), PyPDF2Backend())}
+
+
+@lru_cache(maxsize=None)
+def backend_version(backend):
+    """Installed version of a backend's package, or None if missing"""
+    try:
+        return metadata.version(backend.distribution)
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def available_backends():
+    """Names of installed backends, fastest first"""
+    return [name for name, backend in BACKENDS.items()
+            if backend_version(backend) is not None]
+
+
+def get_backend(name=None):
+    """
+    Return the extraction backend named in config.
+
+    Args:
+        name: Backend name, defaults to Config.PDF_BACKEND; "auto" picks
+            the fastest installed backend
+
+    Raises:
+        ValueError: If the backend is unknown or not installed
+    """
+    name = name or Config.PDF_BACKEND
+    if name == 'auto':
+        name = available_backends()[0]
+    backend = BACKENDS.get(name)
+    if backend is None or backend_version(backend) is None:
+        raise ValueError(f"PDF backend '{name}' is not available")
+    return backend
+
+
+def parser_version(backend=None):
+    """
+    Key for the parse cache: changes whenever extraction output could.
+
+    Covers the backend and its version, the extraction limits and a
+    revision bumped when this module's output changes.
+    """
+    backend = backend or get_backend()
+    return (f"{backend.name}-{backend_version(backend)}-"
+            f"p{Config.PDF_MAX_PAGES}-c{Config.PDF_MAX_CHARS}-2")
+
+
+def iter_pdf_pages(source, backend=None):
+    """
+    Yield the text of each page in order, honouring Config.PDF_MAX_PAGES.
+
+    Args:
+        source: Path to the PDF file, its bytes or a binary file object
+        backend: Backend name, defaults to Config.PDF_BACKEND
+    """
+    backend = get_backend(backend)
+    stop = Config.PDF_MAX_PAGES or None
+    for text in backend.iter_pages(source, 0, stop):
+        PAGES_PARSED.inc(backend=backend.name)
+        yield text
+
+
+def _extract_range(backend_name, pdf_path, start, stop):
+    return list(BACKENDS[backend_name].iter_pages(pdf_path, start, stop))
+
+
+_page_pool = None
+_page_pool_lock = threading.Lock()
+
+
+def _get_page_pool():
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(max_workers=Config.PDF_PAGE_WORKERS)
+        return _page_pool
+
+
+def _parallel_pages(backend, pdf_path, page_count):
+    if page_count < Config.PDF_PARALLEL_MIN_PAGES:
+        return None
+    workers = Config.PDF_PAGE_WORKERS
+    size = -(-page_count // workers)
+    futures = [_get_page_pool().submit(_extract_range, backend.name, pdf_path,
+                                       start, min(start + size, page_count))
+               for start in range(0, page_count, size)]
+    return [text for future in futures for text in future.result()]
+
+
+def parse_pdf(source, backend=None):
+    """
+    Extract the text of a PDF.
+
+    Long documents on disk are split into page ranges extracted in
+    parallel. The pages are counted on the document opened for extraction,
+    so a short CV is still opened only once. Inside a process pool worker
+    (the batch and upload pipelines' when PIPELINE_CPU_WORKERS > 0, and
+    every cli.py worker) pages are always extracted in order: the pool
+    already keeps every core busy with other CVs, so only inline runs
+    split a document.
+    Extraction stops early at Config.PDF_MAX_PAGES pages or
+    Config.PDF_MAX_CHARS characters, and pages are joined once at the end.
+
+    Args:
+        source: Path to the PDF file, its bytes or a binary file object,
+            e.g. an upload parsed without writing it to disk
+        backend: Backend name, defaults to Config.PDF_BACKEND
+
+    Returns:
+        Extracted text with pages separated by newlines
+    """
+    backend = get_backend(backend)
+    max_chars = Config.PDF_MAX_CHARS
+    stop = Config.PDF_MAX_PAGES or None
+
+    pages = None
+    with backend.open_document(source) as document:
+        if (Config.PDF_PAGE_WORKERS > 1 and is_pdf_path(source)
+                and multiprocessing.parent_process() is None):
+            page_count = document.page_count()
+            if stop:
+                page_count = min(page_count, stop)
+            pages = _parallel_pages(backend, source, page_count)
+            if pages is not None:
+                PAGES_PARSED.inc(len(pages), backend=backend.name)
+
+        if pages is None:
+            pages = []
+            length = 0
+            for text in document.pages(0, stop):
+                PAGES_PARSED.inc(backend=backend.name)
+                pages.append(text)
+                length += len(text) + 1
+                if max_chars and length >= max_chars:
+                    break
+
+    text = "\n".join(pages).strip()
+    if max_chars:
+        text = text[:max_chars]
+    return text
 
 # Alias for compatibility
 extract_text_from_pdf = parse_pdf
@@ -0,0 +1,35 @@
+from contextlib import contextmanager
+from config.settings import Config
+import cProfile
+import io
+import os
+import pstats
+import time
+
+
+@contextmanager
+def profiled(label):
+    """
+    Profile the with block and dump the results to Config.PROFILE_DIR.
+
+    Writes ``<label>-<timestamp>.prof`` for snakeviz or pstats and a
+    ``.txt`` summary of the 50 most expensive calls by cumulative time.
+    Only the calling thread is profiled, so run the work inline.
+
+    Yields:
+        Path of the .prof file (written when the block exits)
+    """
+    os.makedirs(Config.PROFILE_DIR, exist_ok=True)
+    path = os.path.join(Config.PROFILE_DIR,
+                        f"{label}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield path
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(50)
+        with open(path[:-len('.prof')] + '.txt', 'w') as f:
+            f.write(summary.getvalue())
@@ -1,3 +1,7 @@
+from utils.skill_matcher import get_matcher
+import heapq
+
+
 def score_candidate(cv_text, required_skills):
     """
     Score a single candidate's CV text against required skills.
@@ -9,27 +13,15 @@ def score_candidate(cv_text, required_skills):
     Returns:
         Score based on matched skills
     """
-    score = 0
-    matched_skills = []
-
-    for skill in required_skills:
-        if skill.lower() in cv_text.lower():
-            score += 1
-            matched_skills.append(skill)
-
-    return score, matched_skills
+    return get_matcher(tuple(required_skills)).score(cv_text)
 
 
 def score_candidates(candidates, job_skills):  # Renamed from score_candidate
     scored_candidates = []
+    matcher = get_matcher(tuple(job_skills))
 
     for candidate in candidates:
-        score = 0
-        cv_content = candidate['cv_content']
-
-        for skill in job_skills:
-            if skill.lower() in cv_content.lower():
-                score += 1
+        score, _ = matcher.score(candidate['cv_content'])
 
         scored_candidates.append({
             'name': candidate['name'],
@@ -41,22 +33,26 @@ def score_candidates(candidates, job_skills):  # Renamed from score_candidate
 
 
 def select_top_candidates(scored_candidates, top_n=5):
-    job_candidates = {}
-
-    for candidate in scored_candidates:
-        job_id = candidate['job_id']
-        if job_id not in job_candidates:
-            job_candidates[job_id] = []
-        job_candidates[job_id].append(candidate)
-
-    top_candidates = {}
-
-    for job_id, candidates in job_candidates.items():
-        sorted_candidates = sorted(
-            candidates, key=lambda x: x['score'], reverse=True)
-        top_candidates[job_id] = sorted_candidates[:top_n]
+    """
+    Pick each job's top_n candidates, highest score first.
 
-    return top_candidates
+    Works through the candidates once with a bounded min-heap per job, so
+    only top_n candidates per job are held however many are scored. Ties
+    keep the earlier candidate, as a stable sort would.
+    """
+    heaps = {}
+
+    for position, candidate in enumerate(scored_candidates):
+        heap = heaps.setdefault(candidate['job_id'], [])
+        # Positions are unique, so the candidate dicts are never compared
+        item = (candidate['score'], -position, candidate)
+        if len(heap) < top_n:
+            heapq.heappush(heap, item)
+        elif top_n > 0 and item > heap[0]:
+            heapq.heapreplace(heap, item)
+
+    return {job_id: [candidate for _, _, candidate in sorted(heap, reverse=True)]
+            for job_id, heap in heaps.items()}
 
 
 def rename_cv_files(top_candidates, cv_folder='shortlisted_cvs/'):
@@ -0,0 +1,190 @@
+from config.settings import Config
+from utils.pdf_parser import parser_version
+from utils.sqlite_store import connect
+import heapq
+import os
+import time
+
+# "+" and "#" are kept inside tokens so skills like c++ and c# are words
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id INTEGER PRIMARY KEY,
+    sha256 TEXT NOT NULL UNIQUE,
+    parser_version TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS cv_text USING fts5(
+    text, tokenize = "unicode61 tokenchars '+#'"
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS candidate_cvs (
+    path TEXT NOT NULL,
+    name TEXT NOT NULL,
+    job_id TEXT NOT NULL,
+    PRIMARY KEY (path, name, job_id)
+);
+"""
+
+_migrated_pids = set()
+
+
+def _db():
+    conn = connect(Config.SEARCH_INDEX_PATH, SCHEMA)
+    if os.getpid() not in _migrated_pids:
+        _migrate(conn)
+        _migrated_pids.add(os.getpid())
+    return conn
+
+
+def _migrate(conn):
+    """Move links from the name-keyed table older versions wrote"""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' "
+                        "AND name = 'candidates'").fetchone():
+            conn.execute('INSERT OR IGNORE INTO candidate_cvs '
+                         'SELECT path, name, job_id FROM candidates')
+            conn.execute('DROP TABLE candidates')
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def index_cv(pdf_path, sha256, text):
+    """
+    Add a CV's extracted text to the full-text index.
+
+    Text is stored once per SHA-256 of the PDF and replaced when the parser
+    version changes; the local path (or another key for a CV parsed from
+    memory) is remembered so candidates can be linked to it. With no path
+    only the text is stored.
+    """
+    conn = _db()
+    version = parser_version()
+    # IMMEDIATE takes the write lock up front; upgrading a read lock fails
+    # without waiting when other workers are indexing too
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        row = conn.execute(
+            'SELECT doc_id, parser_version FROM documents WHERE sha256 = ?',
+            (sha256,)).fetchone()
+        if row is None or row[1] != version:
+            if row is not None:
+                conn.execute('DELETE FROM cv_text WHERE rowid = ?', (row[0],))
+            doc_id = conn.execute(
+                'INSERT OR REPLACE INTO documents VALUES (?, ?, ?, ?)',
+                (row[0] if row else None, sha256, version, time.time())).lastrowid
+            conn.execute('INSERT INTO cv_text (rowid, text) VALUES (?, ?)',
+                         (doc_id, text))
+        if pdf_path is not None:
+            conn.execute('INSERT OR REPLACE INTO files VALUES (?, ?)',
+                         (pdf_path, sha256))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+
+
+def add_candidate(pdf_path, name, job_id):
+    """
+    Link a candidate to the CV at a local path indexed by index_cv.
+
+    Links are keyed by the CV as well as the name, so two candidates who
+    share a name each keep their own CV.
+    """
+    _db().execute('INSERT OR IGNORE INTO candidate_cvs VALUES (?, ?, ?)',
+                  (pdf_path, name, job_id))
+
+
+def _phrase(term):
+    # FTS5 string literal; the plural mirrors SkillMatcher's optional "s"
+    term = ' '.join(term.casefold().split()).replace('"', '""')
+    return f'"{term}" OR "{term}s"'
+
+
+def _skill_query(skill, synonyms):
+    terms = [skill] + list(synonyms.get(skill, []))
+    return ' OR '.join(_phrase(term) for term in dict.fromkeys(terms))
+
+
+def search(skills, must_have=(), weights=None, synonyms=None, limit=20):
+    """
+    Score every indexed CV against an ad-hoc set of skills.
+
+    Each skill (with its aliases) is one lookup in the inverted index, so
+    the cost depends on the skills asked for, not on CV length.
+
+    Args:
+        skills: Skill names to look for
+        must_have: Skills a CV needs to be returned at all
+        weights: Optional skill -> weight; unlisted skills weigh 1
+        synonyms: Skill -> aliases, defaults to the jobs file's synonyms
+        limit: Number of CVs to return
+
+    Returns:
+        List of dicts with the CV's sha256, score, matched_skills and the
+        candidates linked to it, highest score first
+    """
+    if synonyms is None:
+        synonyms = Config.JOB_DEFINITIONS.get('synonyms', {})
+    weights = weights or {}
+    conn = _db()
+
+    matched = {}
+    for skill in dict.fromkeys(skills):
+        for (doc_id,) in conn.execute(
+                'SELECT rowid FROM cv_text WHERE cv_text MATCH ?',
+                (_skill_query(skill, synonyms),)):
+            matched.setdefault(doc_id, []).append(skill)
+
+    required = set(must_have)
+    # Ties go to the CV indexed first
+    scored = ((sum(weights.get(skill, 1) for skill in found), -doc_id, found)
+              for doc_id, found in matched.items()
+              if required.issubset(found))
+    top = heapq.nlargest(limit, scored)
+
+    results = []
+    for score, negated_id, found in top:
+        sha256 = conn.execute('SELECT sha256 FROM documents WHERE doc_id = ?',
+                              (-negated_id,)).fetchone()[0]
+        results.append({
+            "sha256": sha256,
+            "score": score,
+            "matched_skills": found,
+            "candidates": candidates_for(sha256),
+        })
+    return results
+
+
+def candidates_for(sha256):
+    """Candidates whose CV has this SHA-256, with the CV's local path"""
+    return [{"name": name, "job_id": job_id, "cv_path": path}
+            for name, job_id, path in _db().execute(
+                'SELECT c.name, c.job_id, c.path FROM candidate_cvs c '
+                'JOIN files f ON f.path = c.path WHERE f.sha256 = ? '
+                'ORDER BY c.name, c.job_id', (sha256,))]
+
+
+def iter_documents():
+    """
+    Yield (sha256, text) for every indexed CV, e.g. to score a new job
+    without downloading anything.
+    """
+    conn = _db()
+    # fetchall so callers can write to the index while iterating
+    doc_ids = conn.execute(
+        'SELECT doc_id, sha256 FROM documents ORDER BY doc_id').fetchall()
+    for doc_id, sha256 in doc_ids:
+        row = conn.execute('SELECT text FROM cv_text WHERE rowid = ?',
+                           (doc_id,)).fetchone()
+        if row is not None:
+            yield sha256, row[0]
+
+
+def document_count():
+    return _db().execute('SELECT COUNT(*) FROM documents').fetchone()[0]
@@ -0,0 +1,95 @@
+from functools import lru_cache
+import re
+
+
+def _trie_pattern(terms):
+    """
+    Build a regex matching any of the terms, factored by common prefix.
+
+    A trie-shaped pattern lets the regex engine branch on one character at
+    a time instead of trying every term at every position; longer
+    continuations are tried before shorter ones.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def render(node):
+        ends_here = '' in node
+        branches = [re.escape(char) + render(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if ends_here:
+            return f"(?:{body})?"
+        return body
+
+    return render(trie)
+
+
+class SkillMatcher:
+    """
+    Matches a fixed set of skills against CV text in one pass.
+
+    Every skill term is compiled into a single trie-shaped regex that only
+    matches whole words (an optional plural "s" is allowed), so "git" no
+    longer matches inside "digital". Terms can map to a canonical skill,
+    letting aliases count towards the skill they name.
+    """
+
+    def __init__(self, terms):
+        """
+        Args:
+            terms: Iterable of skills, or a dict mapping each term to the
+                canonical skill it counts for
+        """
+        if not isinstance(terms, dict):
+            terms = {term: term for term in terms}
+        self.skills = list(dict.fromkeys(terms.values()))
+        self._canonical = {term.casefold(): skill
+                           for term, skill in terms.items()}
+        self.max_term_length = max(map(len, self._canonical), default=0)
+
+        alternation = _trie_pattern(self._canonical)
+        self._pattern = re.compile(
+            rf'(?<!\w)({alternation})s?(?!\w)') if alternation else None
+
+    def match(self, text):
+        """
+        Find every occurrence of the skills in the text.
+
+        Args:
+            text: CV text; it is casefolded once, so positions refer to the
+                casefolded text
+
+        Returns:
+            Dict of matched skill -> list of start positions, in the order
+            the skills were given
+        """
+        found = {}
+        if self._pattern is None or not text:
+            return found
+        for m in self._pattern.finditer(text.casefold()):
+            found.setdefault(self._canonical[m.group(1)], []).append(m.start())
+        return {skill: found[skill] for skill in self.skills if skill in found}
+
+    def counts(self, text):
+        """Return matched skill -> number of occurrences"""
+        return {skill: len(positions)
+                for skill, positions in self.match(text).items()}
+
+    def score(self, text):
+        """Return (score, matched_skills), one point per matched skill"""
+        matched_skills = list(self.match(text))
+        return len(matched_skills), matched_skills
+
+
+@lru_cache(maxsize=256)
+def get_matcher(skills):
+    """Return a compiled matcher for a tuple of skills"""
+    return SkillMatcher(skills)
+
@@ -0,0 +1,39 @@
+import os
+import sqlite3
+import threading
+
+_local = threading.local()
+
+
+def connect(path, schema=None):
+    """
+    Return a SQLite connection to ``path`` for the calling thread.
+
+    Connections are cached per thread and per process (a forked worker never
+    reuses its parent's handle), use WAL so readers don't block the writer,
+    and wait on locks instead of failing when another process is writing.
+
+    Args:
+        path: Database file; parent directories are created
+        schema: Optional SQL script run once when the connection is opened
+
+    Returns:
+        sqlite3.Connection in autocommit mode
+    """
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.pid != os.getpid():
+        connections = _local.connections = {}
+        _local.pid = os.getpid()
+
+    conn = connections.get(path)
+    if conn is None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        if schema:
+            conn.executescript(schema)
+        connections[path] = conn
+    return conn